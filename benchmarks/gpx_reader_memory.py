@@ -0,0 +1,75 @@
+"""
+Compare peak memory used to read gpx files with gpxpy and with streaming
+reader.
+
+Usage (from repository root):
+
+    python -m benchmarks.gpx_reader_memory [points_nb ...]
+
+Default tracks sizes: 10 000, 100 000 and 1 000 000 points.
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+from typing import Callable, List
+
+import gpxpy.gpx
+
+from fittrackee.workouts.utils_gpx_stream import GpxReader
+
+from .utils import generate_segment
+
+DEFAULT_POINTS_NB = [10_000, 100_000, 1_000_000]
+
+
+def read_with_gpxpy(gpx_file: str) -> None:
+    with open(gpx_file) as f:
+        gpx = gpxpy.parse(f)
+    for track in gpx.tracks:
+        for segment in track.segments:
+            for _ in segment.points:
+                pass
+
+
+def read_with_stream(gpx_file: str) -> None:
+    for _ in GpxReader(gpx_file).iter_points():
+        pass
+
+
+def get_peak_memory(function: Callable, gpx_file: str) -> float:
+    tracemalloc.start()
+    function(gpx_file)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main(points_nb_list: List[int]) -> None:
+    print(
+        f"{'points':>10} | {'file (MB)':>9} | {'gpxpy (MB)':>10} | "
+        f"{'stream (MB)':>11}"
+    )
+    for points_nb in points_nb_list:
+        gpx = gpxpy.gpx.GPX()
+        gpx_track = gpxpy.gpx.GPXTrack()
+        gpx.tracks.append(gpx_track)
+        gpx_track.segments.append(generate_segment(points_nb))
+        with tempfile.NamedTemporaryFile(
+            mode='w', suffix='.gpx', delete=False
+        ) as gpx_file:
+            gpx_file.write(gpx.to_xml())
+        del gpx, gpx_track
+        file_size = os.path.getsize(gpx_file.name) / 1024 / 1024
+        try:
+            print(
+                f'{points_nb:>10} | {file_size:>9.1f} | '
+                f'{get_peak_memory(read_with_gpxpy, gpx_file.name):>10.1f} | '
+                f'{get_peak_memory(read_with_stream, gpx_file.name):>11.1f}'
+            )
+        finally:
+            os.remove(gpx_file.name)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_POINTS_NB)
@@ -0,0 +1,81 @@
+"""
+Compare python and numpy backends used to calculate gpx data and chart data.
+
+Usage (from repository root, numpy must be installed):
+
+    python -m benchmarks.gpx_stats_backends [points_nb ...]
+
+Default tracks sizes: 10 000, 100 000 and 1 000 000 points.
+"""
+import sys
+import time
+from typing import Callable, List
+
+import gpxpy.gpx
+
+from fittrackee.workouts.utils_chart_data import ChartDataColumns
+from fittrackee.workouts.utils_gpx_numpy import (
+    NumpySegmentStats,
+    get_chart_data_columns as numpy_get_chart_data_columns,
+)
+from fittrackee.workouts.utils_gpx_stats import SegmentStats
+
+from .utils import generate_segment
+
+DEFAULT_POINTS_NB = [10_000, 100_000, 1_000_000]
+
+
+def get_stats(
+    stats_class: Callable, segment: gpxpy.gpx.GPXTrackSegment
+) -> SegmentStats:
+    segment_stats = stats_class()
+    for point in segment.points:
+        segment_stats.add_point(point)
+    segment_stats.close()
+    return segment_stats
+
+
+def get_chart_data_columns(
+    segment: gpxpy.gpx.GPXTrackSegment,
+) -> ChartDataColumns:
+    chart_data_columns = ChartDataColumns()
+    chart_data_columns.start_segment()
+    for point in segment.points:
+        chart_data_columns.add_point(point)
+    chart_data_columns.end_segment()
+    return chart_data_columns
+
+
+def measure(function: Callable, *args: object) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main(points_nb_list: List[int]) -> None:
+    print(
+        f"{'points':>10} | {'task':<10} | {'python (s)':>10} | "
+        f"{'numpy (s)':>10} | {'speedup':>7}"
+    )
+    for points_nb in points_nb_list:
+        segment = generate_segment(points_nb)
+        results = {
+            'gpx data': (
+                measure(get_stats, SegmentStats, segment),
+                measure(get_stats, NumpySegmentStats, segment),
+            ),
+            'chart data': (
+                measure(get_chart_data_columns, segment),
+                measure(numpy_get_chart_data_columns, [segment.points]),
+            ),
+        }
+        for task, (python_duration, numpy_duration) in results.items():
+            print(
+                f'{points_nb:>10} | {task:<10} | {python_duration:>10.3f} | '
+                f'{numpy_duration:>10.3f} | '
+                f'{python_duration / numpy_duration:>6.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_POINTS_NB)
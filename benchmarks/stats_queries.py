@@ -0,0 +1,173 @@
+"""
+Compare user statistics calculation (by sport and by time) with workouts
+aggregated in Python (previous implementation, all workouts being loaded)
+and with workouts daily statistics aggregated by database.
+
+Database is seeded with generated workouts for a user named
+'stats_benchmark_0' (seeded data are kept for next runs), so a dedicated
+database must be used: DATABASE_URL must point to a database migrated with
+'flask db upgrade' and initialized with 'flask init-data'.
+Workouts being seeded with SQL statements, daily statistics of user are
+rebuilt before measures.
+
+Usage (from repository root):
+
+    python -m benchmarks.stats_queries [workouts_nb] [runs]
+
+Default: 50 000 workouts, 10 runs per statistics type.
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fittrackee import create_app, db
+from fittrackee.users.models import User
+from fittrackee.workouts.models import Workout, rebuild_workouts_daily_stats
+from fittrackee.workouts.stats import get_workouts_stats
+from fittrackee.workouts.utils_format import convert_timedelta_to_integer
+
+from .workouts_queries import seed_database
+
+DEFAULT_ARGS = [50_000, 10]
+USERNAME_PREFIX = 'stats_benchmark_'
+
+# (filter type, time period)
+STATS_TYPES = [
+    ('by_sport', None),
+    ('by_time', 'week'),
+    ('by_time', 'weekm'),
+    ('by_time', 'month'),
+    ('by_time', 'year'),
+]
+
+
+def get_time_period(workout_date: datetime, time_period: Optional[str]) -> str:
+    if time_period == 'week':
+        workout_date -= timedelta(
+            days=(
+                workout_date.isoweekday()
+                if workout_date.isoweekday() < 7
+                else 0
+            )
+        )
+        return datetime.strftime(workout_date, '%Y-%m-%d')
+    if time_period == 'weekm':
+        workout_date -= timedelta(days=workout_date.weekday())
+        return datetime.strftime(workout_date, '%Y-%m-%d')
+    if time_period == 'month':
+        return datetime.strftime(workout_date, '%Y-%m')
+    return datetime.strftime(workout_date, '%Y')
+
+
+def get_python_stats(
+    user: User, filter_type: str, time_period: Optional[str]
+) -> Dict:
+    """
+    Previous implementation: workouts are loaded and aggregated in Python
+    """
+    workouts = (
+        Workout.query.filter(Workout.user_id == user.id)
+        .order_by(Workout.workout_date.asc())
+        .all()
+    )
+    stats: Dict = {}
+    for workout in workouts:
+        sport_stats = (
+            stats
+            if filter_type == 'by_sport'
+            else stats.setdefault(
+                get_time_period(workout.workout_date, time_period), {}
+            )
+        )
+        if workout.sport_id not in sport_stats:
+            sport_stats[workout.sport_id] = {
+                'nb_workouts': 0,
+                'total_distance': 0.0,
+                'total_duration': 0,
+            }
+        sport_stats[workout.sport_id]['nb_workouts'] += 1
+        sport_stats[workout.sport_id]['total_distance'] += float(
+            workout.distance
+        )
+        sport_stats[workout.sport_id][
+            'total_duration'
+        ] += convert_timedelta_to_integer(workout.moving)
+    return stats
+
+
+def get_sql_stats(
+    user: User, filter_type: str, time_period: Optional[str]
+) -> Dict:
+    return get_workouts_stats(user, filter_type, time=time_period)
+
+
+def round_distances(stats: Dict) -> Dict:
+    """
+    Round total distances, float sums depending on addition order
+    """
+    return {
+        key: (
+            round_distances(value)
+            if 'nb_workouts' not in value
+            else {**value, 'total_distance': round(value['total_distance'], 3)}
+        )
+        for key, value in stats.items()
+    }
+
+
+def measure(
+    get_stats: Callable,
+    user: User,
+    filter_type: str,
+    time_period: Optional[str],
+    runs: int,
+) -> float:
+    """
+    Return median duration (in ms)
+    """
+    durations: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        get_stats(user, filter_type, time_period)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main(workouts_nb: int, runs: int) -> None:
+    app = create_app()
+    with app.app_context():
+        seed_database(workouts_nb, 1, USERNAME_PREFIX)
+        user = User.query.filter_by(username=f'{USERNAME_PREFIX}0').one()
+        nb_workouts = Workout.query.filter_by(user_id=user.id).count()
+        print(f'{nb_workouts} workouts for user {user.username}.')
+        rebuild_workouts_daily_stats(db.session.connection(), user.id)
+        db.session.commit()
+
+        results = {}
+        for filter_type, time_period in STATS_TYPES:
+            if round_distances(
+                get_python_stats(user, filter_type, time_period)
+            ) != round_distances(
+                get_sql_stats(user, filter_type, time_period)
+            ):
+                raise SystemExit(
+                    f'Different statistics for {filter_type} {time_period}.'
+                )
+            results[(filter_type, time_period)] = (
+                measure(
+                    get_python_stats, user, filter_type, time_period, runs
+                ),
+                measure(get_sql_stats, user, filter_type, time_period, runs),
+            )
+
+    print(f"\n{'statistics':<15} | {'python (ms)':>11} | {'sql (ms)':>8}")
+    for (filter_type, time_period), (python, sql) in results.items():
+        name = f"{filter_type} {time_period if time_period else ''}"
+        print(f'{name:<15} | {python:>11.2f} | {sql:>8.2f}')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + DEFAULT_ARGS[len(args) :]))  # noqa
@@ -0,0 +1,24 @@
+import random
+from datetime import datetime, timedelta
+
+import gpxpy.gpx
+
+
+def generate_segment(points_nb: int) -> gpxpy.gpx.GPXTrackSegment:
+    random_generator = random.Random(points_nb)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    latitude = 44.68095
+    longitude = 6.07367
+    elevation = 998.0
+    point_time = datetime(2018, 3, 13, 12, 44, 45)
+    for _ in range(points_nb):
+        segment.points.append(
+            gpxpy.gpx.GPXTrackPoint(
+                latitude, longitude, elevation=elevation, time=point_time
+            )
+        )
+        latitude += random_generator.uniform(-0.00005, 0.0001)
+        longitude += random_generator.uniform(-0.00005, 0.0001)
+        elevation += random_generator.uniform(-1, 1)
+        point_time += timedelta(seconds=1)
+    return segment
@@ -0,0 +1,228 @@
+"""
+Report query plans and latency of main workouts queries, without and with
+indexes on workouts added for these queries (indexes are dropped in a
+transaction rolled back once measures are done, unique constraints indexes
+on workouts uuid and records are kept).
+
+Database is seeded with generated workouts for users named
+'benchmark_<n>' (seeded data are kept for next runs), so a dedicated
+database must be used: DATABASE_URL must point to a database migrated with
+'flask db upgrade' and initialized with 'flask init-data'.
+
+Usage (from repository root):
+
+    python -m benchmarks.workouts_queries [workouts_nb] [users_nb] [runs]
+
+Default: 1 000 000 workouts for 100 users, 20 runs per query.
+"""
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+
+from fittrackee import create_app, db
+from fittrackee.workouts.models import Workout
+
+DEFAULT_ARGS = [1_000_000, 100, 20]
+
+# indexes added for queries below
+INDEXES = [
+    'ix_workouts_user_id_workout_date_id',
+    'ix_workouts_user_id_sport_id_ave_speed',
+    'ix_workouts_user_id_sport_id_distance',
+    'ix_workouts_user_id_sport_id_max_speed',
+    'ix_workouts_user_id_sport_id_moving',
+    'ix_workouts_map_id',
+]
+
+# queries emitted by endpoints (columns are simplified), records query being
+# built from model (see get_records_query)
+QUERIES = {
+    'get_workouts (page)': (
+        'SELECT id FROM workouts WHERE user_id = :user_id '
+        'ORDER BY workout_date DESC, id ASC LIMIT 5 OFFSET 50'
+    ),
+    'get_workouts (cursor)': (
+        'SELECT id FROM workouts WHERE user_id = :user_id '
+        'AND (workout_date < :workout_date '
+        'OR (workout_date = :workout_date AND id > :workout_id)) '
+        'ORDER BY workout_date DESC, id ASC LIMIT 6'
+    ),
+    'adjacent workouts': (
+        'SELECT * FROM ('
+        'SELECT id, lag(uuid) OVER (ORDER BY workout_date, id), '
+        'lead(uuid) OVER (ORDER BY workout_date, id) '
+        'FROM workouts WHERE user_id = :user_id'
+        ') AS filtered_workouts WHERE id = :workout_id'
+    ),
+    'get_map': 'SELECT id FROM workouts WHERE map_id = :map_id LIMIT 1',
+    'get_workout_data': 'SELECT id FROM workouts WHERE uuid = :uuid LIMIT 1',
+    'get_records': (
+        'SELECT id FROM records WHERE user_id = :user_id '
+        'ORDER BY sport_id, record_type'
+    ),
+}
+
+
+def seed_database(
+    workouts_nb: int, users_nb: int, username_prefix: str = 'benchmark_'
+) -> None:
+    if db.session.execute(
+        text('SELECT 1 FROM users WHERE username = :username'),
+        {'username': f'{username_prefix}0'},
+    ).first():
+        print('Database already seeded.')
+        return
+    sports_ids = [
+        row[0] for row in db.session.execute(text('SELECT id FROM sports'))
+    ]
+    if not sports_ids:
+        raise SystemExit('No sports found, run "flask init-data" first.')
+
+    start = time.perf_counter()
+    db.session.execute(
+        text(
+            "INSERT INTO users (username, email, password, created_at, "
+            "admin, weekm) "
+            "SELECT :prefix || n, :prefix || n || '@example.com', "
+            "'', now(), false, false "
+            "FROM generate_series(0, :users_nb - 1) AS n"
+        ),
+        {'users_nb': users_nb, 'prefix': username_prefix},
+    )
+    db.session.execute(
+        text(
+            "INSERT INTO workouts (uuid, user_id, sport_id, creation_date, "
+            "workout_date, duration, moving, distance, max_speed, ave_speed, "
+            "map_id, enrichment_status) "
+            "SELECT md5(:prefix || n)::uuid, users.id, "
+            "(:sports_ids)[n % cardinality(:sports_ids) + 1], now(), "
+            "timestamp '2015-01-01' + random() * interval '3000 days', "
+            "interval '1 minute' * (10 + n % 300), "
+            "interval '1 minute' * (10 + n % 300), "
+            "random() * 100, random() * 60, random() * 30, "
+            "md5('map' || :prefix || n), 'completed' "
+            "FROM generate_series(0, :workouts_nb - 1) AS n "
+            "JOIN users ON users.username = :prefix || (n % :users_nb)"
+        ),
+        {
+            'prefix': username_prefix,
+            'sports_ids': sports_ids,
+            'workouts_nb': workouts_nb,
+            'users_nb': users_nb,
+        },
+    )
+    db.session.execute(
+        text(
+            "INSERT INTO records (user_id, sport_id, workout_id, "
+            "workout_uuid, record_type, workout_date, value) "
+            "SELECT DISTINCT ON (user_id, sport_id) user_id, sport_id, "
+            "workouts.id, uuid, 'FD', workout_date, distance * 1000 "
+            "FROM workouts "
+            "JOIN users ON users.id = workouts.user_id "
+            "WHERE users.username LIKE :prefix || '%' "
+            "ORDER BY user_id, sport_id, distance DESC, workout_date"
+        ),
+        {'prefix': username_prefix},
+    )
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    print(
+        f'{workouts_nb} workouts seeded in '
+        f'{time.perf_counter() - start:.1f}s.'
+    )
+
+
+def get_queries_params() -> Dict:
+    row = db.session.execute(
+        text(
+            "SELECT workouts.id, user_id, sport_id, workout_date, uuid, "
+            "map_id FROM workouts JOIN users ON users.id = workouts.user_id "
+            "WHERE users.username = 'benchmark_0' "
+            "ORDER BY workout_date DESC OFFSET 100 LIMIT 1"
+        )
+    ).one()
+    return {
+        'workout_id': row.id,
+        'user_id': row.user_id,
+        'sport_id': row.sport_id,
+        'workout_date': row.workout_date,
+        'uuid': row.uuid,
+        'map_id': row.map_id,
+    }
+
+
+def get_records_query(params: Dict) -> str:
+    """
+    Return query calculating records of user and sport, as emitted on
+    records update
+    """
+    query = Workout.get_records_workouts_query(
+        [(params['user_id'], params['sport_id'])]
+    )
+    return str(
+        query.statement.compile(
+            dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}
+        )
+    )
+
+
+def measure_queries(
+    queries: Dict[str, str], params: Dict, runs: int
+) -> Dict[str, Tuple[float, str]]:
+    """
+    Return median duration (in ms) and plan for each query
+    """
+    results = {}
+    for name, query in queries.items():
+        plan = '\n'.join(
+            row[0]
+            for row in db.session.execute(
+                text(f'EXPLAIN (ANALYZE, BUFFERS) {query}'), params
+            )
+        )
+        durations: List[float] = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            db.session.execute(text(query), params).fetchall()
+            durations.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.median(durations), plan)
+    return results
+
+
+def main(workouts_nb: int, users_nb: int, runs: int) -> None:
+    app = create_app()
+    with app.app_context():
+        seed_database(workouts_nb, users_nb)
+        params = get_queries_params()
+        queries = {
+            **QUERIES,
+            'records calculation': get_records_query(params),
+        }
+
+        for index in INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {index}'))
+        results_without_indexes = measure_queries(queries, params, runs)
+        db.session.rollback()
+        results_with_indexes = measure_queries(queries, params, runs)
+        db.session.rollback()
+
+    for name in queries:
+        for label, results in [
+            ('without indexes', results_without_indexes),
+            ('with indexes', results_with_indexes),
+        ]:
+            print(f'\n{name} - {label}:\n{results[name][1]}')
+    print(f"\n{'query':<25} | {'without (ms)':>12} | {'with (ms)':>9}")
+    for name in queries:
+        print(
+            f'{name:<25} | {results_without_indexes[name][0]:>12.2f} | '
+            f'{results_with_indexes[name][0]:>9.2f}'
+        )
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + DEFAULT_ARGS[len(args) :]))  # noqa
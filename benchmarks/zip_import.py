@@ -0,0 +1,92 @@
+"""
+Compare sequential and process pool processing of gpx files from a zip
+archive: gpx parsing, chart data and map generation (database inserts are
+not included).
+
+Map rendering fetches tiles from tile server, so network access is needed.
+
+Usage (from repository root):
+
+    python -m benchmarks.zip_import [files_nb] [points_nb] [processes]
+
+Default: 100 files of 1 000 points, pool of 4 processes.
+"""
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from typing import List
+
+import gpxpy.gpx
+from flask import Flask
+
+from fittrackee.workouts.utils import (
+    get_gpx_files_from_zip_archive,
+    get_workout_files_data,
+    get_workouts_files_data_in_pool,
+)
+
+from .utils import generate_segment
+
+DEFAULT_ARGS = [100, 1_000, 4]
+
+
+def generate_zip_archive(zip_file: str, files_nb: int, points_nb: int) -> None:
+    gpx = gpxpy.gpx.GPX()
+    gpx_track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(gpx_track)
+    gpx_track.segments.append(generate_segment(points_nb))
+    gpx_content = gpx.to_xml()
+    with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for file_idx in range(files_nb):
+            zip_ref.writestr(f'workout_{file_idx}.gpx', gpx_content)
+
+
+def process_sequentially(zip_file: str, gpx_files: List[str]) -> None:
+    for gpx_file in gpx_files:
+        get_workout_files_data(
+            zip_file, gpx_file, 1, 'Cycling', from_zip_archive=True
+        )
+
+
+def main(files_nb: int, points_nb: int, processes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # new files paths are relative to current directory
+        os.chdir(tmp_dir)
+        app = Flask('fittrackee')
+        app.config.update(
+            GPX_STATS_BACKEND='python',
+            UPLOAD_FOLDER=tmp_dir,
+            WORKOUT_ALLOWED_EXTENSIONS={'gpx', 'zip'},
+            gpx_limit_import=files_nb,
+        )
+        zip_file = os.path.join(tmp_dir, 'workouts.zip')
+        generate_zip_archive(zip_file, files_nb, points_nb)
+
+        with app.app_context():
+            gpx_files = get_gpx_files_from_zip_archive(zip_file)
+            start = time.perf_counter()
+            process_sequentially(zip_file, gpx_files)
+            sequential_duration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = get_workouts_files_data_in_pool(
+                zip_file, gpx_files, 1, 'Cycling', processes
+            )
+            pool_duration = time.perf_counter() - start
+
+    errors = [error for _, error in results if error]
+    if errors:
+        print(f'{len(errors)} error(s) in pool: {errors[0]}')
+    print(f"{'mode':<10} | {'duration (s)':>12} | {'files/s':>7}")
+    for mode, duration in [
+        ('sequential', sequential_duration),
+        (f'pool ({processes})', pool_duration),
+    ]:
+        print(f'{mode:<10} | {duration:>12.2f} | {files_nb / duration:>7.1f}')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + DEFAULT_ARGS[len(args) :]))  # noqa
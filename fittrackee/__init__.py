@@ -3,11 +3,20 @@ import os
 from importlib import import_module, reload
 from typing import Any
 
-from flask import Flask, Response, render_template, send_file
+from flask import (
+    Flask,
+    Response,
+    g,
+    has_request_context,
+    render_template,
+    request,
+    send_file,
+)
 from flask_bcrypt import Bcrypt
 from flask_dramatiq import Dramatiq
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 from fittrackee.emails.email import Email
 
@@ -25,6 +34,11 @@ logging.basicConfig(
 appLog = logging.getLogger('fittrackee')
 
 
+def count_request_query(*args: Any) -> None:
+    if has_request_context():
+        g.queries_count = g.get('queries_count', 0) + 1
+
+
 def create_app() -> Flask:
     # instantiate the app
     app = Flask(__name__, static_folder='dist/static', template_folder='dist')
@@ -56,11 +70,19 @@ def create_app() -> Flask:
     with app.app_context():
         # Note: check if "app_config" table exist to avoid errors when
         # dropping tables on dev environments
-        if db.engine.dialect.has_table(db.engine.connect(), 'app_config'):
+        with db.engine.connect() as connection:
+            has_app_config = db.engine.dialect.has_table(
+                connection, 'app_config'
+            )
+        if has_app_config:
             db_app_config = AppConfig.query.one_or_none()
             if not db_app_config:
                 _, db_app_config = init_config()
             update_app_config_from_database(app, db_app_config)
+        # close connections opened on startup, to avoid sharing them with
+        # forked processes (gunicorn workers)
+        db.session.remove()
+        db.engine.dispose()
 
     from .application.app_config import config_blueprint  # noqa
     from .users.auth import auth_blueprint  # noqa
@@ -87,9 +109,23 @@ def create_app() -> Flask:
         logging.getLogger('flake8').propagate = False
         appLog.setLevel(logging.DEBUG)
 
+        # count database queries per request
+        with app.app_context():
+            event.listen(
+                db.engine, 'before_cursor_execute', count_request_query
+            )
+
+        @app.before_request
+        def before_request() -> None:
+            g.queries_count = 0
+
         # Enable CORS
         @app.after_request
         def after_request(response: Response) -> Response:
+            appLog.debug(
+                f'{request.method} {request.path}: '
+                f'{g.get("queries_count", 0)} database queries'
+            )
             response.headers.add('Access-Control-Allow-Origin', '*')
             response.headers.add(
                 'Access-Control-Allow-Headers', 'Content-Type,Authorization'
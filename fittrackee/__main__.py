@@ -13,7 +13,13 @@ from tqdm import tqdm
 from fittrackee import create_app, db
 from fittrackee.application.utils import init_config
 from fittrackee.database_utils import init_database
-from fittrackee.workouts.models import Workout
+from fittrackee.users.utils import reconcile_users_uploads_size
+from fittrackee.workouts.models import (
+    Workout,
+    deferred_records_update,
+    rebuild_users_workouts_counters,
+    rebuild_workouts_daily_stats,
+)
 from fittrackee.workouts.utils import update_workout
 
 HOST = os.getenv('HOST', '0.0.0.0')
@@ -79,10 +85,28 @@ def recalculate() -> None:
         print('➡️  no workouts to upgrade.')
         return None
     pbar = tqdm(workouts)
-    for workout in pbar:
-        update_workout(workout)
-        pbar.set_postfix(activitiy_id=workout.id)
+    with deferred_records_update():
+        for workout in pbar:
+            update_workout(workout)
+            pbar.set_postfix(activitiy_id=workout.id)
+        db.session.commit()
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats() -> None:
+    """Rebuild workouts daily statistics and users workouts counters."""
+    print("Rebuilding workouts daily statistics and users counters")
+    rebuild_workouts_daily_stats(db.session.connection())
+    rebuild_users_workouts_counters(db.session.connection())
     db.session.commit()
+    print("Rebuild done!")
+
+
+@app.cli.command('reconcile-uploads-size')
+def reconcile_uploads_size() -> None:
+    """Update users uploads size with files stored in uploads directory."""
+    corrected_users = reconcile_users_uploads_size()
+    print(f"Uploads size corrected for {corrected_users} user(s).")
 
 
 @app.cli.command('init-app-config')
@@ -1,6 +1,7 @@
 from typing import Dict
 
 from flask import current_app
+from sqlalchemy import func
 from sqlalchemy.engine.base import Connection
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
@@ -25,7 +26,9 @@ class AppConfig(BaseModel):
 
     @property
     def is_registration_enabled(self) -> bool:
-        nb_users = User.query.count()
+        # only users ids are selected, so application can start before
+        # migrations on users table are applied
+        nb_users = db.session.query(func.count(User.id)).scalar()
         return self.max_users == 0 or nb_users < self.max_users
 
     @property
@@ -5,6 +5,8 @@ from dramatiq.brokers.stub import StubBroker
 from flask import current_app
 from sqlalchemy.pool import NullPool
 
+from fittrackee.database_pool import MonitoredQueuePool
+
 if os.getenv('APP_SETTINGS') == 'fittrackee.config.TestingConfig':
     broker = StubBroker
 else:
@@ -17,6 +19,17 @@ class BaseConfig:
     DEBUG = False
     TESTING = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # database connections pool, for each application process
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': MonitoredQueuePool,
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DATABASE_POOL_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE', 3600)),
+        'pool_pre_ping': (
+            os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() == 'true'
+        ),
+    }
     BCRYPT_LOG_ROUNDS = 13
     TOKEN_EXPIRATION_DAYS = 30
     TOKEN_EXPIRATION_SECONDS = 0
@@ -31,6 +44,35 @@ class BaseConfig:
     EMAIL_URL = os.environ.get('EMAIL_URL')
     SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
     DRAMATIQ_BROKER = broker
+    GPX_STATS_BACKEND = os.environ.get('GPX_STATS_BACKEND', 'python')
+    WORKOUTS_IMPORT_PROCESSES = int(
+        os.environ.get('WORKOUTS_IMPORT_PROCESSES', 1)
+    )
+    # maximum size (in MB) of tile cache used to generate static maps
+    STATIC_MAP_TILES_CACHE_SIZE = int(
+        os.environ.get('STATIC_MAP_TILES_CACHE_SIZE', 100)
+    )
+    # maximum sizes (in MB) of tile caches used by map tiles proxy
+    MAP_TILES_CACHE_SIZE = int(os.environ.get('MAP_TILES_CACHE_SIZE', 100))
+    MAP_TILES_MEMORY_CACHE_SIZE = int(
+        os.environ.get('MAP_TILES_MEMORY_CACHE_SIZE', 10)
+    )
+    WORKOUTS_DEFERRED_ENRICHMENT = (
+        os.environ.get('WORKOUTS_DEFERRED_ENRICHMENT', 'false').lower()
+        == 'true'
+    )
+    WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY')
+    # 'darksky' or 'stub' (local provider for tests)
+    WEATHER_PROVIDER = 'darksky'
+    # latency budget (in seconds) to fetch weather data when creating
+    # workouts, missing data being fetched later by a dramatiq worker
+    WEATHER_TIMEOUT = float(os.environ.get('WEATHER_TIMEOUT', 3))
+    # duration (in seconds) application statistics are cached, ``0``
+    # disables cache
+    APP_STATS_CACHE_TTL = int(os.environ.get('APP_STATS_CACHE_TTL', 60))
+    # duration (in seconds) authenticated users attributes are cached,
+    # ``0`` disables cache
+    AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 30))
     TILE_SERVER = {
         'URL': os.environ.get(
             'TILE_SERVER_URL',
@@ -71,6 +113,8 @@ class TestingConfig(BaseConfig):
     TOKEN_EXPIRATION_SECONDS = 3
     PASSWORD_TOKEN_EXPIRATION_SECONDS = 3
     UPLOAD_FOLDER = '/tmp/fitTrackee/uploads'
+    APP_STATS_CACHE_TTL = 0
+    AUTH_USER_CACHE_TTL = 0
 
 
 class ProductionConfig(BaseConfig):
@@ -81,7 +125,7 @@ class ProductionConfig(BaseConfig):
     SQLALCHEMY_ENGINE_OPTIONS = (
         {'poolclass': NullPool}
         if os.getenv('DATABASE_DISABLE_POOLING', False)
-        else {}
+        else BaseConfig.SQLALCHEMY_ENGINE_OPTIONS
     )
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SECRET_KEY = os.getenv('APP_SECRET_KEY')
@@ -0,0 +1,90 @@
+import threading
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Database connections checkouts metrics, for current process (pools
+    recreated on engine disposal share the same metrics)
+    """
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_checkout(self, duration: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_checkout_time += duration
+            self.max_checkout_time = max(self.max_checkout_time, duration)
+
+    def add_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def get_stats(self) -> Dict:
+        """
+        Return checkouts counters and latencies (in ms)
+        """
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_time_avg': (
+                    round(self.total_checkout_time / self.checkouts * 1000, 3)
+                    if self.checkouts
+                    else 0.0
+                ),
+                'checkout_time_max': round(self.max_checkout_time * 1000, 3),
+                'timeouts': self.timeouts,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MonitoredQueuePool(QueuePool):
+    """
+    Queue pool recording connections checkouts latency, that is time spent
+    opening a new connection or waiting for a connection when pool is
+    saturated
+    """
+
+    def _do_get(self) -> Any:
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.add_timeout()
+            raise
+        pool_metrics.add_checkout(perf_counter() - start)
+        return connection
+
+
+def get_database_pool_stats(engine: Engine) -> Optional[Dict]:
+    """
+    Return database connections pool state and checkouts metrics for
+    current process (None if pooling is disabled)
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    max_overflow = pool._max_overflow
+    checked_out = pool.checkedout()
+    # no limit on connections number if max overflow is negative
+    capacity = pool.size() + max_overflow if max_overflow >= 0 else None
+    return {
+        **pool_metrics.get_stats(),
+        'checked_out': checked_out,
+        'max_overflow': max_overflow,
+        'overflow': max(pool.overflow(), 0),
+        'saturation': round(checked_out / capacity, 2) if capacity else None,
+        'size': pool.size(),
+    }
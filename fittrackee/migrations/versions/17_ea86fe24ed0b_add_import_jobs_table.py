@@ -0,0 +1,62 @@
+"""add import jobs table
+
+Revision ID: ea86fe24ed0b
+Revises: 4e8597c50064
+Create Date: 2026-10-18 10:12:43.815207
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'ea86fe24ed0b'
+down_revision = '4e8597c50064'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('uuid', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum(
+                'queued',
+                'in_progress',
+                'completed',
+                'failed',
+                name='import_job_statuses',
+            ),
+            nullable=False,
+        ),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('file_path', sa.String(length=255), nullable=True),
+        sa.Column('workout_data', sa.JSON(), nullable=False),
+        sa.Column('files_count', sa.Integer(), nullable=False),
+        sa.Column('processed_files', sa.Integer(), nullable=False),
+        sa.Column('results', sa.JSON(), nullable=False),
+        sa.Column('message', sa.String(length=255), nullable=True),
+        sa.Column('creation_date', sa.DateTime(), nullable=True),
+        sa.Column('modification_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('uuid'),
+    )
+    op.create_index(
+        op.f('ix_import_jobs_user_id'),
+        'import_jobs',
+        ['user_id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_import_jobs_user_id'), table_name='import_jobs')
+    op.drop_table('import_jobs')
+    op.execute('DROP TYPE import_job_statuses')
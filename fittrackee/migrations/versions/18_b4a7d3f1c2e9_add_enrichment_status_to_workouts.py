@@ -0,0 +1,39 @@
+"""add enrichment status to workouts
+
+Revision ID: b4a7d3f1c2e9
+Revises: ea86fe24ed0b
+Create Date: 2026-10-18 15:02:11.427913
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b4a7d3f1c2e9'
+down_revision = 'ea86fe24ed0b'
+branch_labels = None
+depends_on = None
+
+workout_enrichment_statuses = postgresql.ENUM(
+    'pending', 'completed', 'failed', name='workout_enrichment_statuses'
+)
+
+
+def upgrade():
+    workout_enrichment_statuses.create(op.get_bind())
+    op.add_column(
+        'workouts',
+        sa.Column(
+            'enrichment_status',
+            workout_enrichment_statuses,
+            nullable=True,
+        ),
+    )
+    op.execute("UPDATE workouts SET enrichment_status = 'completed'")
+    op.alter_column('workouts', 'enrichment_status', nullable=False)
+
+
+def downgrade():
+    op.drop_column('workouts', 'enrichment_status')
+    workout_enrichment_statuses.drop(op.get_bind())
@@ -0,0 +1,29 @@
+"""add index on user id, workout date and id to workouts
+
+Revision ID: c3e8f5a2d7b1
+Revises: b4a7d3f1c2e9
+Create Date: 2026-10-18 16:21:37.584102
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8f5a2d7b1'
+down_revision = 'b4a7d3f1c2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_workouts_user_id_workout_date_id',
+        'workouts',
+        ['user_id', 'workout_date', 'id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_workouts_user_id_workout_date_id', table_name='workouts'
+    )
@@ -0,0 +1,37 @@
+"""add indexes on workouts for records calculation and map
+
+Revision ID: d5f1a9c4e3b8
+Revises: c3e8f5a2d7b1
+Create Date: 2026-10-18 17:05:12.318455
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a9c4e3b8'
+down_revision = 'c3e8f5a2d7b1'
+branch_labels = None
+depends_on = None
+
+records_columns = ['ave_speed', 'distance', 'max_speed', 'moving']
+
+
+def upgrade():
+    for column in records_columns:
+        op.create_index(
+            f'ix_workouts_user_id_sport_id_{column}',
+            'workouts',
+            ['user_id', 'sport_id', column],
+            unique=False,
+        )
+    op.create_index(
+        op.f('ix_workouts_map_id'), 'workouts', ['map_id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_workouts_map_id'), table_name='workouts')
+    for column in records_columns:
+        op.drop_index(
+            f'ix_workouts_user_id_sport_id_{column}', table_name='workouts'
+        )
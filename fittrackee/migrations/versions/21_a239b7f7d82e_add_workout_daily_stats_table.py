@@ -0,0 +1,63 @@
+"""add workout daily stats table
+
+Revision ID: a239b7f7d82e
+Revises: d5f1a9c4e3b8
+Create Date: 2026-10-18 19:24:37.502118
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a239b7f7d82e'
+down_revision = 'd5f1a9c4e3b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'workout_daily_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('sport_id', sa.Integer(), nullable=False),
+        sa.Column('local_date', sa.Date(), nullable=False),
+        sa.Column('nb_workouts', sa.Integer(), nullable=False),
+        sa.Column(
+            'total_distance', sa.Numeric(precision=10, scale=3), nullable=False
+        ),
+        sa.Column('total_duration', sa.Integer(), nullable=False),
+        sa.Column(
+            'total_ascent', sa.Numeric(precision=10, scale=2), nullable=False
+        ),
+        sa.Column(
+            'total_descent', sa.Numeric(precision=10, scale=2), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ['sport_id'],
+            ['sports.id'],
+        ),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('user_id', 'sport_id', 'local_date'),
+    )
+    op.execute(
+        """
+        INSERT INTO workout_daily_stats
+        SELECT workouts.user_id, workouts.sport_id,
+               timezone(coalesce(users.timezone, 'UTC'),
+                        timezone('UTC', workouts.workout_date))::date,
+               count(workouts.id),
+               coalesce(sum(workouts.distance), 0),
+               coalesce(sum(extract(epoch FROM workouts.moving)), 0)::int,
+               coalesce(sum(workouts.ascent), 0),
+               coalesce(sum(workouts.descent), 0)
+        FROM workouts
+        JOIN users ON users.id = workouts.user_id
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('workout_daily_stats')
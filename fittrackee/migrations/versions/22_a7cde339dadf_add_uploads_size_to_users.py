@@ -0,0 +1,57 @@
+"""add uploads size to users
+
+Revision ID: a7cde339dadf
+Revises: a239b7f7d82e
+Create Date: 2026-10-18 21:02:16.730542
+
+"""
+import os
+
+import sqlalchemy as sa
+from alembic import op
+from flask import current_app
+
+# revision identifiers, used by Alembic.
+revision = 'a7cde339dadf'
+down_revision = 'a239b7f7d82e'
+branch_labels = None
+depends_on = None
+
+
+def get_user_uploads_size(user_id):
+    total_size = 0
+    for dir_name in ['workouts', 'pictures']:
+        user_dir = os.path.join(
+            current_app.config['UPLOAD_FOLDER'], dir_name, str(user_id)
+        )
+        for dir_path, _, filenames in os.walk(user_dir):
+            for filename in filenames:
+                total_size += os.path.getsize(os.path.join(dir_path, filename))
+    return total_size
+
+
+def upgrade():
+    op.add_column(
+        'users',
+        sa.Column(
+            'uploads_size',
+            sa.BigInteger(),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+    connection = op.get_bind()
+    for (user_id,) in connection.execute(sa.text('SELECT id FROM users')):
+        uploads_size = get_user_uploads_size(user_id)
+        if uploads_size:
+            connection.execute(
+                sa.text(
+                    'UPDATE users SET uploads_size = :uploads_size '
+                    'WHERE id = :user_id'
+                ),
+                {'uploads_size': uploads_size, 'user_id': user_id},
+            )
+
+
+def downgrade():
+    op.drop_column('users', 'uploads_size')
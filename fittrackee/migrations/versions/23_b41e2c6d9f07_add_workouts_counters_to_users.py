@@ -0,0 +1,89 @@
+"""add workouts counters to users
+
+Revision ID: b41e2c6d9f07
+Revises: a7cde339dadf
+Create Date: 2026-10-18 22:14:51.308164
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b41e2c6d9f07'
+down_revision = 'a7cde339dadf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'users',
+        sa.Column(
+            'nb_workouts', sa.Integer(), server_default='0', nullable=False
+        ),
+    )
+    op.add_column(
+        'users',
+        sa.Column(
+            'nb_sports', sa.Integer(), server_default='0', nullable=False
+        ),
+    )
+    op.add_column(
+        'users',
+        sa.Column(
+            'sports_list', postgresql.ARRAY(sa.Integer()), nullable=True
+        ),
+    )
+    op.add_column(
+        'users',
+        sa.Column(
+            'total_distance',
+            sa.Numeric(precision=12, scale=3),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        'users',
+        sa.Column(
+            'total_duration',
+            sa.Interval(),
+            server_default=sa.text("'0'::interval"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        op.f('ix_users_nb_workouts'), 'users', ['nb_workouts'], unique=False
+    )
+    op.execute(
+        """
+        UPDATE users
+        SET nb_workouts = workouts_counters.nb_workouts,
+            nb_sports = workouts_counters.nb_sports,
+            sports_list = workouts_counters.sports_list,
+            total_distance = workouts_counters.total_distance,
+            total_duration = workouts_counters.total_duration
+        FROM (
+            SELECT user_id,
+                   count(id) AS nb_workouts,
+                   count(DISTINCT sport_id) AS nb_sports,
+                   array_agg(DISTINCT sport_id ORDER BY sport_id)
+                     AS sports_list,
+                   coalesce(sum(distance), 0) AS total_distance,
+                   sum(duration) AS total_duration
+            FROM workouts
+            GROUP BY user_id
+        ) AS workouts_counters
+        WHERE users.id = workouts_counters.user_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_users_nb_workouts'), table_name='users')
+    op.drop_column('users', 'total_duration')
+    op.drop_column('users', 'total_distance')
+    op.drop_column('users', 'sports_list')
+    op.drop_column('users', 'nb_sports')
+    op.drop_column('users', 'nb_workouts')
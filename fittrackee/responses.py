@@ -29,7 +29,7 @@ def display_readable_file_size(size_in_bytes: Union[float, int]) -> str:
 class HttpResponse(Response):
     def __init__(
         self,
-        response: Optional[Union[str, Dict]] = None,
+        response: Optional[Union[str, bytes, Dict]] = None,
         status_code: Optional[int] = None,
         content_type: Optional[str] = None,
     ) -> None:
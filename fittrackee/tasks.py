@@ -1,6 +1,10 @@
 from typing import Dict
 
 from fittrackee import dramatiq, email_service
+from fittrackee.workouts.utils import (
+    process_import_job,
+    process_workout_enrichment,
+)
 
 
 @dramatiq.actor(queue_name='fittrackee_emails')
@@ -11,3 +15,16 @@ def reset_password_email(user: Dict, email_data: Dict) -> None:
         recipient=user['email'],
         data=email_data,
     )
+
+
+# no retry, to avoid creating workouts twice
+@dramatiq.actor(queue_name='fittrackee_workouts', max_retries=0)
+def import_workouts(import_job_id: int) -> None:
+    for workout_id in process_import_job(import_job_id):
+        enrich_workout.send(workout_id)
+
+
+# idempotent: only missing map image and weather data are added
+@dramatiq.actor(queue_name='fittrackee_workouts')
+def enrich_workout(workout_id: int) -> None:
+    process_workout_enrichment(workout_id)
@@ -0,0 +1,48 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from fittrackee import create_app, db
+from fittrackee.database_pool import (
+    MonitoredQueuePool,
+    get_database_pool_stats,
+    pool_metrics,
+)
+
+
+class TestCreateApp:
+    def test_it_closes_connections_opened_on_startup(self, app: Flask) -> None:
+        new_app = create_app()
+
+        with new_app.app_context():
+            assert db.engine.pool.checkedout() == 0
+            assert db.engine.pool.checkedin() == 0
+
+
+class TestMonitoredQueuePool:
+    def test_it_records_checkouts_and_timeouts(self, app: Flask) -> None:
+        engine = create_engine(
+            app.config['SQLALCHEMY_DATABASE_URI'],
+            poolclass=MonitoredQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.1,
+        )
+        checkouts = pool_metrics.checkouts
+        timeouts = pool_metrics.timeouts
+
+        try:
+            with engine.connect():
+                with pytest.raises(PoolTimeoutError):
+                    engine.connect()
+                pool_stats = get_database_pool_stats(engine)
+        finally:
+            engine.dispose()
+
+        assert pool_stats is not None
+        assert pool_stats['checkouts'] == checkouts + 1
+        assert pool_stats['timeouts'] == timeouts + 1
+        assert pool_stats['checked_out'] == 1
+        assert pool_stats['saturation'] == 1.0
+        assert pool_stats['size'] == 1
@@ -1,16 +1,21 @@
 import json
+import logging
 from datetime import datetime, timedelta
 from io import BytesIO
 from unittest.mock import Mock, patch
 
+import pytest
 from flask import Flask
 from freezegun import freeze_time
 
+from fittrackee import db
+from fittrackee.users import utils_cache
 from fittrackee.users.models import User
 from fittrackee.users.utils_token import get_user_token
 from fittrackee.workouts.models import Sport, Workout
 
 from ..api_test_case import ApiTestCaseMixin
+from ..workouts.utils import count_queries
 
 
 class TestUserRegistration:
@@ -736,6 +741,28 @@ class TestUserPicture(ApiTestCaseMixin):
         assert 'avatar.png' not in user_1.picture
         assert 'avatar2.png' in user_1.picture
 
+    def test_it_updates_user_uploads_size(
+        self, app: Flask, user_1: User
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        for picture in [b'avatar', b'avatar2']:
+            client.post(
+                '/api/auth/picture',
+                data=dict(file=(BytesIO(picture), 'avatar.png')),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+            assert user_1.uploads_size == len(picture)
+
+        client.delete(
+            '/api/auth/picture',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        assert user_1.uploads_size == 0
+
     def test_it_returns_error_if_file_is_missing(
         self, app: Flask, user_1: User
     ) -> None:
@@ -1171,3 +1198,145 @@ class TestPasswordUpdate:
         data = json.loads(response.data.decode())
         assert data['status'] == 'success'
         assert data['message'] == 'Password updated.'
+
+
+class TestUserAuthentication(ApiTestCaseMixin):
+    def test_it_loads_authenticated_user_once_per_request(
+        self, app: Flask, user_1: User, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        caplog.set_level(logging.DEBUG, logger='fittrackee')
+
+        with count_queries() as queries:
+            response = client.get(
+                '/api/auth/profile',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        assert response.status_code == 200
+        assert len([query for query in queries if 'FROM users' in query]) == 1
+        assert 'GET /api/auth/profile: 1 database queries' in caplog.messages
+
+    def test_it_does_not_query_user_when_user_attributes_are_cached(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(utils_cache, '_cached_users', {})
+        app.config['AUTH_USER_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        client.get(
+            '/api/sports',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        with count_queries() as queries:
+            response = client.get(
+                '/api/sports',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        assert response.status_code == 200
+        assert not [query for query in queries if 'FROM users' in query]
+
+    def test_it_invalidates_cached_user_on_user_update(
+        self,
+        app: Flask,
+        user_1_admin: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(utils_cache, '_cached_users', {})
+        app.config['AUTH_USER_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, as_admin=True
+        )
+        client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        user_1_admin.admin = False
+        db.session.commit()
+
+        response = client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 403
+
+    def test_it_invalidates_cached_user_on_user_delete(
+        self,
+        app: Flask,
+        user_1: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(utils_cache, '_cached_users', {})
+        app.config['AUTH_USER_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        client.get(
+            '/api/sports',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        db.session.delete(user_1)
+        db.session.commit()
+
+        response = client.get(
+            '/api/sports',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 401
+
+    def test_it_checks_admin_rights_against_database_when_user_is_cached(
+        self,
+        app: Flask,
+        user_1_admin: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(utils_cache, '_cached_users', {})
+        app.config['AUTH_USER_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, as_admin=True
+        )
+        client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        # bulk update does not invalidate cache (as an update made by
+        # another process)
+        User.query.filter_by(id=user_1_admin.id).update({'admin': False})
+        db.session.commit()
+
+        response = client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 403
+
+    def test_it_returns_error_when_cached_user_no_longer_exists(
+        self,
+        app: Flask,
+        user_1: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(utils_cache, '_cached_users', {})
+        app.config['AUTH_USER_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        client.get(
+            '/api/auth/profile',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        # bulk delete does not invalidate cache (as a deletion made by
+        # another process)
+        User.query.filter_by(id=user_1.id).delete()
+        db.session.commit()
+
+        response = client.get(
+            '/api/auth/profile',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 401
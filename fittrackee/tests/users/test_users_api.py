@@ -9,6 +9,7 @@ from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
 
 from ..api_test_case import ApiTestCaseMixin
+from ..workouts.utils import count_queries
 
 
 class TestGetUser(ApiTestCaseMixin):
@@ -598,6 +599,44 @@ class TestGetUsers(ApiTestCaseMixin):
             'total': 3,
         }
 
+    def test_it_gets_users_list_without_querying_workouts(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        user_3: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+        workout_cycling_user_2: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        with count_queries() as queries:
+            response = client.get(
+                '/api/users?order_by=workouts_count&order=desc',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        data = json.loads(response.data.decode())
+        assert [
+            (
+                user['username'],
+                user['nb_workouts'],
+                user['nb_sports'],
+                user['sports_list'],
+                user['total_distance'],
+                user['total_duration'],
+            )
+            for user in data['data']['users']
+        ] == [
+            ('test', 2, 2, [1, 2], 22.0, '2:40:00'),
+            ('toto', 1, 1, [1], 15.0, '1:00:00'),
+            ('sam', 0, 0, [], 0.0, '0:00:00'),
+        ]
+        assert not [query for query in queries if 'FROM workouts' in query]
+
     def test_it_gets_users_list_ordered_by_workouts_count(
         self,
         app: Flask,
@@ -1,6 +1,30 @@
+from datetime import timedelta
+from typing import Tuple
+
 from flask import Flask
 
+from fittrackee import db
 from fittrackee.users.models import User
+from fittrackee.users.utils import (
+    get_user_uploads_size,
+    reconcile_users_uploads_size,
+)
+from fittrackee.workouts.models import (
+    Sport,
+    Workout,
+    rebuild_users_workouts_counters,
+)
+
+
+def get_workouts_counters(user: User) -> Tuple:
+    db.session.refresh(user)
+    return (
+        user.nb_workouts,
+        user.nb_sports,
+        user.sports_list,
+        float(user.total_distance),
+        user.total_duration,
+    )
 
 
 class TestUserModel:
@@ -37,3 +61,100 @@ class TestUserModel:
         auth_token = user_1.encode_auth_token(user_1.id)
         assert isinstance(auth_token, str)
         assert User.decode_auth_token(auth_token) == user_1.id
+
+
+class TestUserUploadsSize:
+    def test_it_reconciles_uploads_size_with_stored_files(
+        self, app: Flask, user_1: User, user_2: User
+    ) -> None:
+        user_1.uploads_size = -1
+        user_2.uploads_size = get_user_uploads_size(user_2.id)
+        db.session.commit()
+
+        corrected_users = reconcile_users_uploads_size()
+
+        assert corrected_users == 1
+        assert user_1.uploads_size == get_user_uploads_size(user_1.id)
+
+
+class TestUserWorkoutsCounters:
+    def test_it_updates_counters_on_workouts_insert(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+    ) -> None:
+        assert get_workouts_counters(user_1) == (
+            2,
+            2,
+            [1, 2],
+            22.0,
+            timedelta(seconds=9600),
+        )
+
+    def test_it_updates_counters_on_workout_update(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+    ) -> None:
+        workout_running_user_1.sport_id = 1
+        workout_running_user_1.distance = 8
+        workout_running_user_1.duration = timedelta(seconds=1200)
+        db.session.commit()
+
+        assert get_workouts_counters(user_1) == (
+            2,
+            1,
+            [1],
+            18.0,
+            timedelta(seconds=4800),
+        )
+
+    def test_it_updates_counters_on_workout_delete(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+    ) -> None:
+        db.session.delete(workout_running_user_1)
+        db.session.commit()
+
+        assert get_workouts_counters(user_1) == (
+            1,
+            1,
+            [1],
+            10.0,
+            timedelta(seconds=3600),
+        )
+
+    def test_it_rebuilds_counters(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        counters = get_workouts_counters(user_1)
+        user_1.nb_workouts = 0
+        user_1.nb_sports = 0
+        user_1.sports_list = None
+        user_1.total_distance = 0
+        user_1.total_duration = timedelta(0)
+        db.session.commit()
+
+        rebuild_users_workouts_counters(db.session.connection())
+        db.session.commit()
+
+        assert get_workouts_counters(user_1) == counters
+        assert get_workouts_counters(user_2) == (0, 0, [], 0.0, timedelta(0))
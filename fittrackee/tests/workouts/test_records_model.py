@@ -1,9 +1,20 @@
 import datetime
+from typing import Dict
+from unittest.mock import patch
 
+import pytest
 from flask import Flask
 
+from fittrackee import db
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Record, Sport, Workout
+from fittrackee.workouts.models import (
+    Record,
+    Sport,
+    Workout,
+    deferred_records_update,
+)
+
+from .utils import count_queries
 
 
 class TestRecordModel:
@@ -164,3 +175,236 @@ class TestRecordModel:
         record_serialize = record_ms.serialize()
         assert record_serialize.get('value') == 10.0
         assert isinstance(record_serialize.get('value'), float)
+
+
+class TestGetUsersWorkoutsRecords:
+    def test_oldest_workout_holds_record_on_same_value(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = Workout(
+            user_id=1,
+            sport_id=1,
+            workout_date=datetime.datetime(2018, 2, 1),
+            distance=10,
+            duration=datetime.timedelta(seconds=1800),
+        )
+        workout.moving = workout.duration
+        workout.ave_speed = 20
+        workout.max_speed = 20
+        db.session.add(workout)
+        db.session.commit()
+
+        records = Workout.get_user_workout_records(1, 1)
+
+        assert records['AS']['workout'] == workout
+        assert records['FD']['workout'] == workout_cycling_user_1
+        assert records['LD']['workout'] == workout_cycling_user_1
+        assert records['MS']['workout'] == workout
+        assert {
+            (record.record_type, record.workout_id)
+            for record in Record.query.filter_by(user_id=1, sport_id=1)
+        } == {
+            ('AS', workout.id),
+            ('FD', workout_cycling_user_1.id),
+            ('LD', workout_cycling_user_1.id),
+            ('MS', workout.id),
+        }
+
+    def test_it_gets_records_for_several_users_and_sports_in_one_query(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+        workout_cycling_user_2: Workout,
+    ) -> None:
+        with count_queries() as queries:
+            records = Workout.get_users_workouts_records(
+                [(1, 1), (1, 2), (2, 1), (2, 2)]
+            )
+
+        assert len(queries) == 1
+        assert records[(1, 1)]['FD']['workout'] == workout_cycling_user_1
+        assert records[(1, 2)]['FD']['workout'] == workout_running_user_1
+        assert records[(1, 2)]['AS']['record_value'] is None
+        assert records[(2, 1)]['FD']['workout'] == workout_cycling_user_2
+        assert records[(2, 2)]['FD']['workout'] is None
+
+
+class TestIncrementalRecords:
+    @staticmethod
+    def add_workout(
+        workout_date: datetime.datetime, distance: float, speed: float
+    ) -> Workout:
+        workout = Workout(
+            user_id=1,
+            sport_id=1,
+            workout_date=workout_date,
+            distance=distance,
+            duration=datetime.timedelta(seconds=1800),
+        )
+        workout.moving = workout.duration
+        workout.ave_speed = speed
+        workout.max_speed = speed
+        db.session.add(workout)
+        db.session.commit()
+        return workout
+
+    @staticmethod
+    def get_records_workouts() -> Dict[str, int]:
+        return {
+            record.record_type: record.workout_id
+            for record in Record.query.filter_by(user_id=1, sport_id=1)
+        }
+
+    def test_it_updates_records_beaten_by_new_workout_without_recalculation(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with count_queries() as queries:
+            workout = self.add_workout(
+                datetime.datetime(2018, 2, 1), distance=20, speed=5
+            )
+
+        assert not [query for query in queries if 'row_number' in query]
+        assert self.get_records_workouts() == {
+            'AS': workout_cycling_user_1.id,
+            'FD': workout.id,
+            'LD': workout_cycling_user_1.id,
+            'MS': workout_cycling_user_1.id,
+        }
+
+    def test_older_workout_with_same_value_holds_record(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = self.add_workout(
+            datetime.datetime(2017, 12, 1), distance=10, speed=5
+        )
+
+        assert self.get_records_workouts()['FD'] == workout.id
+
+    def test_it_recalculates_records_when_record_workout_is_edited(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = self.add_workout(
+            datetime.datetime(2018, 2, 1), distance=20, speed=5
+        )
+
+        workout.distance = 5
+        db.session.commit()
+
+        assert self.get_records_workouts()['FD'] == workout_cycling_user_1.id
+
+
+class TestDeferredRecordsUpdate:
+    def test_it_updates_records_once_when_exiting_context(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+    ) -> None:
+        with count_queries() as queries:
+            with deferred_records_update():
+                for day, sport_id in [(1, 1), (2, 2), (3, 1)]:
+                    db.session.add(
+                        Workout(
+                            user_id=1,
+                            sport_id=sport_id,
+                            workout_date=datetime.datetime(2018, 1, day),
+                            distance=day,
+                            duration=datetime.timedelta(seconds=3600),
+                        )
+                    )
+                    db.session.commit()
+                assert Record.query.count() == 0
+
+        assert len([query for query in queries if 'row_number' in query]) == 1
+        assert {
+            (record.sport_id, record.workout_date)
+            for record in Record.query.filter_by(record_type='FD')
+        } == {
+            (1, datetime.datetime(2018, 1, 3)),
+            (2, datetime.datetime(2018, 1, 2)),
+        }
+
+    def test_it_updates_records_after_error(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        with pytest.raises(ValueError):
+            with deferred_records_update():
+                db.session.add(
+                    Workout(
+                        user_id=1,
+                        sport_id=1,
+                        workout_date=datetime.datetime(2018, 1, 1),
+                        distance=10,
+                        duration=datetime.timedelta(seconds=3600),
+                    )
+                )
+                db.session.commit()
+                raise ValueError()
+
+        assert Record.query.filter_by(record_type='FD').count() == 1
+
+    def test_it_raises_initial_error_when_records_update_fails(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        with patch(
+            'fittrackee.workouts.models.update_records',
+            side_effect=Exception(),
+        ), pytest.raises(ValueError):
+            with deferred_records_update():
+                db.session.add(
+                    Workout(
+                        user_id=1,
+                        sport_id=1,
+                        workout_date=datetime.datetime(2018, 1, 1),
+                        distance=10,
+                        duration=datetime.timedelta(seconds=3600),
+                    )
+                )
+                db.session.commit()
+                raise ValueError()
+
+        assert Workout.query.count() == 1
+        assert Record.query.count() == 0
+
+    def test_it_updates_records_of_previous_sport(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with deferred_records_update():
+            workout_cycling_user_1.sport_id = 2
+            db.session.commit()
+
+        assert Record.query.filter_by(sport_id=1).count() == 0
+        assert Record.query.filter_by(sport_id=2).count() == 4
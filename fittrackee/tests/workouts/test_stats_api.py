@@ -2,10 +2,12 @@ import json
 
 from flask import Flask
 
+from fittrackee import db
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
 
 from ..api_test_case import ApiTestCaseMixin
+from .utils import count_queries
 
 
 class TestGetStatsByTime(ApiTestCaseMixin):
@@ -403,14 +405,14 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1024,
                 }
             },
-            '2017-06': {
+            '2017-05': {
                 '1': {
                     'nb_workouts': 1,
                     'total_distance': 10.0,
                     'total_duration': 3456,
                 }
             },
-            '2018-01': {
+            '2017-12': {
                 '1': {
                     'nb_workouts': 1,
                     'total_distance': 10.0,
@@ -424,7 +426,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1600,
                 }
             },
-            '2018-04': {
+            '2018-03': {
                 '1': {
                     'nb_workouts': 1,
                     'total_distance': 8.0,
@@ -445,6 +447,49 @@ class TestGetStatsByTime(ApiTestCaseMixin):
             },
         }
 
+    def test_it_gets_stats_by_month_after_timezone_update(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        client.post(
+            '/api/auth/profile/edit',
+            content_type='application/json',
+            data=json.dumps(
+                dict(
+                    first_name='John',
+                    last_name='Doe',
+                    location='Somewhere',
+                    bio='Nothing to tell',
+                    birth_date='1980-01-01',
+                    timezone='America/New_York',
+                    weekm=True,
+                    language='fr',
+                )
+            ),
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        response = client.get(
+            f'/api/stats/{user_1.username}/by_time?time=month',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['data']['statistics'] == {
+            '2017-12': {
+                '1': {
+                    'nb_workouts': 1,
+                    'total_distance': 10.0,
+                    'total_duration': 3600,
+                }
+            },
+        }
+
     def test_it_gets_stats_by_month_for_april_2018(
         self,
         app: Flask,
@@ -527,7 +572,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1600,
                 }
             },
-            '2018-04-01': {
+            '2018-03-25': {
                 '1': {
                     'nb_workouts': 1,
                     'total_distance': 8.0,
@@ -833,6 +878,7 @@ class TestGetAllStats(ApiTestCaseMixin):
         assert data['data']['sports'] == 0
         assert data['data']['users'] == 2
         assert 'uploads_dir_size' in data['data']
+        assert 'static_map_tiles_cache' in data['data']
 
     def test_it_gets_app_all_stats_with_workouts(
         self,
@@ -862,6 +908,81 @@ class TestGetAllStats(ApiTestCaseMixin):
         assert data['data']['sports'] == 2
         assert data['data']['users'] == 3
         assert 'uploads_dir_size' in data['data']
+        assert 'static_map_tiles_cache' in data['data']
+
+    def test_it_gets_database_pool_metrics(
+        self,
+        app: Flask,
+        user_1_admin: User,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, as_admin=True
+        )
+
+        response = client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        database_pool = data['data']['database_pool']
+        assert (
+            database_pool['size']
+            == app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size']
+        )
+        assert database_pool['checked_out'] >= 1
+        assert database_pool['checkouts'] >= 1
+        assert 0 < database_pool['saturation'] <= 1
+
+    def test_it_gets_uploads_dir_size_from_users(
+        self,
+        app: Flask,
+        user_1_admin: User,
+        user_2: User,
+    ) -> None:
+        user_1_admin.uploads_size = 1000
+        user_2.uploads_size = 234
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, as_admin=True
+        )
+
+        response = client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert data['data']['uploads_dir_size'] == 1234
+
+    def test_it_returns_cached_stats(
+        self,
+        app: Flask,
+        user_1_admin: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        app.config['APP_STATS_CACHE_TTL'] = 60
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, as_admin=True
+        )
+        client.get(
+            '/api/stats/all',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        db.session.delete(workout_cycling_user_1)
+        db.session.commit()
+
+        with count_queries() as queries:
+            response = client.get(
+                '/api/stats/all',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        data = json.loads(response.data.decode())
+        assert data['data']['workouts'] == 1
+        assert not [query for query in queries if 'FROM workouts' in query]
 
     def test_it_returns_error_if_user_has_no_admin_rights(
         self,
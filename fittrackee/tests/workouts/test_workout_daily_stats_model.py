@@ -0,0 +1,112 @@
+import datetime
+from typing import Dict, Tuple
+
+from flask import Flask
+
+from fittrackee import db
+from fittrackee.users.models import User
+from fittrackee.workouts.models import (
+    Sport,
+    Workout,
+    WorkoutDailyStats,
+    rebuild_workouts_daily_stats,
+)
+
+
+def get_daily_stats() -> Dict[Tuple[int, datetime.date], Tuple]:
+    return {
+        (daily_stats.sport_id, daily_stats.local_date): (
+            daily_stats.nb_workouts,
+            float(daily_stats.total_distance),
+            daily_stats.total_duration,
+            float(daily_stats.total_ascent),
+            float(daily_stats.total_descent),
+        )
+        for daily_stats in WorkoutDailyStats.query.all()
+    }
+
+
+class TestWorkoutDailyStatsModel:
+    def test_it_adds_workout_to_daily_stats(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = Workout(
+            user_id=1,
+            sport_id=1,
+            workout_date=datetime.datetime(2018, 1, 1, 18),
+            distance=5,
+            duration=datetime.timedelta(seconds=1800),
+        )
+        workout.moving = workout.duration
+        workout.ascent = 120
+        workout.descent = 100
+        db.session.add(workout)
+        db.session.commit()
+
+        assert get_daily_stats() == {
+            (1, datetime.date(2018, 1, 1)): (2, 15.0, 5400, 120.0, 100.0)
+        }
+
+    def test_it_uses_user_timezone_for_date(
+        self,
+        app: Flask,
+        user_1_full: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        # 2018-01-01 00:00 UTC in New York
+        assert get_daily_stats() == {
+            (1, datetime.date(2017, 12, 31)): (1, 10.0, 3600, 0.0, 0.0)
+        }
+
+    def test_it_moves_workout_values_on_update(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout_cycling_user_1.sport_id = 2
+        workout_cycling_user_1.workout_date = datetime.datetime(2018, 1, 2)
+        workout_cycling_user_1.distance = 12
+        db.session.commit()
+
+        assert get_daily_stats() == {
+            (2, datetime.date(2018, 1, 2)): (1, 12.0, 3600, 0.0, 0.0)
+        }
+
+    def test_it_removes_daily_stats_on_last_workout_delete(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        db.session.delete(workout_cycling_user_1)
+        db.session.commit()
+
+        assert WorkoutDailyStats.query.count() == 0
+
+    def test_it_rebuilds_daily_stats_with_user_timezone(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        daily_stats = get_daily_stats()
+        user_1.timezone = 'America/New_York'
+        db.session.commit()
+
+        rebuild_workouts_daily_stats(db.session.connection(), user_1.id)
+        db.session.commit()
+
+        assert get_daily_stats() == {
+            (sport_id, local_date - datetime.timedelta(days=1)): values
+            for (sport_id, local_date), values in daily_stats.items()
+        }
@@ -1,14 +1,18 @@
 import json
-from unittest.mock import patch
+from datetime import datetime
+from typing import Dict
+from unittest.mock import Mock, patch
 from uuid import uuid4
 
+import pytest
 from flask import Flask
+from flask.testing import FlaskClient
 
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
 
 from ..api_test_case import ApiTestCaseMixin
-from .utils import get_random_short_id
+from .utils import count_queries, get_random_short_id
 
 
 class TestGetWorkouts(ApiTestCaseMixin):
@@ -660,6 +664,255 @@ class TestGetWorkoutsWithFiltersAndPagination(ApiTestCaseMixin):
         )
 
 
+class TestGetWorkoutsWithCursorPagination(ApiTestCaseMixin):
+    @staticmethod
+    def get_workouts(client: FlaskClient, auth_token: str, url: str) -> Dict:
+        response = client.get(
+            url, headers=dict(Authorization=f'Bearer {auth_token}')
+        )
+        assert response.status_code == 200
+        return json.loads(response.data.decode())
+
+    def test_it_does_not_return_cursors_without_cursor(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        data = self.get_workouts(client, auth_token, '/api/workouts')
+
+        assert 'pagination' not in data
+
+    def test_it_gets_first_page_with_empty_cursor(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        data = self.get_workouts(
+            client, auth_token, '/api/workouts?cursor=&per_page=3'
+        )
+
+        assert [
+            workout['workout_date'] for workout in data['data']['workouts']
+        ] == [
+            'Wed, 09 May 2018 00:00:00 GMT',
+            'Sun, 01 Apr 2018 00:00:00 GMT',
+            'Fri, 23 Feb 2018 00:00:00 GMT',
+        ]
+        assert data['pagination']['has_next'] is True
+        assert data['pagination']['has_prev'] is False
+        assert data['pagination']['next_cursor'] is not None
+        assert data['pagination']['prev_cursor'] is None
+
+    def test_it_gets_all_workouts_with_next_cursors(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        workouts_ids = []
+        cursor = ''
+        pages_count = 0
+
+        while cursor is not None:
+            data = self.get_workouts(
+                client, auth_token, f'/api/workouts?cursor={cursor}&per_page=3'
+            )
+            workouts_ids += [
+                workout['id'] for workout in data['data']['workouts']
+            ]
+            cursor = data['pagination']['next_cursor']
+            pages_count += 1
+
+        assert pages_count == 3
+        assert workouts_ids == [
+            workout.short_id
+            for workout in Workout.query.order_by(
+                Workout.workout_date.desc(), Workout.id.asc()
+            ).all()
+        ]
+
+    def test_it_gets_previous_page_with_prev_cursor(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        first_page = self.get_workouts(
+            client, auth_token, '/api/workouts?cursor=&per_page=3'
+        )
+        second_page = self.get_workouts(
+            client,
+            auth_token,
+            '/api/workouts?per_page=3&cursor='
+            + first_page['pagination']['next_cursor'],
+        )
+        assert second_page['pagination']['has_prev'] is True
+
+        data = self.get_workouts(
+            client,
+            auth_token,
+            '/api/workouts?per_page=3&cursor='
+            + second_page['pagination']['prev_cursor'],
+        )
+
+        assert data['data']['workouts'] == first_page['data']['workouts']
+        assert data['pagination']['has_next'] is True
+        assert data['pagination']['has_prev'] is False
+
+    def test_it_gets_next_page_with_filters_and_ascending_order(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        url = '/api/workouts?from=2017-05-01&per_page=2&order=asc&cursor='
+        first_page = self.get_workouts(client, auth_token, url)
+
+        data = self.get_workouts(
+            client, auth_token, url + first_page['pagination']['next_cursor']
+        )
+
+        assert [
+            workout['workout_date'] for workout in data['data']['workouts']
+        ] == [
+            'Fri, 23 Feb 2018 00:00:00 GMT',
+            'Fri, 23 Feb 2018 00:00:00 GMT',
+        ]
+        assert data['pagination']['has_next'] is True
+        assert data['pagination']['has_prev'] is True
+
+    @pytest.mark.parametrize('input_order', ['asc', 'desc'])
+    def test_it_returns_workouts_with_same_date_in_same_order_as_page(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+        input_order: str,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        # 2 workouts are on 23 Feb 2018
+        url = (
+            f'/api/workouts?from=2018-02-23&to=2018-02-23&order={input_order}'
+        )
+
+        page_data = self.get_workouts(client, auth_token, url)
+        cursor_data = self.get_workouts(client, auth_token, f'{url}&cursor=')
+
+        assert len(page_data['data']['workouts']) == 2
+        assert [
+            workout['id'] for workout in cursor_data['data']['workouts']
+        ] == [workout['id'] for workout in page_data['data']['workouts']]
+
+    def test_it_returns_error_on_invalid_cursor(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        response = client.get(
+            '/api/workouts?cursor=invalid',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert 'error' in data['status']
+        assert 'Invalid cursor.' in data['message']
+
+
+class TestGetWorkoutsWithAdjacentWorkouts(ApiTestCaseMixin):
+    def test_it_returns_adjacent_workouts_matching_filters(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        response = client.get(
+            '/api/workouts?from=2017-05-01&page=2',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert len(data['data']['workouts']) == 1
+        assert (
+            'Thu, 01 Jun 2017 00:00:00 GMT'
+            == data['data']['workouts'][0]['workout_date']
+        )
+        assert data['data']['workouts'][0]['previous_workout'] is None
+        next_workout = Workout.query.filter_by(
+            workout_date=datetime(2018, 1, 1)
+        ).first()
+        assert (
+            data['data']['workouts'][0]['next_workout']
+            == next_workout.short_id
+        )
+
+    def test_it_returns_adjacent_workouts_for_each_workout(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        response = client.get(
+            '/api/workouts?order=asc&per_page=7',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        workouts = json.loads(response.data.decode())['data']['workouts']
+        assert [workout['previous_workout'] for workout in workouts] == [
+            None
+        ] + [workout['id'] for workout in workouts[:-1]]
+        assert [workout['next_workout'] for workout in workouts] == [
+            workout['id'] for workout in workouts[1:]
+        ] + [None]
+
+    def test_queries_count_does_not_depend_on_workouts_count(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        queries_count = []
+
+        for per_page in [1, 7]:
+            with count_queries() as queries:
+                response = client.get(
+                    f'/api/workouts?per_page={per_page}',
+                    headers=dict(Authorization=f'Bearer {auth_token}'),
+                )
+            assert response.status_code == 200
+            queries_count.append(len(queries))
+
+        assert queries_count[0] == queries_count[1]
+
+
 class TestGetWorkout(ApiTestCaseMixin):
     def test_it_gets_an_workout(
         self,
@@ -865,3 +1118,86 @@ class TestGetWorkout(ApiTestCaseMixin):
         assert response.status_code == 404
         assert 'not found' in data['status']
         assert 'Map does not exist' in data['message']
+
+
+class TestGetMapTile:
+    @staticmethod
+    def get_tile_response(status_code: int = 200) -> Mock:
+        return Mock(
+            status_code=status_code,
+            content=b'tile' if status_code == 200 else b'error',
+            headers={'content-type': 'image/png'},
+        )
+
+    def test_it_returns_tile_with_cache_headers(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        client = app.test_client()
+
+        with patch(
+            'requests.Session.get', return_value=self.get_tile_response()
+        ) as get_mock:
+            response = client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+
+        assert response.status_code == 200
+        assert response.data == b'tile'
+        assert response.content_type == 'image/png'
+        assert response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'public, max-age=604800'
+        get_mock.assert_called_once_with(
+            'https://a.tile.openstreetmap.org/13/4109/2930.png',
+            headers={'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'},
+            timeout=10,
+        )
+
+    def test_it_returns_cached_tile(self, app: Flask, tmp_path: str) -> None:
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        client = app.test_client()
+
+        with patch(
+            'requests.Session.get', return_value=self.get_tile_response()
+        ) as get_mock:
+            client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+            response = client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+
+        assert response.status_code == 200
+        assert response.data == b'tile'
+        get_mock.assert_called_once()
+
+    def test_it_returns_304_when_tile_is_not_modified(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        client = app.test_client()
+
+        with patch(
+            'requests.Session.get', return_value=self.get_tile_response()
+        ):
+            etag = client.get(
+                '/api/workouts/map_tile/a/13/4109/2930.png'
+            ).headers['ETag']
+            response = client.get(
+                '/api/workouts/map_tile/a/13/4109/2930.png',
+                headers={'If-None-Match': etag},
+            )
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_it_returns_tile_server_error_without_caching_it(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        client = app.test_client()
+
+        with patch(
+            'requests.Session.get', return_value=self.get_tile_response(404)
+        ) as get_mock:
+            client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+            response = client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+
+        assert response.status_code == 404
+        assert 'ETag' not in response.headers
+        assert 'Cache-Control' not in response.headers
+        assert get_mock.call_count == 2
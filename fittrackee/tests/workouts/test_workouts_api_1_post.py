@@ -1,17 +1,33 @@
 import json
 import os
 import re
+import struct
 from datetime import datetime
 from io import BytesIO
-from typing import Dict
+from multiprocessing import get_context
+from typing import BinaryIO, Dict, Set, Tuple
+from unittest.mock import patch
 
+import pytest
 from flask import Flask
+from flask.testing import FlaskClient
 
+from fittrackee import db
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.models import ImportJob, Record, Sport, Workout
+from fittrackee.workouts.utils import (
+    process_import_job,
+    process_workout_enrichment,
+)
+from fittrackee.workouts.utils_chart_data import (
+    CHART_DATA_KEYS,
+    get_chart_data_file_path,
+)
+from fittrackee.workouts.utils_files import get_absolute_file_path
 from fittrackee.workouts.utils_id import decode_short_id
 
 from ..api_test_case import ApiTestCaseMixin
+from .utils import count_queries, post_an_workout
 
 
 def assert_workout_data_with_gpx(data: Dict) -> None:
@@ -229,6 +245,28 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin):
         assert 'just a workout' == data['data']['workouts'][0]['title']
         assert_workout_data_with_gpx(data)
 
+    def test_it_stores_chart_data_next_to_gpx_file(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        workout = Workout.query.first()
+        assert os.path.exists(
+            get_chart_data_file_path(get_absolute_file_path(workout.gpx))
+        )
+
     def test_it_adds_an_workout_with_gpx_without_name(
         self,
         app: Flask,
@@ -635,6 +673,35 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
             assert 'just a workout' == data['data']['workouts'][0]['title']
             assert_workout_data_with_gpx(data)
 
+    def test_it_stores_only_gpx_files_from_zip_archive(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file:
+            client, auth_token = self.get_test_client_and_auth_token(app)
+
+            client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        user_dir = get_absolute_file_path(f'workouts/{user_1.id}')
+        assert not os.path.exists(os.path.join(user_dir, 'extract'))
+        for workout in Workout.query.all():
+            assert os.path.isfile(get_absolute_file_path(workout.gpx))
+        assert not [
+            file_name
+            for file_name in os.listdir(user_dir)
+            if file_name.startswith('import_') or file_name.endswith('.doc')
+        ]
+
     def test_it_returns_400_if_folder_is_present_in_zip_archive(
         self, app: Flask, user_1: User, sport_1_cycling: Sport
     ) -> None:
@@ -759,6 +826,436 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
             assert 'data' not in data
 
 
+class TestPostWorkoutWithZipArchiveInProcessPool(ApiTestCaseMixin):
+    @staticmethod
+    def post_zip_archive(app: Flask, zip_filename: str) -> Tuple[int, Dict]:
+        app.config['WORKOUTS_IMPORT_PROCESSES'] = 2
+        file_path = os.path.join(app.root_path, 'tests/files', zip_filename)
+        with open(file_path, 'rb') as zip_file:
+            (
+                client,
+                auth_token,
+            ) = ApiTestCaseMixin.get_test_client_and_auth_token(app)
+            # processes are forked in tests, to keep mocks in import processes
+            with patch(
+                'fittrackee.workouts.utils.get_context',
+                return_value=get_context('fork'),
+            ):
+                response = client.post(
+                    '/api/workouts',
+                    data=dict(
+                        file=(zip_file, zip_filename), data='{"sport_id": 1}'
+                    ),
+                    headers=dict(
+                        content_type='multipart/form-data',
+                        Authorization=f'Bearer {auth_token}',
+                    ),
+                )
+        return response.status_code, json.loads(response.data.decode())
+
+    @staticmethod
+    def get_user_files(user_id: int) -> Set[str]:
+        user_dir = get_absolute_file_path(f'workouts/{user_id}')
+        if not os.path.exists(user_dir):
+            return set()
+        return {
+            file_name
+            for file_name in os.listdir(user_dir)
+            if os.path.isfile(os.path.join(user_dir, file_name))
+        }
+
+    def test_it_adds_workouts_with_zip_archive(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        status_code, data = self.post_zip_archive(app, 'gpx_test.zip')
+
+        assert status_code == 201
+        assert 'created' in data['status']
+        assert len(data['data']['workouts']) == 3
+        for workout in data['data']['workouts']:
+            assert workout['title'] == 'just a workout'
+            assert workout['duration'] == '0:04:10'
+            assert workout['map'] is not None
+            assert len(workout['segments']) == 1
+        assert Workout.query.count() == 3
+
+    def test_it_returns_500_and_does_not_create_workouts_if_one_file_is_invalid(  # noqa
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        user_files = self.get_user_files(user_1.id)
+
+        # 'gpx_test_incorrect.zip' contains 2 gpx files, one is incorrect
+        status_code, data = self.post_zip_archive(
+            app, 'gpx_test_incorrect.zip'
+        )
+
+        assert status_code == 500
+        assert 'error' in data['status']
+        assert 'Error during gpx processing.' in data['message']
+        assert Workout.query.count() == 0
+        # files generated for valid gpx file are removed
+        assert self.get_user_files(user_1.id) == user_files
+
+
+class TestPostWorkoutWithDeferredEnrichment(ApiTestCaseMixin):
+    @staticmethod
+    def post_gpx_file(app: Flask, gpx_file: str) -> Tuple[int, Dict]:
+        app.config['WORKOUTS_DEFERRED_ENRICHMENT'] = True
+        client, auth_token = ApiTestCaseMixin.get_test_client_and_auth_token(
+            app
+        )
+        with patch(
+            'fittrackee.workouts.workouts.enrich_workout'
+        ) as enrich_workout_mock:
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                    data='{"sport_id": 1}',
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+        data = json.loads(response.data.decode())
+        if response.status_code == 201:
+            workout = Workout.query.one()
+            enrich_workout_mock.send.assert_called_once_with(workout.id)
+        return response.status_code, data
+
+    def test_it_adds_workout_without_map(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        status_code, data = self.post_gpx_file(app, gpx_file)
+
+        assert status_code == 201
+        workout = data['data']['workouts'][0]
+        assert workout['enrichment_status'] == 'pending'
+        assert workout['map'] is None
+        assert workout['weather_start'] is None
+        assert workout['weather_end'] is None
+        assert workout['with_gpx'] is True
+        assert workout['distance'] == 0.32
+        assert workout['bounds'] == [44.67822, 6.07355, 44.68095, 6.07442]
+
+    def test_it_adds_map_on_enrichment(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        self.post_gpx_file(app, gpx_file)
+        workout = Workout.query.one()
+
+        process_workout_enrichment(workout.id)
+
+        assert workout.enrichment_status == 'completed'
+        assert workout.map is not None
+        assert workout.map_id is not None
+        assert os.path.isfile(get_absolute_file_path(workout.map))
+
+    def test_enrichment_is_idempotent(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        self.post_gpx_file(app, gpx_file)
+        workout = Workout.query.one()
+        process_workout_enrichment(workout.id)
+        workout_map = workout.map
+
+        with patch(
+            'fittrackee.workouts.utils.generate_map'
+        ) as generate_map_mock:
+            process_workout_enrichment(workout.id)
+
+        generate_map_mock.assert_not_called()
+        assert workout.map == workout_map
+
+    def test_it_sets_failed_status_when_enrichment_fails(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        self.post_gpx_file(app, gpx_file)
+        workout = Workout.query.one()
+        os.remove(get_absolute_file_path(workout.gpx))
+
+        process_workout_enrichment(workout.id)
+
+        assert workout.enrichment_status == 'failed'
+        assert workout.map is None
+
+
+class TestPostWorkoutAsynchronously(ApiTestCaseMixin):
+    @staticmethod
+    def post_workout_file(
+        app: Flask, workout_file: BinaryIO, filename: str
+    ) -> Tuple[FlaskClient, str, Dict]:
+        client, auth_token = ApiTestCaseMixin.get_test_client_and_auth_token(
+            app
+        )
+        with patch(
+            'fittrackee.workouts.workouts.import_workouts'
+        ) as import_workouts_mock:
+            response = client.post(
+                '/api/workouts?async=true',
+                data=dict(
+                    file=(workout_file, filename), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+        data = json.loads(response.data.decode())
+        if response.status_code == 202:
+            import_job = ImportJob.query.filter_by(
+                uuid=decode_short_id(data['data']['import']['id'])
+            ).first()
+            import_workouts_mock.send.assert_called_once_with(import_job.id)
+        return client, auth_token, data
+
+    @staticmethod
+    def process_import_job(short_id: str) -> ImportJob:
+        import_job = ImportJob.query.filter_by(
+            uuid=decode_short_id(short_id)
+        ).first()
+        process_import_job(import_job.id)
+        return import_job
+
+    def test_it_returns_202_and_creates_import_job(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+
+        assert data['status'] == 'accepted'
+        import_data = data['data']['import']
+        assert import_data['status'] == 'queued'
+        assert import_data['filename'] == 'example.gpx'
+        assert import_data['files_count'] == 0
+        assert import_data['processed_files'] == 0
+        assert import_data['results'] == []
+        import_job = ImportJob.query.filter_by(
+            uuid=decode_short_id(import_data['id'])
+        ).first()
+        assert os.path.isfile(get_absolute_file_path(import_job.file_path))
+        assert Workout.query.count() == 0
+
+    def test_it_returns_500_when_sport_does_not_exist(
+        self, app: Flask, user_1: User, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+
+        assert data['status'] == 'error'
+        assert data['message'] == 'Sport id: 1 does not exist'
+        assert ImportJob.query.count() == 0
+
+    def test_it_creates_workout_from_gpx_file(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        workout = Workout.query.one()
+        assert import_job.status == 'completed'
+        assert import_job.files_count == 1
+        assert import_job.processed_files == 1
+        assert import_job.results == [
+            {
+                'filename': 'example.gpx',
+                'status': 'created',
+                'workout_id': workout.short_id,
+            }
+        ]
+        assert import_job.file_path is None
+        assert workout.title == 'just a workout'
+        assert workout.map is not None
+        assert not os.path.exists(
+            get_absolute_file_path(
+                f'workouts/{user_1.id}/imports/{import_job.short_id}'
+            )
+        )
+
+    def test_it_creates_workouts_from_zip_archive(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file:
+            client, auth_token, data = self.post_workout_file(
+                app, zip_file, 'gpx_test.zip'
+            )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'completed'
+        assert import_job.files_count == 3
+        assert import_job.processed_files == 3
+        assert sorted(result['filename'] for result in import_job.results) == [
+            'test_1.gpx',
+            'test_2.gpx',
+            'test_3.gpx',
+        ]
+        assert {result['status'] for result in import_job.results} == {
+            'created'
+        }
+        assert Workout.query.count() == 3
+
+    def test_it_updates_records_once_for_zip_archive(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        with open(file_path, 'rb') as zip_file:
+            client, auth_token, data = self.post_workout_file(
+                app, zip_file, 'gpx_test.zip'
+            )
+
+        with count_queries() as queries:
+            import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'completed'
+        # records are not updated after each workout creation
+        assert not [query for query in queries if 'FROM records' in query]
+        assert len([query for query in queries if 'row_number' in query]) == 1
+        assert Record.query.filter_by(user_id=user_1.id).count() == 4
+
+    def test_it_returns_error_for_invalid_file_in_zip_archive(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(
+            app.root_path, 'tests/files/gpx_test_incorrect.zip'
+        )
+        # 'gpx_test_incorrect.zip' contains 2 gpx files, one is incorrect
+        with open(file_path, 'rb') as zip_file:
+            client, auth_token, data = self.post_workout_file(
+                app, zip_file, 'gpx_test_incorrect.zip'
+            )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'completed'
+        assert import_job.files_count == 2
+        assert import_job.processed_files == 2
+        results = sorted(
+            import_job.results, key=lambda result: result['filename']
+        )
+        assert results[0]['status'] == 'created'
+        assert results[1] == {
+            'filename': 'test_4.gpx',
+            'status': 'error',
+            'message': 'Error during gpx processing.',
+        }
+        assert Workout.query.count() == 1
+
+    def test_it_returns_failed_status_when_no_workouts_created(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(
+            app.root_path, 'tests/files/gpx_test_folder.zip'
+        )
+        # 'gpx_test_folder.zip' contains 3 gpx files (same data) and 1 non-gpx
+        # file in a folder
+        with open(file_path, 'rb') as zip_file:
+            client, auth_token, data = self.post_workout_file(
+                app, zip_file, 'gpx_test_folder.zip'
+            )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'failed'
+        assert import_job.files_count == 0
+        assert import_job.results == []
+        assert import_job.message == 'No workout created.'
+
+    def test_it_returns_failed_status_when_archive_is_invalid(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(b'invalid'), 'workouts.zip'
+        )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'failed'
+        assert import_job.message == 'Error during workout file processing.'
+
+    def test_it_returns_failed_status_when_sport_does_not_exist(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+        db.session.delete(sport_1_cycling)
+        db.session.commit()
+
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        assert import_job.status == 'failed'
+        assert import_job.message == 'Sport id: 1 does not exist'
+        assert import_job.file_path is None
+        assert Workout.query.count() == 0
+
+    def test_it_does_not_process_import_job_twice(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        process_import_job(import_job.id)
+
+        assert import_job.processed_files == 1
+        assert Workout.query.count() == 1
+
+    def test_it_gets_import_job(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token, data = self.post_workout_file(
+            app, BytesIO(str.encode(gpx_file)), 'example.gpx'
+        )
+        import_job = self.process_import_job(data['data']['import']['id'])
+
+        response = client.get(
+            f'/api/workouts/imports/{import_job.short_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['status'] == 'success'
+        assert data['data']['import']['status'] == 'completed'
+        assert data['data']['import']['processed_files'] == 1
+        assert data['data']['import']['results'] == import_job.results
+
+    def test_it_returns_404_when_import_job_belongs_to_another_user(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+    ) -> None:
+        import_job = ImportJob(
+            user_id=user_2.id,
+            filename='example.gpx',
+            workout_data={'sport_id': 1},
+        )
+        db.session.add(import_job)
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(app)
+
+        response = client.get(
+            f'/api/workouts/imports/{import_job.short_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 404
+        assert data['status'] == 'not found'
+        assert (
+            data['message'] == f'Import not found (id: {import_job.short_id})'
+        )
+
+
 class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
     def workout_assertion(
         self, app: Flask, gpx_file: str, with_segments: bool
@@ -911,6 +1408,134 @@ class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
         assert data['message'] == ''
         assert data['data']['chart_data'] != ''
 
+    def test_it_gets_all_chart_data_when_points_exceed_gpx_points(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        client = app.test_client()
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+        chart_data = json.loads(response.data.decode())['data']['chart_data']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data?points=100',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert 'success' in data['status']
+        assert data['data']['chart_data'] == chart_data
+
+    @pytest.mark.parametrize(
+        'input_url', ['chart_data?points=100&', 'chart_data/segment/1?']
+    )
+    def test_it_gets_chart_data_in_columns(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        input_url: str,
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        client = app.test_client()
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/{input_url}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+        chart_data = json.loads(response.data.decode())['data']['chart_data']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/{input_url}format=columns',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert 'success' in data['status']
+        assert data['data']['chart_data'] == {
+            key: [point[key] for point in chart_data]
+            for key in CHART_DATA_KEYS
+        }
+
+    def test_it_gets_chart_data_in_binary_format(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        client = app.test_client()
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+        chart_data = json.loads(response.data.decode())['data']['chart_data']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data?format=binary',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert response.status_code == 200
+        assert response.content_type == 'application/octet-stream'
+        points_nb = struct.unpack_from('<I', response.data)[0]
+        assert points_nb == len(chart_data)
+        values = struct.unpack_from(f'<{points_nb * 7}d', response.data, 4)
+        distances, _, _, _, _, speeds, times = [
+            values[idx * points_nb : (idx + 1) * points_nb]  # noqa
+            for idx in range(7)
+        ]
+        assert list(distances) == [point['distance'] for point in chart_data]
+        assert list(speeds) == [point['speed'] for point in chart_data]
+        assert times[0] == 1520945085  # 2018-03-13 12:44:45
+
+    @pytest.mark.parametrize('input_format', ['', 'json', 'invalid'])
+    def test_it_returns_400_on_getting_chart_data_with_invalid_format(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        input_format: str,
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        client = app.test_client()
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data'
+            f'?format={input_format}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert 'error' in data['status']
+        assert data['message'] == 'Invalid chart data format.'
+
+    @pytest.mark.parametrize('input_points', ['0', '-10', 'invalid'])
+    def test_it_returns_400_on_getting_chart_data_with_invalid_points(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        input_points: str,
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        client = app.test_client()
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data/segment/1'
+            f'?points={input_points}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert 'error' in data['status']
+        assert data['message'] == 'Invalid number of points.'
+
     def test_it_returns_403_on_getting_chart_data_if_workout_belongs_to_another_user(  # noqa
         self,
         app: Flask,
@@ -1,10 +1,13 @@
 import json
+import os
 from typing import Dict
 
 from flask import Flask
 
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.utils_chart_data import get_chart_data_file_path
+from fittrackee.workouts.utils_files import get_absolute_file_path
 from fittrackee.workouts.utils_id import decode_short_id
 
 from ..api_test_case import ApiTestCaseMixin
@@ -627,3 +630,28 @@ class TestRefreshWorkoutWithGpx:
         assert 1 == data['data']['workouts'][0]['sport_id']
         assert 0.4 == data['data']['workouts'][0]['ascent']
         assert 975.0 == data['data']['workouts'][0]['min_alt']
+
+    def test_refresh_removes_stored_chart_data(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        workout = Workout.query.filter_by(
+            uuid=decode_short_id(workout_short_id)
+        ).first()
+        chart_data_file = get_chart_data_file_path(
+            get_absolute_file_path(workout.gpx)
+        )
+        client = app.test_client()
+
+        client.patch(
+            f'/api/workouts/{workout_short_id}',
+            content_type='application/json',
+            data=json.dumps(dict(refresh=True)),
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert not os.path.exists(chart_data_file)
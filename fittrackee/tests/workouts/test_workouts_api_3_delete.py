@@ -4,8 +4,9 @@ import os
 from flask import Flask
 
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.models import Sport, Workout, get_workout_files_size
 from fittrackee.workouts.utils import get_absolute_file_path
+from fittrackee.workouts.utils_chart_data import get_chart_data_file_path
 
 from ..api_test_case import ApiTestCaseMixin
 from .utils import get_random_short_id, post_an_workout
@@ -30,6 +31,40 @@ class TestDeleteWorkoutWithGpx(ApiTestCaseMixin):
 
         assert response.status_code == 204
 
+    def test_it_deletes_stored_chart_data_with_workout(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        chart_data_file = get_chart_data_file_path(
+            get_absolute_file_path(get_gpx_filepath(1))
+        )
+        client = app.test_client()
+
+        client.delete(
+            f'/api/workouts/{workout_short_id}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert not os.path.exists(chart_data_file)
+
+    def test_it_updates_user_uploads_size(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_an_workout(app, gpx_file)
+        workout = Workout.query.one()
+        assert user_1.uploads_size == get_workout_files_size(
+            workout.gpx, workout.map
+        )
+        assert user_1.uploads_size > 0
+        client = app.test_client()
+
+        client.delete(
+            f'/api/workouts/{workout_short_id}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert user_1.uploads_size == 0
+
     def test_it_returns_403_when_deleting_an_workout_from_different_user(
         self,
         app: Flask,
@@ -0,0 +1,450 @@
+import math
+import os
+import random
+import struct
+from datetime import datetime
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import gpxpy.gpx
+import pytest
+from flask import Flask
+
+from fittrackee.workouts.exceptions import WorkoutGPXException
+from fittrackee.workouts.utils_chart_data import (
+    CHART_DATA_KEYS,
+    ChartDataColumns,
+    get_binary_chart_data,
+    get_chart_data_file_path,
+    get_downsampling_level,
+    get_lttb_indexes,
+    load_chart_data,
+)
+from fittrackee.workouts.utils_gpx import get_chart_data
+
+from .test_workouts_gpx_stats import get_gpx_segment
+
+
+def get_reference_lttb_indexes(
+    x: List[float], y: List[float], threshold: int
+) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets, as described by Sveinn Steinarsson
+    (single series)
+    """
+    bucket_size = (len(x) - 2) / (threshold - 2)
+    indexes = [0]
+    a = 0
+    for i in range(threshold - 2):
+        range_start = int(math.floor((i + 1) * bucket_size)) + 1
+        range_end = min(int(math.floor((i + 2) * bucket_size)) + 1, len(x))
+        avg_x = sum(x[range_start:range_end]) / (range_end - range_start)
+        avg_y = sum(y[range_start:range_end]) / (range_end - range_start)
+        max_area = -1.0
+        next_a = a
+        for idx in range(
+            int(math.floor(i * bucket_size)) + 1,
+            int(math.floor((i + 1) * bucket_size)) + 1,
+        ):
+            area = abs(
+                (x[a] - avg_x) * (y[idx] - y[a])
+                - (x[a] - x[idx]) * (avg_y - y[a])
+            )
+            if area > max_area:
+                max_area = area
+                next_a = idx
+        indexes.append(next_a)
+        a = next_a
+    indexes.append(len(x) - 1)
+    return indexes
+
+
+def get_gpx(segments: List[gpxpy.gpx.GPXTrackSegment]) -> gpxpy.gpx.GPX:
+    gpx = gpxpy.gpx.GPX()
+    gpx_track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(gpx_track)
+    gpx_track.segments.extend(segments)
+    return gpx
+
+
+def write_gpx_file(tmp_path: str, gpx: gpxpy.gpx.GPX) -> str:
+    gpx_file_path = os.path.join(tmp_path, 'workout.gpx')
+    with open(gpx_file_path, 'w') as gpx_file:
+        gpx_file.write(gpx.to_xml())
+    return gpx_file_path
+
+
+def get_chart_data_with_gpxpy(
+    segments: List[gpxpy.gpx.GPXTrackSegment],
+) -> List:
+    """
+    Chart data calculated with gpxpy
+    """
+    chart_data = []
+    first_point = None
+    previous_point = None
+    previous_distance = 0
+    for segment_idx, segment in enumerate(segments):
+        for point_idx, point in enumerate(segment.points):
+            if segment_idx == 0 and point_idx == 0:
+                first_point = point
+            distance = (
+                point.distance_3d(previous_point)
+                if (
+                    point.elevation
+                    and previous_point
+                    and previous_point.elevation
+                )
+                else point.distance_2d(previous_point)
+            )
+            distance = 0 if distance is None else distance
+            distance += previous_distance
+            speed = segment.get_speed(point_idx)
+            chart_data.append(
+                {
+                    'distance': round(distance / 1000, 2),
+                    'duration': point.time_difference(first_point),
+                    'elevation': (
+                        round(point.elevation, 1)
+                        if point.elevation is not None
+                        else 0
+                    ),
+                    'latitude': point.latitude,
+                    'longitude': point.longitude,
+                    'speed': (
+                        round((speed / 1000) * 3600, 2)
+                        if speed is not None
+                        else 0
+                    ),
+                    'time': point.time,
+                }
+            )
+            previous_point = point
+            previous_distance = distance
+    return chart_data
+
+
+def get_chart_data_columns(
+    segments: List[gpxpy.gpx.GPXTrackSegment],
+) -> ChartDataColumns:
+    chart_data_columns = ChartDataColumns()
+    for segment in segments:
+        chart_data_columns.start_segment()
+        for point in segment.points:
+            chart_data_columns.add_point(point)
+        chart_data_columns.end_segment()
+    return chart_data_columns
+
+
+def get_segments() -> List[gpxpy.gpx.GPXTrackSegment]:
+    segments = [
+        get_gpx_segment(50, seed=0),
+        get_gpx_segment(0),
+        get_gpx_segment(30, seed=1, without_time_indexes=[0, 10]),
+        get_gpx_segment(20, seed=2, with_elevation=False),
+    ]
+    segments[0].points[10].elevation = None
+    segments[0].points[11].elevation = 0
+    return segments
+
+
+class TestGetDownsamplingLevel:
+    @pytest.mark.parametrize(
+        'input_points, input_points_nb, expected_level',
+        [
+            (1, 1000, 100),
+            (100, 1000, 100),
+            (101, 1000, 250),
+            (300, 1000, 500),
+            (1000, 1000, None),
+            (300, 400, None),
+            (10000, 100000, None),
+        ],
+    )
+    def test_it_returns_downsampling_level(
+        self,
+        input_points: int,
+        input_points_nb: int,
+        expected_level: Optional[int],
+    ) -> None:
+        assert (
+            get_downsampling_level(input_points, input_points_nb)
+            == expected_level
+        )
+
+
+class TestGetLttbIndexes:
+    def test_it_returns_all_indexes_when_threshold_exceeds_points_number(
+        self,
+    ) -> None:
+        assert get_lttb_indexes([0.0, 1.0, 2.0], [[1.0, 2.0, 3.0]], 5) == [
+            0,
+            1,
+            2,
+        ]
+
+    def test_it_returns_first_and_last_points_and_one_point_per_bucket(
+        self,
+    ) -> None:
+        x = [float(idx) for idx in range(1000)]
+        y = [float(idx % 7) for idx in range(1000)]
+
+        indexes = get_lttb_indexes(x, [y], 100)
+
+        assert len(indexes) == 100
+        assert indexes[0] == 0
+        assert indexes[-1] == 999
+        assert indexes == sorted(set(indexes))
+
+    def test_it_returns_same_indexes_as_reference_lttb(self) -> None:
+        random_generator = random.Random(0)
+        x = [float(idx) for idx in range(5000)]
+        y = [random_generator.uniform(0, 100) for _ in range(5000)]
+
+        indexes = get_lttb_indexes(x, [y], 100)
+
+        assert indexes == get_reference_lttb_indexes(x, y, 100)
+
+    def test_it_keeps_peaks(self) -> None:
+        x = [float(idx) for idx in range(1000)]
+        elevations = [0.0] * 1000
+        elevations[333] = 100.0
+        speeds = [10.0] * 1000
+        speeds[666] = 50.0
+
+        indexes = get_lttb_indexes(x, [elevations, speeds], 10)
+
+        assert 333 in indexes
+        assert 666 in indexes
+
+
+class TestChartDataColumns:
+    def test_it_returns_same_chart_data_as_gpxpy(self) -> None:
+        segments = get_segments()
+        chart_data_columns = get_chart_data_columns(segments)
+
+        assert chart_data_columns.get_chart_data(
+            chart_data_columns.segments
+        ) == get_chart_data_with_gpxpy(segments)
+
+    @pytest.mark.parametrize('input_segment_index', [0, 1, 2, 3])
+    def test_it_returns_same_segment_chart_data_as_gpxpy(
+        self, input_segment_index: int
+    ) -> None:
+        segments = get_segments()
+        chart_data_columns = get_chart_data_columns(segments)
+
+        assert chart_data_columns.get_chart_data(
+            [chart_data_columns.segments[input_segment_index]]
+        ) == get_chart_data_with_gpxpy([segments[input_segment_index]])
+
+    def test_it_returns_same_chart_data_after_serialization(self) -> None:
+        chart_data_columns = get_chart_data_columns(get_segments())
+
+        deserialized_chart_data_columns = ChartDataColumns.from_dict(
+            chart_data_columns.to_dict()
+        )
+
+        assert deserialized_chart_data_columns.get_chart_data(
+            deserialized_chart_data_columns.segments
+        ) == chart_data_columns.get_chart_data(chart_data_columns.segments)
+
+    def test_it_returns_downsampled_chart_data(self) -> None:
+        segments = [get_gpx_segment(1000)]
+        chart_data_columns = get_chart_data_columns(segments)
+        chart_data = get_chart_data_with_gpxpy(segments)
+
+        downsampled_chart_data = chart_data_columns.get_chart_data(
+            chart_data_columns.segments, points=200
+        )
+
+        assert len(downsampled_chart_data) == 250
+        assert downsampled_chart_data[0] == chart_data[0]
+        assert downsampled_chart_data[-1] == chart_data[-1]
+        assert all(data in chart_data for data in downsampled_chart_data)
+        assert chart_data_columns.has_new_downsampled_data
+
+    def test_it_returns_downsampled_indexes_from_cache(self) -> None:
+        chart_data_columns = get_chart_data_columns([get_gpx_segment(1000)])
+        chart_data = chart_data_columns.get_chart_data(
+            chart_data_columns.segments, points=100
+        )
+        chart_data_columns.has_new_downsampled_data = False
+
+        with patch(
+            'fittrackee.workouts.utils_chart_data.get_lttb_indexes'
+        ) as get_lttb_indexes_mock:
+            cached_chart_data = chart_data_columns.get_chart_data(
+                chart_data_columns.segments, points=100
+            )
+
+        get_lttb_indexes_mock.assert_not_called()
+        assert cached_chart_data == chart_data
+        assert not chart_data_columns.has_new_downsampled_data
+
+    @pytest.mark.parametrize('input_points', [None, 100])
+    def test_it_returns_chart_data_in_columns(
+        self, input_points: Optional[int]
+    ) -> None:
+        chart_data_columns = get_chart_data_columns([get_gpx_segment(1000)])
+        chart_data = chart_data_columns.get_chart_data(
+            chart_data_columns.segments, points=input_points
+        )
+
+        columns = chart_data_columns.get_columns(
+            chart_data_columns.segments, points=input_points
+        )
+
+        assert columns == {
+            key: [data[key] for data in chart_data] for key in CHART_DATA_KEYS
+        }
+
+    def test_it_returns_empty_columns_when_no_segments(self) -> None:
+        chart_data_columns = ChartDataColumns()
+
+        assert chart_data_columns.get_columns([]) == {
+            key: [] for key in CHART_DATA_KEYS
+        }
+
+
+class TestGetBinaryChartData:
+    def test_it_returns_encoded_chart_data(self) -> None:
+        columns: Dict = {
+            'distance': [0, 0.01],
+            'duration': [0, None],
+            'elevation': [279.4, 280],
+            'latitude': [51.5078118, 51.5079733],
+            'longitude': [-0.1232004, -0.1234538],
+            'speed': [8.63, 6.39],
+            'time': [datetime(2017, 7, 14, 13, 44, 3), None],
+        }
+
+        binary_chart_data = get_binary_chart_data(columns)
+
+        assert len(binary_chart_data) == 4 + 7 * 2 * 8
+        assert struct.unpack_from('<I', binary_chart_data) == (2,)
+        values = struct.unpack_from('<14d', binary_chart_data, 4)
+        assert values[:3] == (0, 0.01, 0)
+        assert math.isnan(values[3])
+        assert values[4:12] == (
+            279.4,
+            280,
+            51.5078118,
+            51.5079733,
+            -0.1232004,
+            -0.1234538,
+            8.63,
+            6.39,
+        )
+        assert values[12] == 1500039843
+        assert math.isnan(values[13])
+
+    def test_it_returns_only_points_number_when_no_chart_data(self) -> None:
+        columns: Dict = {key: [] for key in CHART_DATA_KEYS}
+
+        assert get_binary_chart_data(columns) == struct.pack('<I', 0)
+
+
+class TestGetChartData:
+    def test_it_stores_chart_data_on_first_call(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        gpx_file = write_gpx_file(tmp_path, get_gpx(get_segments()))
+
+        chart_data = get_chart_data(gpx_file)
+
+        assert os.path.exists(get_chart_data_file_path(gpx_file))
+        chart_data_columns = load_chart_data(gpx_file)
+        assert chart_data_columns is not None
+        assert (
+            chart_data_columns.get_chart_data(chart_data_columns.segments)
+            == chart_data
+        )
+
+    @pytest.mark.parametrize('input_segment_id', [None, 1, 2, 3, 4])
+    def test_it_returns_chart_data_from_stored_file(
+        self, app: Flask, tmp_path: str, input_segment_id: Optional[int]
+    ) -> None:
+        segments = get_segments()
+        gpx_file = write_gpx_file(tmp_path, get_gpx(segments))
+        get_chart_data(gpx_file)
+
+        with patch(
+            'fittrackee.workouts.utils_gpx.get_chart_data_columns'
+        ) as get_chart_data_columns_mock:
+            chart_data = get_chart_data(gpx_file, input_segment_id)
+
+        get_chart_data_columns_mock.assert_not_called()
+        assert chart_data == get_chart_data_with_gpxpy(
+            segments
+            if input_segment_id is None
+            else [segments[input_segment_id - 1]]
+        )
+
+    def test_it_calculates_chart_data_again_when_file_is_outdated(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        gpx_file = write_gpx_file(tmp_path, get_gpx(get_segments()))
+        with open(get_chart_data_file_path(gpx_file), 'w') as f:
+            f.write('invalid')
+
+        chart_data = get_chart_data(gpx_file)
+
+        assert chart_data == get_chart_data_with_gpxpy(get_segments())
+        assert load_chart_data(gpx_file) is not None
+
+    def test_it_returns_none_when_gpx_file_has_no_tracks(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        gpx_file = write_gpx_file(tmp_path, gpxpy.gpx.GPX())
+
+        assert get_chart_data(gpx_file) is None
+        assert not os.path.exists(get_chart_data_file_path(gpx_file))
+
+    @pytest.mark.parametrize(
+        'input_segment_id, expected_message',
+        [(0, 'Incorrect segment id'), (5, 'No segment with id \'5\'')],
+    )
+    def test_it_raises_error_when_segment_is_invalid(
+        self,
+        app: Flask,
+        tmp_path: str,
+        input_segment_id: int,
+        expected_message: str,
+    ) -> None:
+        gpx_file = write_gpx_file(tmp_path, get_gpx(get_segments()))
+
+        with pytest.raises(WorkoutGPXException, match=expected_message):
+            get_chart_data(gpx_file, input_segment_id)
+
+    def test_it_stores_downsampled_indexes(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        segments = [get_gpx_segment(300), get_gpx_segment(500, seed=1)]
+        gpx_file = write_gpx_file(tmp_path, get_gpx(segments))
+
+        chart_data = get_chart_data(gpx_file, segment_id=2, points=100)
+
+        assert len(chart_data) == 100  # type: ignore
+        chart_data_columns = load_chart_data(gpx_file)
+        assert chart_data_columns is not None
+        assert list(chart_data_columns.downsampled) == ['300-800-100']
+        assert [
+            chart_data_columns.time[point_idx]
+            for point_idx in chart_data_columns.downsampled['300-800-100']
+        ] == [
+            data['time'] for data in chart_data  # type: ignore
+        ]
+
+    def test_it_returns_chart_data_in_columns(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        segments = get_segments()
+        gpx_file = write_gpx_file(tmp_path, get_gpx(segments))
+        chart_data = get_chart_data_with_gpxpy([segments[1]])
+
+        columns = get_chart_data(gpx_file, segment_id=2, in_columns=True)
+
+        assert columns == {
+            key: [data[key] for data in chart_data] for key in CHART_DATA_KEYS
+        }
@@ -0,0 +1,182 @@
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
+
+import gpxpy.gpx
+import pytest
+
+from fittrackee.workouts.utils_gpx_stats import GpxStats, SegmentStats
+
+
+def get_gpx_segment(
+    points_nb: int,
+    with_elevation: bool = True,
+    without_time_indexes: Optional[List[int]] = None,
+    seed: int = 0,
+) -> gpxpy.gpx.GPXTrackSegment:
+    random_generator = random.Random(seed)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    latitude = 44.68095
+    longitude = 6.07367
+    elevation = 998.0
+    time = datetime(2018, 3, 13, 12, 44, 45)
+    for point_idx in range(points_nb):
+        segment.points.append(
+            gpxpy.gpx.GPXTrackPoint(
+                latitude,
+                longitude,
+                elevation=elevation if with_elevation else None,
+                time=(
+                    None
+                    if without_time_indexes
+                    and point_idx in without_time_indexes
+                    else time
+                ),
+            )
+        )
+        latitude += random_generator.uniform(-0.0002, 0.0005)
+        longitude += random_generator.uniform(-0.0002, 0.0005)
+        elevation += random_generator.uniform(-3, 3)
+        time += timedelta(seconds=random_generator.choice([1, 5, 10, 60]))
+    return segment
+
+
+def get_segment_stats(segment: gpxpy.gpx.GPXTrackSegment) -> SegmentStats:
+    segment_stats = SegmentStats()
+    for point in segment.points:
+        segment_stats.add_point(point)
+    segment_stats.close()
+    return segment_stats
+
+
+def assert_stats_are_identical(
+    stats: Union[GpxStats, SegmentStats],
+    gpx_object: Union[gpxpy.gpx.GPX, gpxpy.gpx.GPXTrackSegment],
+) -> None:
+    assert stats.get_duration() == gpx_object.get_duration()
+    assert stats.get_elevation_extremes() == (
+        gpx_object.get_elevation_extremes()
+    )
+    assert stats.get_uphill_downhill() == gpx_object.get_uphill_downhill()
+    assert stats.get_moving_data() == gpx_object.get_moving_data()
+
+
+def assert_bounds_are_identical(
+    bounds: gpxpy.gpx.GPXBounds, expected_bounds: gpxpy.gpx.GPXBounds
+) -> None:
+    assert [
+        bounds.min_latitude,
+        bounds.max_latitude,
+        bounds.min_longitude,
+        bounds.max_longitude,
+    ] == [
+        expected_bounds.min_latitude,
+        expected_bounds.max_latitude,
+        expected_bounds.min_longitude,
+        expected_bounds.max_longitude,
+    ]
+
+
+class TestSegmentStats:
+    @pytest.mark.parametrize(
+        'input_desc, segment',
+        [
+            ('empty segment', get_gpx_segment(0)),
+            ('one point', get_gpx_segment(1)),
+            ('2 points', get_gpx_segment(2)),
+            ('less than 20 points', get_gpx_segment(15)),
+            ('100 points', get_gpx_segment(100)),
+            ('1000 points', get_gpx_segment(1000, seed=1)),
+            ('without elevation', get_gpx_segment(100, with_elevation=False)),
+            (
+                'without time on first point',
+                get_gpx_segment(100, without_time_indexes=[0]),
+            ),
+            (
+                'without time on last point',
+                get_gpx_segment(100, without_time_indexes=[99]),
+            ),
+            (
+                'without time on some points',
+                get_gpx_segment(100, without_time_indexes=[10, 11, 50]),
+            ),
+        ],
+    )
+    def test_it_returns_same_values_as_gpxpy(
+        self, input_desc: str, segment: gpxpy.gpx.GPXTrackSegment
+    ) -> None:
+        segment_stats = get_segment_stats(segment)
+
+        assert_stats_are_identical(segment_stats, segment)
+
+    def test_it_returns_same_values_as_gpxpy_when_elevation_is_missing(
+        self,
+    ) -> None:
+        segment = get_gpx_segment(100)
+        segment.points[0].elevation = None
+        segment.points[50].elevation = None
+        segment.points[51].elevation = 0
+        segment.points[99].elevation = None
+
+        segment_stats = get_segment_stats(segment)
+
+        assert_stats_are_identical(segment_stats, segment)
+
+    def test_it_returns_segment_bounds(self) -> None:
+        segment = get_gpx_segment(100)
+
+        segment_stats = get_segment_stats(segment)
+
+        assert_bounds_are_identical(
+            segment_stats.get_bounds(), segment.get_bounds()
+        )
+
+
+class TestGpxStats:
+    def test_it_returns_same_values_as_gpxpy_for_gpx_file(
+        self, gpx_file: str
+    ) -> None:
+        gpx = gpxpy.parse(gpx_file)
+        gpx_stats = GpxStats()
+        for segment in gpx.tracks[0].segments:
+            gpx_stats.add_segment(get_segment_stats(segment))
+
+        assert_stats_are_identical(gpx_stats, gpx)
+        assert_bounds_are_identical(gpx_stats.get_bounds(), gpx.get_bounds())
+
+    def test_it_returns_same_values_as_gpxpy_for_gpx_file_with_segments(
+        self, gpx_file_with_segments: str
+    ) -> None:
+        gpx = gpxpy.parse(gpx_file_with_segments)
+        gpx_stats = GpxStats()
+        for segment in gpx.tracks[0].segments:
+            gpx_stats.add_segment(get_segment_stats(segment))
+
+        assert_stats_are_identical(gpx_stats, gpx)
+        assert_bounds_are_identical(gpx_stats.get_bounds(), gpx.get_bounds())
+
+    def test_it_returns_same_values_as_gpxpy_for_large_segments(
+        self,
+    ) -> None:
+        gpx = gpxpy.gpx.GPX()
+        gpx_track = gpxpy.gpx.GPXTrack()
+        gpx.tracks.append(gpx_track)
+        gpx_stats = GpxStats()
+        for seed in range(3):
+            segment = get_gpx_segment(500, seed=seed)
+            gpx_track.segments.append(segment)
+            gpx_stats.add_segment(get_segment_stats(segment))
+
+        assert_stats_are_identical(gpx_stats, gpx)
+        assert_bounds_are_identical(gpx_stats.get_bounds(), gpx.get_bounds())
+
+    def test_it_returns_no_duration_when_a_segment_has_no_time(self) -> None:
+        gpx_stats = GpxStats()
+        gpx_stats.add_segment(get_segment_stats(get_gpx_segment(10)))
+        gpx_stats.add_segment(
+            get_segment_stats(
+                get_gpx_segment(10, without_time_indexes=list(range(10)))
+            )
+        )
+
+        assert gpx_stats.get_duration() is None
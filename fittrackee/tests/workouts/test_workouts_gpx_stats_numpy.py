@@ -0,0 +1,129 @@
+import os
+from typing import List
+
+import gpxpy.gpx
+import pytest
+from flask import Flask
+
+from fittrackee.workouts.utils_gpx import (
+    get_chart_data_columns,
+    get_gpx_info,
+    get_gpx_segments,
+)
+from fittrackee.workouts.utils_gpx_stats import SegmentStats
+
+from .test_workouts_gpx_stats import (
+    assert_bounds_are_identical,
+    assert_stats_are_identical,
+    get_gpx_segment,
+)
+
+utils_gpx_numpy = pytest.importorskip('fittrackee.workouts.utils_gpx_numpy')
+
+
+def get_numpy_segment_stats(
+    segment: gpxpy.gpx.GPXTrackSegment,
+) -> SegmentStats:
+    segment_stats = utils_gpx_numpy.NumpySegmentStats()
+    for point in segment.points:
+        segment_stats.add_point(point)
+    segment_stats.close()
+    return segment_stats
+
+
+def write_gpx_file(tmp_path: str, segments: List) -> str:
+    gpx = gpxpy.gpx.GPX()
+    gpx_track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(gpx_track)
+    gpx_track.segments.extend(segments)
+    gpx_file_path = os.path.join(tmp_path, 'workout.gpx')
+    with open(gpx_file_path, 'w') as gpx_file:
+        gpx_file.write(gpx.to_xml())
+    return gpx_file_path
+
+
+class TestNumpySegmentStats:
+    @pytest.mark.parametrize(
+        'input_desc, segment',
+        [
+            ('empty segment', get_gpx_segment(0)),
+            ('one point', get_gpx_segment(1)),
+            ('2 points', get_gpx_segment(2)),
+            ('less than 20 points', get_gpx_segment(15)),
+            ('1000 points', get_gpx_segment(1000, seed=1)),
+            ('without elevation', get_gpx_segment(100, with_elevation=False)),
+            (
+                'without time on some points',
+                get_gpx_segment(100, without_time_indexes=[0, 11, 50, 99]),
+            ),
+        ],
+    )
+    def test_it_returns_same_values_as_gpxpy(
+        self, input_desc: str, segment: gpxpy.gpx.GPXTrackSegment
+    ) -> None:
+        segment_stats = get_numpy_segment_stats(segment)
+
+        assert_stats_are_identical(segment_stats, segment)
+
+    def test_it_returns_same_values_as_gpxpy_when_elevation_is_missing(
+        self,
+    ) -> None:
+        segment = get_gpx_segment(100)
+        segment.points[0].elevation = None
+        segment.points[50].elevation = None
+        segment.points[51].elevation = 0
+        segment.points[99].elevation = None
+
+        segment_stats = get_numpy_segment_stats(segment)
+
+        assert_stats_are_identical(segment_stats, segment)
+
+    def test_it_returns_segment_bounds(self) -> None:
+        segment = get_gpx_segment(100)
+
+        segment_stats = get_numpy_segment_stats(segment)
+
+        assert_bounds_are_identical(
+            segment_stats.get_bounds(), segment.get_bounds()
+        )
+
+
+class TestGpxStatsBackends:
+    @pytest.mark.parametrize('input_segment_id', [None, 1, 2, 3])
+    def test_chart_data_are_identical_with_both_backends(
+        self, app: Flask, tmp_path: str, input_segment_id: int
+    ) -> None:
+        gpx_file_path = write_gpx_file(
+            tmp_path,
+            [get_gpx_segment(200, seed=seed) for seed in range(3)],
+        )
+
+        app.config['GPX_STATS_BACKEND'] = 'python'
+        python_chart_data = get_chart_data_columns(gpx_file_path)
+        app.config['GPX_STATS_BACKEND'] = 'numpy'
+        numpy_chart_data = get_chart_data_columns(gpx_file_path)
+
+        assert python_chart_data is not None
+        assert numpy_chart_data is not None
+        assert numpy_chart_data.to_dict() == python_chart_data.to_dict()
+        segments = get_gpx_segments(
+            python_chart_data.segments, input_segment_id
+        )
+        assert numpy_chart_data.get_chart_data(segments) == (
+            python_chart_data.get_chart_data(segments)
+        )
+
+    def test_gpx_info_are_identical_with_both_backends(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        gpx_file_path = write_gpx_file(
+            tmp_path,
+            [get_gpx_segment(200, seed=seed) for seed in range(3)],
+        )
+
+        app.config['GPX_STATS_BACKEND'] = 'python'
+        python_gpx_info = get_gpx_info(gpx_file_path, True, False)
+        app.config['GPX_STATS_BACKEND'] = 'numpy'
+        numpy_gpx_info = get_gpx_info(gpx_file_path, True, False)
+
+        assert numpy_gpx_info == python_gpx_info
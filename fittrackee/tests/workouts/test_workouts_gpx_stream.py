@@ -0,0 +1,218 @@
+import os
+import tracemalloc
+from typing import List
+
+import gpxpy
+import pytest
+from flask import Flask
+from gpxpy.gpx import GPXException, GPXXMLSyntaxException
+
+from fittrackee.workouts.exceptions import WorkoutGPXException
+from fittrackee.workouts.utils_gpx import (
+    extract_segment_from_gpx_file,
+    get_gpx_info,
+)
+from fittrackee.workouts.utils_gpx_stream import GpxReader
+
+from .test_workouts_gpx_stats import get_gpx_segment
+
+
+def write_gpx_file(tmp_path: str, content: str) -> str:
+    gpx_file_path = os.path.join(tmp_path, 'workout.gpx')
+    with open(gpx_file_path, 'w') as gpx_file:
+        gpx_file.write(content)
+    return gpx_file_path
+
+
+def get_gpx_content(segments_points_nb: List[int]) -> str:
+    gpx = gpxpy.gpx.GPX()
+    gpx_track = gpxpy.gpx.GPXTrack(name='workout')
+    gpx.tracks.append(gpx_track)
+    for seed, points_nb in enumerate(segments_points_nb):
+        gpx_track.segments.append(get_gpx_segment(points_nb, seed=seed))
+    return gpx.to_xml()
+
+
+def get_gpxpy_points(gpx_content: str) -> List:
+    gpx = gpxpy.parse(gpx_content)
+    points: List = []
+    for track_idx, track in enumerate(gpx.tracks):
+        for segment_idx, segment in enumerate(track.segments):
+            for point in segment.points:
+                points.append(
+                    (
+                        track_idx,
+                        segment_idx,
+                        (
+                            point.latitude,
+                            point.longitude,
+                            point.elevation,
+                            point.time,
+                        ),
+                    )
+                )
+            points.append((track_idx, segment_idx, None))
+    return points
+
+
+class TestGpxReader:
+    def test_it_returns_same_points_as_gpxpy(
+        self, tmp_path: str, gpx_file_with_segments: str
+    ) -> None:
+        gpx_reader = GpxReader(
+            write_gpx_file(tmp_path, gpx_file_with_segments)
+        )
+
+        assert list(gpx_reader.iter_points()) == get_gpxpy_points(
+            gpx_file_with_segments
+        )
+        assert gpx_reader.tracks_names == ['just a workout']
+
+    def test_it_returns_points_from_all_tracks_and_empty_segments(
+        self, tmp_path: str
+    ) -> None:
+        gpx = gpxpy.gpx.GPX()
+        for track_idx in range(2):
+            gpx_track = gpxpy.gpx.GPXTrack(name=f'track {track_idx}')
+            gpx.tracks.append(gpx_track)
+            gpx_track.segments.append(get_gpx_segment(5, seed=track_idx))
+            gpx_track.segments.append(gpxpy.gpx.GPXTrackSegment())
+        gpx_content = gpx.to_xml()
+        gpx_reader = GpxReader(write_gpx_file(tmp_path, gpx_content))
+
+        assert list(gpx_reader.iter_points()) == get_gpxpy_points(gpx_content)
+        assert gpx_reader.tracks_names == ['track 0', 'track 1']
+
+    def test_it_returns_points_from_gpx_file_without_namespace(
+        self, tmp_path: str
+    ) -> None:
+        gpx_content = (
+            '<gpx><trk><trkseg>'
+            '<trkpt lat="44.68095" lon="6.07367"><ele> 998 </ele></trkpt>'
+            '<trkpt lat="44.68091" lon="6.07367">'
+            '<time>2018-03-13T12:44:50Z</time></trkpt>'
+            '</trkseg></trk></gpx>'
+        )
+        gpx_reader = GpxReader(write_gpx_file(tmp_path, gpx_content))
+
+        assert list(gpx_reader.iter_points()) == get_gpxpy_points(gpx_content)
+        assert gpx_reader.tracks_names == [None]
+
+    def test_it_returns_no_points_when_gpx_file_has_no_tracks(
+        self, tmp_path: str, gpx_file_wo_track: str
+    ) -> None:
+        gpx_reader = GpxReader(write_gpx_file(tmp_path, gpx_file_wo_track))
+
+        assert list(gpx_reader.iter_points()) == []
+        assert gpx_reader.tracks_names == []
+
+    def test_it_raises_error_when_xml_is_invalid(
+        self, tmp_path: str, gpx_file_invalid_xml: str
+    ) -> None:
+        gpx_reader = GpxReader(write_gpx_file(tmp_path, gpx_file_invalid_xml))
+
+        with pytest.raises(GPXXMLSyntaxException):
+            list(gpx_reader.iter_points())
+
+    def test_it_raises_error_when_point_has_no_latitude(
+        self, tmp_path: str
+    ) -> None:
+        gpx_reader = GpxReader(
+            write_gpx_file(
+                tmp_path,
+                '<gpx><trk><trkseg><trkpt lon="6.07367"/>'
+                '</trkseg></trk></gpx>',
+            )
+        )
+
+        with pytest.raises(GPXException):
+            list(gpx_reader.iter_points())
+
+    def test_memory_usage_does_not_depend_on_file_size(
+        self, tmp_path: str
+    ) -> None:
+        peaks = []
+        for points_nb in [1000, 10000]:
+            gpx_reader = GpxReader(
+                write_gpx_file(tmp_path, get_gpx_content([points_nb]))
+            )
+            tracemalloc.start()
+            for _ in gpx_reader.iter_points():
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        assert peaks[1] < peaks[0] * 2
+
+
+class TestGetGpxInfo:
+    def test_it_raises_error_when_gpx_file_has_no_tracks(
+        self, app: Flask, tmp_path: str, gpx_file_wo_track: str
+    ) -> None:
+        with pytest.raises(WorkoutGPXException, match='No gpx file'):
+            get_gpx_info(
+                write_gpx_file(tmp_path, gpx_file_wo_track), False, False
+            )
+
+    def test_it_returns_segments_data(self, app: Flask, tmp_path: str) -> None:
+        gpx_data, map_data, _ = get_gpx_info(
+            write_gpx_file(tmp_path, get_gpx_content([10, 0, 20])),
+            True,
+            False,
+        )
+
+        assert gpx_data['name'] == 'workout'
+        assert [segment['idx'] for segment in gpx_data['segments']] == [
+            0,
+            1,
+            2,
+        ]
+        assert gpx_data['segments'][1]['distance'] == 0
+        assert len(map_data) == 30
+
+
+class TestExtractSegmentFromGpxFile:
+    def test_it_returns_segment_points(
+        self, tmp_path: str, gpx_file_with_segments: str
+    ) -> None:
+        gpx_segment_content = extract_segment_from_gpx_file(
+            write_gpx_file(tmp_path, gpx_file_with_segments), 2
+        )
+
+        segment = gpxpy.parse(gpx_file_with_segments).tracks[0].segments[1]
+        extracted_segment = gpxpy.parse(gpx_segment_content).tracks[0]
+        assert len(extracted_segment.segments) == 1
+        assert [
+            (point.latitude, point.longitude, point.elevation, point.time)
+            for point in extracted_segment.segments[0].points
+        ] == [
+            (point.latitude, point.longitude, point.elevation, None)
+            for point in segment.points
+        ]
+
+    def test_it_returns_none_when_gpx_file_has_no_tracks(
+        self, tmp_path: str, gpx_file_wo_track: str
+    ) -> None:
+        assert (
+            extract_segment_from_gpx_file(
+                write_gpx_file(tmp_path, gpx_file_wo_track), 1
+            )
+            is None
+        )
+
+    @pytest.mark.parametrize(
+        'input_segment_id, expected_message',
+        [(0, 'Incorrect segment id'), (3, 'No segment with id \'3\'')],
+    )
+    def test_it_raises_error_when_segment_is_invalid(
+        self,
+        tmp_path: str,
+        gpx_file_with_segments: str,
+        input_segment_id: int,
+        expected_message: str,
+    ) -> None:
+        with pytest.raises(WorkoutGPXException, match=expected_message):
+            extract_segment_from_gpx_file(
+                write_gpx_file(tmp_path, gpx_file_with_segments),
+                input_segment_id,
+            )
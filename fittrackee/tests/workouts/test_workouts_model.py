@@ -60,6 +60,7 @@ class TestWorkoutModel:
         assert serialized_workout['weather_start'] is None
         assert serialized_workout['weather_end'] is None
         assert serialized_workout['notes'] is None
+        assert serialized_workout['enrichment_status'] == 'completed'
 
     def test_workout_segment_model(
         self,
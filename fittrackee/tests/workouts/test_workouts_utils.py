@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+import zipfile
+from io import BytesIO
+from typing import List
+from unittest.mock import Mock, patch
+
+import pytest
+from flask import Flask
+
+from fittrackee.workouts.utils import get_gpx_files_from_zip_archive
+from fittrackee.workouts.utils_files import TeeReader
+from fittrackee.workouts.utils_map import (
+    CachedStaticMap,
+    MemoryTileCache,
+    TileCache,
+    TileProxy,
+    get_tile,
+)
+
+
+def write_zip_archive(tmp_path: str, members: List[str]) -> str:
+    zip_file_path = os.path.join(tmp_path, 'workouts.zip')
+    with zipfile.ZipFile(zip_file_path, 'w') as zip_ref:
+        for member in members:
+            zip_ref.writestr(member, '' if member.endswith('/') else 'data')
+    return zip_file_path
+
+
+class TestGetGpxFilesFromZipArchive:
+    def test_it_returns_files_with_allowed_extension(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        zip_file_path = write_zip_archive(
+            tmp_path, ['test_1.gpx', 'file.doc', 'test_2.GPX', 'README']
+        )
+
+        assert get_gpx_files_from_zip_archive(zip_file_path) == [
+            'test_1.gpx',
+            'test_2.GPX',
+        ]
+
+    def test_it_ignores_files_in_folders(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        zip_file_path = write_zip_archive(
+            tmp_path, ['folder/', 'folder/test_1.gpx', 'test_2.gpx']
+        )
+
+        assert get_gpx_files_from_zip_archive(zip_file_path) == ['test_2.gpx']
+
+    def test_it_returns_files_within_limit(
+        self, app_with_max_workouts: Flask, tmp_path: str
+    ) -> None:
+        zip_file_path = write_zip_archive(
+            tmp_path, ['file.doc', 'test_1.gpx', 'test_2.gpx', 'test_3.gpx']
+        )
+
+        assert get_gpx_files_from_zip_archive(zip_file_path) == [
+            'test_1.gpx',
+            'test_2.gpx',
+        ]
+
+    def test_it_does_not_extract_archive(
+        self, app: Flask, tmp_path: str
+    ) -> None:
+        zip_file_path = write_zip_archive(tmp_path, ['test_1.gpx'])
+
+        get_gpx_files_from_zip_archive(zip_file_path)
+
+        assert os.listdir(tmp_path) == ['workouts.zip']
+
+
+class TestTeeReader:
+    @pytest.mark.parametrize('input_size', [1, 3, -1])
+    def test_it_writes_read_data_in_output(self, input_size: int) -> None:
+        output = BytesIO()
+        tee_reader = TeeReader(BytesIO(b'gpx content'), output)
+
+        data = tee_reader.read(input_size)
+
+        assert output.getvalue() == data
+
+    def test_it_writes_remaining_data_in_output(self) -> None:
+        output = BytesIO()
+        tee_reader = TeeReader(BytesIO(b'gpx content'), output)
+        tee_reader.read(3)
+
+        tee_reader.read_all()
+
+        assert output.getvalue() == b'gpx content'
+
+
+class TestTileCache:
+    def test_it_returns_none_when_tile_is_not_in_cache(
+        self, tmp_path: str
+    ) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+
+        assert tile_cache.get('tile_url') is None
+        assert tile_cache.misses == 1
+
+    def test_it_returns_tile_stored_in_cache(self, tmp_path: str) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+        tile_cache.set('tile_url', b'tile')
+
+        assert tile_cache.get('tile_url') == b'tile'
+        assert tile_cache.hits == 1
+
+    def test_it_shares_tiles_between_cache_instances(
+        self, tmp_path: str
+    ) -> None:
+        TileCache(str(tmp_path), 1000).set('tile_url', b'tile')
+
+        assert TileCache(str(tmp_path), 1000).get('tile_url') == b'tile'
+
+    def test_it_removes_least_recently_used_tiles_when_cache_is_full(
+        self, tmp_path: str
+    ) -> None:
+        tile_cache = TileCache(str(tmp_path), 30)
+        for tile_idx in range(3):
+            key = f'tile_url_{tile_idx}'
+            tile_cache.set(key, b'0123456789')
+            tile_path = tile_cache.get_tile_path(key)
+            os.utime(tile_path, (tile_idx, tile_idx))
+        # first tile is used
+        tile_cache.get('tile_url_0')
+
+        tile_cache.set('tile_url_3', b'0123456789')
+
+        assert tile_cache.evictions == 2
+        assert tile_cache.get_size() == 20
+        assert tile_cache.get('tile_url_0') == b'0123456789'
+        assert tile_cache.get('tile_url_1') is None
+        assert tile_cache.get('tile_url_2') is None
+        assert tile_cache.get('tile_url_3') == b'0123456789'
+
+    def test_it_returns_stats(self, tmp_path: str) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+        tile_cache.set('tile_url', b'tile')
+        tile_cache.get('tile_url')
+        tile_cache.get('tile_url')
+        tile_cache.get('another_tile_url')
+
+        assert tile_cache.get_stats() == {
+            'hits': 2,
+            'misses': 1,
+            'evictions': 0,
+            'hit_ratio': 0.667,
+            'max_size': 1000,
+        }
+
+
+class TestCachedStaticMap:
+    def test_it_returns_tile_from_cache(self, tmp_path: str) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+        tile_cache.set('tile_url', b'tile')
+        static_map = CachedStaticMap(400, 225, 10, tile_cache=tile_cache)
+
+        with patch('requests.Session.get') as get_mock:
+            assert static_map.get('tile_url') == (200, b'tile')
+
+        get_mock.assert_not_called()
+
+    def test_it_stores_downloaded_tile_in_cache(self, tmp_path: str) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+        static_map = CachedStaticMap(400, 225, 10, tile_cache=tile_cache)
+
+        with patch(
+            'requests.Session.get',
+            return_value=Mock(status_code=200, content=b'tile'),
+        ) as get_mock:
+            assert static_map.get('tile_url', timeout=1) == (200, b'tile')
+
+        get_mock.assert_called_once_with('tile_url', timeout=1)
+        assert tile_cache.get('tile_url') == b'tile'
+
+    def test_it_does_not_store_tile_on_error(self, tmp_path: str) -> None:
+        tile_cache = TileCache(str(tmp_path), 1000)
+        static_map = CachedStaticMap(400, 225, 10, tile_cache=tile_cache)
+
+        with patch(
+            'requests.Session.get',
+            return_value=Mock(status_code=404, content=b'not found'),
+        ):
+            assert static_map.get('tile_url') == (404, b'not found')
+
+        assert tile_cache.get('tile_url') is None
+
+
+class TestMemoryTileCache:
+    def test_it_returns_stored_tile(self) -> None:
+        memory_cache = MemoryTileCache(100)
+        tile = get_tile(200, b'tile', 'image/png')
+        memory_cache.set('a/1/1/1', tile)
+
+        assert memory_cache.get('a/1/1/1') == tile
+
+    def test_it_removes_least_recently_used_tiles_when_cache_is_full(
+        self,
+    ) -> None:
+        memory_cache = MemoryTileCache(20)
+        for tile_idx in range(2):
+            memory_cache.set(
+                f'a/1/1/{tile_idx}', get_tile(200, b'0123456789', 'image/png')
+            )
+        # first tile is used
+        memory_cache.get('a/1/1/0')
+
+        memory_cache.set('a/1/1/2', get_tile(200, b'0123456789', 'image/png'))
+
+        assert memory_cache.size == 20
+        assert memory_cache.get('a/1/1/0') is not None
+        assert memory_cache.get('a/1/1/1') is None
+        assert memory_cache.get('a/1/1/2') is not None
+
+
+class TestTileProxy:
+    url_template = 'https://{s}.tile.example.com/{z}/{x}/{y}.png'
+
+    @staticmethod
+    def get_tile_response() -> Mock:
+        return Mock(
+            status_code=200,
+            content=b'tile',
+            headers={'content-type': 'image/png'},
+        )
+
+    def test_it_returns_tile_from_disk_cache(self, tmp_path: str) -> None:
+        disk_cache = TileCache(str(tmp_path), 1000)
+        disk_cache.set('a/1/2/3', b'tile')
+        tile_proxy = TileProxy(
+            self.url_template, disk_cache, MemoryTileCache(1000)
+        )
+
+        with patch('requests.Session.get') as get_mock:
+            tile = tile_proxy.get_tile('a', '1', '2', '3')
+
+        get_mock.assert_not_called()
+        assert tile.status_code == 200
+        assert tile.content == b'tile'
+        assert tile.etag
+
+    def test_it_stores_fetched_tile_in_caches(self, tmp_path: str) -> None:
+        disk_cache = TileCache(str(tmp_path), 1000)
+        memory_cache = MemoryTileCache(1000)
+        tile_proxy = TileProxy(self.url_template, disk_cache, memory_cache)
+
+        with patch(
+            'requests.Session.get', return_value=self.get_tile_response()
+        ) as get_mock:
+            tile = tile_proxy.get_tile('a', '1', '2', '3')
+
+        assert get_mock.call_args[0] == (
+            'https://a.tile.example.com/1/2/3.png',
+        )
+        assert disk_cache.get('a/1/2/3') == b'tile'
+        assert memory_cache.get('a/1/2/3') == tile
+
+    def test_it_fetches_tile_once_for_concurrent_requests(self) -> None:
+        tile_proxy = TileProxy(
+            self.url_template, memory_cache=MemoryTileCache(1000)
+        )
+        fetch_started = threading.Event()
+        release_fetch = threading.Event()
+
+        def get_tile_response(*args: str, **kwargs: str) -> Mock:
+            fetch_started.set()
+            release_fetch.wait(5)
+            return self.get_tile_response()
+
+        tiles = []
+        with patch(
+            'requests.Session.get', side_effect=get_tile_response
+        ) as get_mock:
+            threads = [
+                threading.Thread(
+                    target=lambda: tiles.append(
+                        tile_proxy.get_tile('a', '1', '2', '3')
+                    )
+                )
+                for _ in range(3)
+            ]
+            threads[0].start()
+            fetch_started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            # other requests wait for pending tile
+            time.sleep(0.1)
+            release_fetch.set()
+            for thread in threads:
+                thread.join(5)
+
+        get_mock.assert_called_once()
+        assert len(tiles) == 3
+        assert all(tile.content == b'tile' for tile in tiles)
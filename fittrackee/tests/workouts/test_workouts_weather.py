@@ -0,0 +1,191 @@
+import json
+import time
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, Iterator
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from fittrackee.users.models import User
+from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.utils import process_workout_enrichment
+from fittrackee.workouts.utils_gpx_stream import GpxPoint
+from fittrackee.workouts.utils_weather import (
+    StubWeatherProvider,
+    WeatherCache,
+    WeatherService,
+)
+
+from ..api_test_case import ApiTestCaseMixin
+
+STUB_WEATHER = {
+    'summary': 'Clear',
+    'icon': 'clear-day',
+    'temperature': 12.5,
+    'humidity': 0.6,
+    'wind': 3.2,
+}
+
+
+def get_point(latitude: float = 44.68095, minute: int = 44) -> GpxPoint:
+    return GpxPoint(
+        latitude, 6.07367, 998.0, datetime(2018, 3, 13, 12, minute, 45)
+    )
+
+
+def get_weather_service(
+    delay: float = 0, timeout: float = 1
+) -> WeatherService:
+    return WeatherService(
+        StubWeatherProvider(delay), WeatherCache(10, 3600), timeout
+    )
+
+
+class TestWeatherCache:
+    def test_it_returns_stored_weather(self) -> None:
+        weather_cache = WeatherCache(10, 3600)
+        key = (44.68, 6.07, datetime(2018, 3, 13, 12))
+        weather_cache.set(key, STUB_WEATHER)
+
+        assert weather_cache.get(key) == STUB_WEATHER
+
+    def test_it_does_not_return_expired_weather(self) -> None:
+        weather_cache = WeatherCache(10, -1)
+        key = (44.68, 6.07, datetime(2018, 3, 13, 12))
+        weather_cache.set(key, STUB_WEATHER)
+
+        assert weather_cache.get(key) is None
+
+    def test_it_removes_least_recently_used_weather_when_cache_is_full(
+        self,
+    ) -> None:
+        weather_cache = WeatherCache(2, 3600)
+        keys = [(44.68, 6.07, datetime(2018, 3, 13, hour)) for hour in [1, 2]]
+        for key in keys:
+            weather_cache.set(key, STUB_WEATHER)
+        weather_cache.get(keys[0])
+
+        weather_cache.set((44.68, 6.07, datetime(2018, 3, 13, 3)), {})
+
+        assert weather_cache.get(keys[0]) == STUB_WEATHER
+        assert weather_cache.get(keys[1]) is None
+
+
+class TestWeatherService:
+    def test_it_returns_none_when_no_provider_is_configured(self) -> None:
+        weather_service = WeatherService(None, WeatherCache(10, 3600))
+
+        assert weather_service.get_weather_data([get_point()]) == [None]
+
+    def test_it_returns_weather_for_each_point(self) -> None:
+        weather_service = get_weather_service()
+
+        assert weather_service.get_weather_data(
+            [get_point(), get_point(latitude=45.0)]
+        ) == [STUB_WEATHER, STUB_WEATHER]
+
+    def test_it_caches_weather_by_rounded_coordinates_and_hour(self) -> None:
+        weather_provider = StubWeatherProvider()
+        weather_service = WeatherService(
+            weather_provider, WeatherCache(10, 3600)
+        )
+
+        weather_service.get_weather_data([get_point(44.68095, minute=1)])
+        weather_service.get_weather_data([get_point(44.68101, minute=59)])
+
+        assert weather_provider.calls_count == 1
+
+    def test_it_fetches_weather_concurrently(self) -> None:
+        weather_service = get_weather_service(delay=0.2)
+        start = time.perf_counter()
+
+        weather_data = weather_service.get_weather_data(
+            [get_point(), get_point(latitude=45.0)]
+        )
+
+        assert time.perf_counter() - start < 0.4
+        assert weather_data == [STUB_WEATHER, STUB_WEATHER]
+
+    def test_it_returns_none_when_latency_budget_is_exceeded(self) -> None:
+        weather_service = get_weather_service(delay=0.5, timeout=0.01)
+
+        assert weather_service.get_weather_data([get_point()]) == [None]
+
+    def test_it_returns_weather_without_latency_budget(self) -> None:
+        weather_service = get_weather_service(delay=0.1, timeout=0.01)
+
+        assert weather_service.get_weather_data(
+            [get_point()], with_latency_budget=False
+        ) == [STUB_WEATHER]
+
+
+class TestPostWorkoutWithWeather(ApiTestCaseMixin):
+    @pytest.fixture
+    def slow_weather_service(self) -> Iterator[WeatherService]:
+        weather_service = get_weather_service(delay=0.5, timeout=0.01)
+        with patch(
+            'fittrackee.workouts.utils_gpx.get_weather_service',
+            return_value=weather_service,
+        ), patch(
+            'fittrackee.workouts.utils.get_weather_service',
+            return_value=weather_service,
+        ):
+            yield weather_service
+
+    def post_workout(self, app: Flask, gpx_file: str) -> Dict:
+        client, auth_token = self.get_test_client_and_auth_token(app)
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        assert response.status_code == 201
+        return json.loads(response.data.decode())
+
+    def test_it_adds_weather_data(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        app.config['WEATHER_PROVIDER'] = 'stub'
+
+        with patch(
+            'fittrackee.workouts.workouts.enrich_workout'
+        ) as enrich_workout_mock:
+            data = self.post_workout(app, gpx_file)
+
+        assert data['data']['workouts'][0]['weather_start'] == STUB_WEATHER
+        assert data['data']['workouts'][0]['weather_end'] == STUB_WEATHER
+        assert data['data']['workouts'][0]['enrichment_status'] == 'completed'
+        enrich_workout_mock.send.assert_not_called()
+
+    def test_it_fetches_weather_later_when_latency_budget_is_exceeded(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        slow_weather_service: WeatherService,
+    ) -> None:
+        with patch(
+            'fittrackee.workouts.workouts.enrich_workout'
+        ) as enrich_workout_mock:
+            data = self.post_workout(app, gpx_file)
+
+        assert data['data']['workouts'][0]['weather_start'] is None
+        assert data['data']['workouts'][0]['weather_end'] is None
+        assert data['data']['workouts'][0]['enrichment_status'] == 'pending'
+        workout = Workout.query.one()
+        enrich_workout_mock.send.assert_called_once_with(workout.id)
+
+        process_workout_enrichment(workout.id)
+
+        assert workout.weather_start == STUB_WEATHER
+        assert workout.weather_end == STUB_WEATHER
+        assert workout.enrichment_status == 'completed'
@@ -1,10 +1,13 @@
 import json
+from contextlib import contextmanager
 from io import BytesIO
-from typing import Tuple
+from typing import Any, Iterator, List, Tuple
 from uuid import uuid4
 
 from flask import Flask
+from sqlalchemy import event
 
+from fittrackee import db
 from fittrackee.workouts.utils_id import encode_uuid
 
 
@@ -32,3 +35,22 @@ def post_an_workout(app: Flask, gpx_file: str) -> Tuple[str, str]:
     )
     data = json.loads(response.data.decode())
     return token, data['data']['workouts'][0]['id']
+
+
+@contextmanager
+def count_queries() -> Iterator[List[str]]:
+    """
+    Return statements executed on database within context
+    """
+    queries: List[str] = []
+
+    def before_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
@@ -19,11 +19,18 @@ from fittrackee.responses import (
 )
 from fittrackee.tasks import reset_password_email
 from fittrackee.utils import get_readable_duration, verify_extension_and_size
-from fittrackee.workouts.utils_files import get_absolute_file_path
+from fittrackee.workouts.models import (
+    rebuild_workouts_daily_stats,
+    update_user_uploads_size,
+)
+from fittrackee.workouts.utils_files import (
+    get_absolute_file_path,
+    get_files_size,
+)
 
 from .decorators import authenticate
 from .models import User
-from .utils import check_passwords, register_controls
+from .utils import check_passwords, get_auth_user, register_controls
 from .utils_token import decode_user_token
 
 auth_blueprint = Blueprint('auth', __name__)
@@ -332,7 +339,10 @@ def get_authenticated_user_profile(
         - Invalid token. Please log in again.
 
     """
-    user = User.query.filter_by(id=auth_user_id).first()
+    user = get_auth_user(auth_user_id)
+    if not user:
+        # user deleted in another process, before cache expiration
+        return UnauthorizedErrorResponse('Provide a valid auth token.')
     return {'status': 'success', 'data': user.serialize()}
 
 
@@ -444,7 +454,10 @@ def edit_user(auth_user_id: int) -> Union[Dict, HttpResponse]:
         ).decode()
 
     try:
-        user = User.query.filter_by(id=auth_user_id).first()
+        user = get_auth_user(auth_user_id)
+        if not user:
+            # user deleted in another process, before cache expiration
+            return UnauthorizedErrorResponse('Provide a valid auth token.')
         user.first_name = first_name
         user.last_name = last_name
         user.bio = bio
@@ -457,7 +470,11 @@ def edit_user(auth_user_id: int) -> Union[Dict, HttpResponse]:
         )
         if password is not None and password != '':
             user.password = password
-        user.timezone = timezone
+        if user.timezone != timezone:
+            # workouts daily statistics depend on user timezone
+            user.timezone = timezone
+            db.session.flush()
+            rebuild_workouts_daily_stats(db.session.connection(), user.id)
         user.weekm = weekm
         db.session.commit()
 
@@ -540,12 +557,21 @@ def edit_picture(auth_user_id: int) -> Union[Dict, HttpResponse]:
     )
 
     try:
-        user = User.query.filter_by(id=auth_user_id).first()
+        user = get_auth_user(auth_user_id)
+        if not user:
+            # user deleted in another process, before cache expiration
+            return UnauthorizedErrorResponse('Provide a valid auth token.')
+        uploads_size = 0
         if user.picture is not None:
             old_picture_path = get_absolute_file_path(user.picture)
             if os.path.isfile(get_absolute_file_path(old_picture_path)):
+                uploads_size -= get_files_size([old_picture_path])
                 os.remove(old_picture_path)
         file.save(absolute_picture_path)
+        uploads_size += get_files_size([absolute_picture_path])
+        update_user_uploads_size(
+            db.session.connection(), user.id, uploads_size
+        )
         user.picture = relative_picture_path
         db.session.commit()
         return {
@@ -590,9 +616,17 @@ def del_picture(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
 
     """
     try:
-        user = User.query.filter_by(id=auth_user_id).first()
+        user = get_auth_user(auth_user_id)
+        if not user:
+            # user deleted in another process, before cache expiration
+            return UnauthorizedErrorResponse('Provide a valid auth token.')
         picture_path = get_absolute_file_path(user.picture)
         if os.path.isfile(picture_path):
+            update_user_uploads_size(
+                db.session.connection(),
+                user.id,
+                -get_files_size([picture_path]),
+            )
             os.remove(picture_path)
         user.picture = None
         db.session.commit()
@@ -1,16 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Optional, Union
 
 import jwt
 from flask import current_app
-from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.base import Connection
+from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.sql.expression import select
+from sqlalchemy.orm.mapper import Mapper
 
 from fittrackee import bcrypt, db
-from fittrackee.workouts.models import Workout
+from fittrackee.workouts.models import Workout  # noqa: F401
 
+from .utils_cache import invalidate_cached_user
 from .utils_token import decode_user_token, get_user_token
 
 BaseModel: DeclarativeMeta = db.Model
@@ -33,6 +35,8 @@ class User(BaseModel):
     timezone = db.Column(db.String(50), nullable=True)
     # does the week start Monday?
     weekm = db.Column(db.Boolean(50), default=False, nullable=False)
+    # Workout is imported in this module to be registered before
+    # relationships configuration
     workouts = db.relationship(
         'Workout', lazy=True, backref=db.backref('user', lazy='joined')
     )
@@ -40,6 +44,16 @@ class User(BaseModel):
         'Record', lazy=True, backref=db.backref('user', lazy='joined')
     )
     language = db.Column(db.String(50), nullable=True)
+    # size of user files in uploads directory (in bytes)
+    uploads_size = db.Column(db.BigInteger, default=0, nullable=False)
+    # workouts counters, updated on workout changes
+    nb_workouts = db.Column(db.Integer, default=0, nullable=False, index=True)
+    nb_sports = db.Column(db.Integer, default=0, nullable=False)
+    sports_list = db.Column(postgresql.ARRAY(db.Integer), nullable=True)
+    total_distance = db.Column(db.Numeric(12, 3), default=0, nullable=False)
+    total_duration = db.Column(
+        db.Interval, default=timedelta(0), nullable=False
+    )
 
     def __repr__(self) -> str:
         return f'<User {self.username!r}>'
@@ -90,36 +104,7 @@ class User(BaseModel):
         except jwt.InvalidTokenError:
             return 'Invalid token. Please log in again.'
 
-    @hybrid_property
-    def workouts_count(self) -> int:
-        return Workout.query.filter(Workout.user_id == self.id).count()
-
-    @workouts_count.expression  # type: ignore
-    def workouts_count(self) -> int:
-        return (
-            select([func.count(Workout.id)])
-            .where(Workout.user_id == self.id)
-            .label('workouts_count')
-        )
-
     def serialize(self) -> Dict:
-        sports = []
-        total = (0, '0:00:00')
-        if self.workouts_count > 0:  # type: ignore
-            sports = (
-                db.session.query(Workout.sport_id)
-                .filter(Workout.user_id == self.id)
-                .group_by(Workout.sport_id)
-                .order_by(Workout.sport_id)
-                .all()
-            )
-            total = (
-                db.session.query(
-                    func.sum(Workout.distance), func.sum(Workout.duration)
-                )
-                .filter(Workout.user_id == self.id)
-                .first()
-            )
         return {
             'username': self.username,
             'email': self.email,
@@ -134,11 +119,17 @@ class User(BaseModel):
             'timezone': self.timezone,
             'weekm': self.weekm,
             'language': self.language,
-            'nb_sports': len(sports),
-            'nb_workouts': self.workouts_count,
-            'sports_list': [
-                sport for sportslist in sports for sport in sportslist
-            ],
-            'total_distance': float(total[0]),
-            'total_duration': str(total[1]),
+            'nb_sports': self.nb_sports,
+            'nb_workouts': self.nb_workouts,
+            'sports_list': self.sports_list if self.sports_list else [],
+            'total_distance': float(self.total_distance),
+            'total_duration': str(self.total_duration),
         }
+
+
+@listens_for(User, 'after_update')
+@listens_for(User, 'after_delete')
+def on_user_update_or_delete(
+    mapper: Mapper, connection: Connection, user: User
+) -> None:
+    invalidate_cached_user(user.id)
@@ -11,17 +11,26 @@ from fittrackee.responses import (
     HttpResponse,
     InvalidPayloadErrorResponse,
     NotFoundErrorResponse,
+    UnauthorizedErrorResponse,
     UserNotFoundErrorResponse,
     handle_error_and_return_response,
 )
+from fittrackee.workouts.models import Workout, deferred_records_update
 from fittrackee.workouts.utils_files import get_absolute_file_path
 
 from .decorators import authenticate, authenticate_as_admin
-from .models import User, Workout
+from .models import User
+from .utils import get_auth_user
 
 users_blueprint = Blueprint('users', __name__)
 
 USER_PER_PAGE = 10
+USERS_ORDER_BY_COLUMNS = {
+    'admin': User.admin,
+    'created_at': User.created_at,
+    'username': User.username,
+    'workouts_count': User.nb_workouts,
+}
 
 
 @users_blueprint.route('/users', methods=['GET'])
@@ -134,30 +143,16 @@ def get_users(auth_user_id: int) -> Dict:
             User.username.like('%' + query + '%') if query else True,
         )
         .order_by(
-            User.workouts_count.asc()  # type: ignore
-            if order_by == 'workouts_count' and order == 'asc'
-            else True,
-            User.workouts_count.desc()  # type: ignore
-            if order_by == 'workouts_count' and order == 'desc'
-            else True,
-            User.username.asc()
-            if order_by == 'username' and order == 'asc'
-            else True,
-            User.username.desc()
-            if order_by == 'username' and order == 'desc'
-            else True,
-            User.created_at.asc()
-            if order_by == 'created_at' and order == 'asc'
-            else True,
-            User.created_at.desc()
-            if order_by == 'created_at' and order == 'desc'
-            else True,
-            User.admin.asc()
-            if order_by == 'admin' and order == 'asc'
-            else True,
-            User.admin.desc()
-            if order_by == 'admin' and order == 'desc'
-            else True,
+            *(
+                [
+                    USERS_ORDER_BY_COLUMNS[order_by].desc()
+                    if order == 'desc'
+                    else USERS_ORDER_BY_COLUMNS[order_by].asc()
+                ]
+                if order_by in USERS_ORDER_BY_COLUMNS
+                else []
+            ),
+            User.id.asc(),
         )
         .paginate(page, per_page, False)
     )
@@ -424,7 +419,10 @@ def delete_user(
 
     """
     try:
-        auth_user = User.query.filter_by(id=auth_user_id).first()
+        auth_user = get_auth_user(auth_user_id)
+        if not auth_user:
+            # user deleted in another process, before cache expiration
+            return UnauthorizedErrorResponse('Provide a valid auth token.')
         user = User.query.filter_by(username=user_name).first()
         if not user:
             return UserNotFoundErrorResponse()
@@ -440,12 +438,12 @@ def delete_user(
                 'no other user has admin rights.'
             )
 
-        for workout in Workout.query.filter_by(user_id=user.id).all():
-            db.session.delete(workout)
-            db.session.flush()
         user_picture = user.picture
-        db.session.delete(user)
-        db.session.commit()
+        with deferred_records_update():
+            for workout in Workout.query.filter_by(user_id=user.id).all():
+                db.session.delete(workout)
+            db.session.delete(user)
+            db.session.commit()
         if user_picture:
             picture_path = get_absolute_file_path(user.picture)
             if os.path.isfile(picture_path):
@@ -1,23 +1,57 @@
+import os
 import re
 from typing import Optional, Tuple
 
-from flask import Request
+from flask import Request, g
 
+from fittrackee import db
 from fittrackee.responses import (
     ForbiddenErrorResponse,
     HttpResponse,
     UnauthorizedErrorResponse,
 )
+from fittrackee.workouts.utils_files import (
+    get_absolute_file_path,
+    get_dir_size,
+)
 
 from .models import User
+from .utils_cache import CachedUser, get_cached_user, set_cached_user
+
+
+def get_auth_user(user_id: int) -> Optional[User]:
+    """
+    Return authenticated user, loaded once per request (user may have been
+    deleted since its attributes were cached)
+    """
+    if g.get('auth_user') is None:
+        g.auth_user = User.query.filter_by(id=user_id).first()
+    return g.auth_user
+
+
+def get_auth_user_attributes(user_id: int) -> CachedUser:
+    """
+    Return authenticated user attributes (if user exists, has admin rights
+    and user timezone), cached by each process for 'AUTH_USER_CACHE_TTL'
+    seconds
+    """
+    cached_user = get_cached_user(user_id)
+    if cached_user is None:
+        user = get_auth_user(user_id)
+        cached_user = CachedUser(
+            exists=user is not None,
+            admin=user.admin if user else False,
+            timezone=user.timezone if user else None,
+        )
+        set_cached_user(user_id, cached_user)
+    return cached_user
 
 
 def is_admin(user_id: int) -> bool:
     """
     Return if user has admin rights
     """
-    user = User.query.filter_by(id=user_id).first()
-    return user.admin
+    return get_auth_user_attributes(user_id).admin
 
 
 def is_valid_email(email: str) -> bool:
@@ -75,11 +109,18 @@ def verify_user(
     resp = User.decode_auth_token(auth_token)
     if isinstance(resp, str):
         return UnauthorizedErrorResponse(resp), None
-    user = User.query.filter_by(id=resp).first()
-    if not user:
+    # authenticated user is loaded by the first function needing it
+    g.auth_user = None
+    if verify_admin:
+        # admin rights are checked against database, in order to be revoked
+        # immediately
+        auth_user = get_auth_user(resp)
+        if not auth_user:
+            return UnauthorizedErrorResponse(default_message), None
+        if not auth_user.admin:
+            return ForbiddenErrorResponse(), None
+    elif not get_auth_user_attributes(resp).exists:
         return UnauthorizedErrorResponse(default_message), None
-    if verify_admin and not is_admin(resp):
-        return ForbiddenErrorResponse(), None
     return None, resp
 
 
@@ -92,3 +133,35 @@ def can_view_workout(
     if auth_user_id != workout_user_id:
         return ForbiddenErrorResponse()
     return None
+
+
+def get_user_uploads_size(user_id: int) -> int:
+    """
+    Return size of user files stored in uploads directory (workouts files
+    and picture)
+    """
+    return sum(
+        get_dir_size(
+            get_absolute_file_path(os.path.join(dir_name, str(user_id)))
+        )
+        for dir_name in ['workouts', 'pictures']
+    )
+
+
+def reconcile_users_uploads_size() -> int:
+    """
+    Update users uploads size (updated incrementally) with size of files
+    stored in uploads directory and return number of corrected users
+    """
+    corrected_users = 0
+    for user_id, uploads_size in db.session.query(
+        User.id, User.uploads_size
+    ).all():
+        files_size = get_user_uploads_size(user_id)
+        if files_size != uploads_size:
+            User.query.filter_by(id=user_id).update(
+                {'uploads_size': files_size}
+            )
+            db.session.commit()
+            corrected_users += 1
+    return corrected_users
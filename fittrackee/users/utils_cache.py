@@ -0,0 +1,45 @@
+import threading
+from collections import namedtuple
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+
+# user attributes needed to authenticate requests
+CachedUser = namedtuple('CachedUser', ['exists', 'admin', 'timezone'])
+
+# users attributes with expiration time, cached by each process
+_cached_users: Dict[int, Tuple[float, CachedUser]] = {}
+_cached_users_lock = threading.Lock()
+
+
+def get_cached_user(user_id: int) -> Optional[CachedUser]:
+    """
+    Return user attributes if cached and not expired
+    """
+    if current_app.config['AUTH_USER_CACHE_TTL'] <= 0:
+        return None
+    with _cached_users_lock:
+        cached_user = _cached_users.get(user_id)
+    if cached_user is None or cached_user[0] <= monotonic():
+        return None
+    return cached_user[1]
+
+
+def set_cached_user(user_id: int, cached_user: CachedUser) -> None:
+    """
+    Cache user attributes for 'AUTH_USER_CACHE_TTL' seconds
+    """
+    ttl = current_app.config['AUTH_USER_CACHE_TTL']
+    if ttl > 0:
+        with _cached_users_lock:
+            _cached_users[user_id] = (monotonic() + ttl, cached_user)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """
+    Remove user attributes from cache (only in current process, other
+    processes caches expire after 'AUTH_USER_CACHE_TTL' seconds)
+    """
+    with _cached_users_lock:
+        _cached_users.pop(user_id, None)
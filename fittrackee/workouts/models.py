@@ -1,21 +1,36 @@
 import datetime
 import os
-from typing import Any, Dict, Optional, Union
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 from uuid import UUID, uuid4
 
+from sqlalchemy import (
+    cast,
+    distinct,
+    func,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+)
 from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 from sqlalchemy.engine.base import Connection
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Query, aliased
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.orm.mapper import Mapper
 from sqlalchemy.orm.session import Session, object_session
+from sqlalchemy.sql import Select
 from sqlalchemy.types import JSON, Enum
 
-from fittrackee import db
+from fittrackee import appLog, db
 
-from .utils_files import get_absolute_file_path
-from .utils_format import convert_in_duration, convert_value_to_integer
+from .utils_chart_data import get_chart_data_file_path, remove_chart_data_file
+from .utils_files import get_absolute_file_path, get_files_size
+from .utils_format import convert_value_to_integer
 from .utils_id import encode_uuid
 
 BaseModel: DeclarativeMeta = db.Model
@@ -25,45 +40,481 @@ record_types = [
     'LD',  # 'Longest Duration'
     'MS',  # 'Max speed'
 ]
+record_types_columns = {
+    'AS': 'ave_speed',  # 'Average speed'
+    'FD': 'distance',  # 'Farthest Distance'
+    'LD': 'moving',  # 'Longest Duration'
+    'MS': 'max_speed',  # 'Max speed'
+}
+import_job_statuses = [
+    'queued',
+    'in_progress',
+    'completed',  # at least one workout created
+    'failed',
+]
+# session info key for users and sports with deferred records update
+DEFERRED_RECORDS_KEY = 'deferred_records'
+workout_enrichment_statuses = [
+    'pending',  # map or weather data not added yet
+    'completed',
+    'failed',
+]
+# workout columns used by daily statistics and user counters
+stats_columns = [
+    'user_id',
+    'sport_id',
+    'workout_date',
+    'duration',
+    'distance',
+    'moving',
+    'ascent',
+    'descent',
+]
+# users table, needed for user timezone and counters (User model imports
+# Workout)
+users_table = db.table(
+    'users',
+    db.column('id'),
+    db.column('timezone'),
+    db.column('uploads_size'),
+    db.column('nb_workouts'),
+    db.column('nb_sports'),
+    db.column('sports_list'),
+    db.column('total_distance'),
+    db.column('total_duration'),
+)
+
+
+def upsert_records(new_records: List[Dict], connection: Connection) -> None:
+    """
+    Insert or update records with a single statement
+    """
+    if not new_records:
+        return
+    insert_statement = insert(Record.__table__).values(new_records)
+    connection.execute(
+        insert_statement.on_conflict_do_update(
+            constraint='user_sports_records',
+            set_={
+                column: insert_statement.excluded[column]
+                for column in [
+                    'workout_id',
+                    'workout_uuid',
+                    'workout_date',
+                    'value',
+                ]
+            },
+        )
+    )
 
 
 def update_records(
-    user_id: int, sport_id: int, connection: Connection, session: Session
+    users_sports: List[Tuple[int, int]], connection: Connection
 ) -> None:
+    """
+    Recalculate records for given users and sports: records are upserted
+    with a single statement and records without value are removed
+    """
     record_table = Record.__table__
-    new_records = Workout.get_user_workout_records(user_id, sport_id)
-    for record_type, record_data in new_records.items():
-        if record_data['record_value']:
-            record = Record.query.filter_by(
-                user_id=user_id, sport_id=sport_id, record_type=record_type
-            ).first()
-            if record:
-                value = convert_value_to_integer(
-                    record_type, record_data['record_value']
-                )
-                connection.execute(
-                    record_table.update()
-                    .where(record_table.c.id == record.id)
-                    .values(
-                        value=value,
-                        workout_id=record_data['workout'].id,
-                        workout_uuid=record_data['workout'].uuid,
-                        workout_date=record_data['workout'].workout_date,
-                    )
+    new_records = []
+    removed_records = []
+    for (user_id, sport_id), records in Workout.get_users_workouts_records(
+        users_sports
+    ).items():
+        for record_type, record_data in records.items():
+            if record_data['record_value']:
+                new_records.append(
+                    {
+                        'user_id': user_id,
+                        'sport_id': sport_id,
+                        'workout_id': record_data['workout'].id,
+                        'workout_uuid': record_data['workout'].uuid,
+                        'record_type': record_type,
+                        'workout_date': record_data['workout'].workout_date,
+                        'value': convert_value_to_integer(
+                            record_type, record_data['record_value']
+                        ),
+                    }
                 )
             else:
-                new_record = Record(
-                    workout=record_data['workout'], record_type=record_type
+                removed_records.append((user_id, sport_id, record_type))
+
+    upsert_records(new_records, connection)
+    if removed_records:
+        connection.execute(
+            record_table.delete().where(
+                tuple_(
+                    record_table.c.user_id,
+                    record_table.c.sport_id,
+                    record_table.c.record_type,
+                ).in_(removed_records)
+            )
+        )
+
+
+def update_records_with_workout(
+    workout: 'Workout', connection: Connection
+) -> bool:
+    """
+    Update records of workout user and sport, comparing workout values with
+    stored records (on same value, the oldest workout holds the record).
+
+    Return False if records must be fully recalculated, when a record is
+    missing or when workout has no value for a record type (workouts with
+    no value are sorted first when records are recalculated).
+    """
+    workout_table = Workout.__table__
+    record_table = Record.__table__
+    workout_values = connection.execute(
+        select(
+            *[
+                workout_table.c[column]
+                for column in record_types_columns.values()
+            ]
+        ).where(workout_table.c.id == workout.id)
+    ).one()
+    records = {
+        record.record_type: record
+        for record in connection.execute(
+            select(record_table).where(
+                record_table.c.user_id == workout.user_id,
+                record_table.c.sport_id == workout.sport_id,
+            )
+        )
+    }
+    new_records = []
+    for record_type, workout_value in zip(
+        record_types_columns, workout_values
+    ):
+        record = records.get(record_type)
+        if record is None or workout_value is None:
+            return False
+        value = convert_value_to_integer(record_type, workout_value)
+        if value > record.value or (
+            value == record.value
+            and workout.workout_date < record.workout_date
+        ):
+            new_records.append(
+                {
+                    'user_id': workout.user_id,
+                    'sport_id': workout.sport_id,
+                    'workout_id': workout.id,
+                    'workout_uuid': workout.uuid,
+                    'record_type': record_type,
+                    'workout_date': workout.workout_date,
+                    'value': value,
+                }
+            )
+    upsert_records(new_records, connection)
+    return True
+
+
+def get_records_sports(workout_id: int, connection: Connection) -> Set[int]:
+    """
+    Return ids of sports of records held by workout
+    """
+    record_table = Record.__table__
+    return {
+        sport_id
+        for sport_id, in connection.execute(
+            select(record_table.c.sport_id).where(
+                record_table.c.workout_id == workout_id
+            )
+        )
+    }
+
+
+@contextmanager
+def deferred_records_update() -> Iterator[None]:
+    """
+    Defer records update during bulk operations: users and sports of
+    workouts flushed in context are collected and records are recalculated
+    once for each pair when exiting context (in a new transaction, so
+    changes must be committed before exiting context).
+    On error, current transaction is rolled back before updating records
+    (workouts may have been committed), errors on records update being only
+    logged in order to raise initial error.
+    """
+    session = db.session
+    if DEFERRED_RECORDS_KEY in session.info:
+        yield
+        return
+    users_sports: Set[Tuple[int, int]] = set()
+    session.info[DEFERRED_RECORDS_KEY] = users_sports
+    try:
+        yield
+    except Exception:
+        session.rollback()
+        try:
+            update_deferred_records(session, users_sports)
+        except Exception as e:
+            session.rollback()
+            appLog.error(f'Error when updating records: {e}')
+        raise
+    finally:
+        del session.info[DEFERRED_RECORDS_KEY]
+    update_deferred_records(session, users_sports)
+
+
+def update_deferred_records(
+    session: Session, users_sports: Set[Tuple[int, int]]
+) -> None:
+    """
+    Recalculate records for users and sports collected in deferred context
+    """
+    if users_sports:
+        update_records(list(users_sports), session.connection())
+        session.commit()
+
+
+def defer_records_update(
+    session: Session, users_sports: List[Tuple[int, int]]
+) -> bool:
+    """
+    Return True if records update is deferred for given users and sports
+    """
+    deferred_users_sports = session.info.get(DEFERRED_RECORDS_KEY)
+    if deferred_users_sports is None:
+        return False
+    deferred_users_sports.update(users_sports)
+    return True
+
+
+def get_workouts_daily_stats_query(filters: List, sign: int = 1) -> Select:
+    """
+    Return query calculating statistics of workouts matching filters by
+    user, sport and date in user timezone (values are negated if sign is -1)
+    """
+    workout_table = Workout.__table__
+    local_date = cast(
+        func.timezone(
+            func.coalesce(users_table.c.timezone, 'UTC'),
+            func.timezone('UTC', workout_table.c.workout_date),
+        ),
+        db.Date,
+    )
+    return (
+        select(
+            workout_table.c.user_id,
+            workout_table.c.sport_id,
+            local_date,
+            sign * func.count(workout_table.c.id),
+            sign * func.coalesce(func.sum(workout_table.c.distance), 0),
+            sign
+            * cast(
+                func.coalesce(
+                    func.sum(func.extract('epoch', workout_table.c.moving)),
+                    0,
+                ),
+                db.Integer,
+            ),
+            sign * func.coalesce(func.sum(workout_table.c.ascent), 0),
+            sign * func.coalesce(func.sum(workout_table.c.descent), 0),
+        )
+        .select_from(
+            workout_table.join(
+                users_table, users_table.c.id == workout_table.c.user_id
+            )
+        )
+        .where(*filters)
+        .group_by(
+            workout_table.c.user_id, workout_table.c.sport_id, local_date
+        )
+    )
+
+
+def update_workout_daily_stats(
+    workout: 'Workout', connection: Connection, sign: int
+) -> None:
+    """
+    Add (sign is 1) or subtract (sign is -1) workout values, as stored in
+    database, to daily statistics. Daily statistics without workouts are
+    removed.
+    """
+    daily_stats_table = WorkoutDailyStats.__table__
+    insert_statement = insert(daily_stats_table).from_select(
+        daily_stats_table.columns.keys(),
+        get_workouts_daily_stats_query(
+            [Workout.__table__.c.id == workout.id], sign
+        ),
+    )
+    connection.execute(
+        insert_statement.on_conflict_do_update(
+            index_elements=['user_id', 'sport_id', 'local_date'],
+            set_={
+                values_column: daily_stats_table.c[values_column]
+                + insert_statement.excluded[values_column]
+                for values_column in WorkoutDailyStats.values_columns
+            },
+        )
+    )
+    if sign < 0:
+        connection.execute(
+            daily_stats_table.delete().where(
+                daily_stats_table.c.user_id == workout.user_id,
+                daily_stats_table.c.nb_workouts <= 0,
+            )
+        )
+
+
+def rebuild_workouts_daily_stats(
+    connection: Connection, user_id: Optional[int] = None
+) -> None:
+    """
+    Recalculate daily statistics of all users or of a given user
+    """
+    daily_stats_table = WorkoutDailyStats.__table__
+    workout_table = Workout.__table__
+    connection.execute(
+        daily_stats_table.delete().where(
+            daily_stats_table.c.user_id == user_id if user_id else True
+        )
+    )
+    connection.execute(
+        insert(daily_stats_table).from_select(
+            daily_stats_table.columns.keys(),
+            get_workouts_daily_stats_query(
+                [workout_table.c.user_id == user_id] if user_id else []
+            ),
+        )
+    )
+
+
+def get_workout_files_size(
+    gpx: Optional[str], map_filepath: Optional[str]
+) -> int:
+    """
+    Return size of workout files (gpx file, chart data and map image)
+    """
+    file_paths = []
+    if gpx:
+        absolute_gpx_filepath = get_absolute_file_path(gpx)
+        file_paths.extend(
+            [
+                absolute_gpx_filepath,
+                get_chart_data_file_path(absolute_gpx_filepath),
+            ]
+        )
+    if map_filepath:
+        file_paths.append(get_absolute_file_path(map_filepath))
+    return get_files_size(file_paths)
+
+
+def update_user_uploads_size(
+    connection: Connection, user_id: int, size: int
+) -> None:
+    """
+    Add size (negative when files are removed) to user uploads size
+    """
+    if size == 0:
+        return
+    connection.execute(
+        users_table.update()
+        .where(users_table.c.id == user_id)
+        .values(uploads_size=users_table.c.uploads_size + size)
+    )
+
+
+def get_user_sports_counters(user_id: Any) -> Dict:
+    """
+    Return expressions of user sports counters, calculated from daily
+    statistics
+    """
+    daily_stats_table = WorkoutDailyStats.__table__
+    sport_id = daily_stats_table.c.sport_id
+    return {
+        'nb_sports': select(func.count(distinct(sport_id)))
+        .where(daily_stats_table.c.user_id == user_id)
+        .scalar_subquery(),
+        'sports_list': func.coalesce(
+            select(
+                func.array_agg(
+                    aggregate_order_by(distinct(sport_id), sport_id)
                 )
-                new_record.value = record_data['record_value']  # type: ignore
-                session.add(new_record)
-        else:
-            connection.execute(
-                record_table.delete()
-                .where(record_table.c.user_id == user_id)
-                .where(record_table.c.sport_id == sport_id)
-                .where(record_table.c.record_type == record_type)
             )
+            .where(daily_stats_table.c.user_id == user_id)
+            .scalar_subquery(),
+            literal_column("'{}'"),
+        ),
+    }
+
+
+def update_user_workouts_counters(
+    workout: 'Workout', connection: Connection, sign: int
+) -> None:
+    """
+    Add (sign is 1) or subtract (sign is -1) workout values, as stored in
+    database, to user counters (daily statistics must be updated first)
+    """
+    workout_table = Workout.__table__
+    connection.execute(
+        users_table.update()
+        .where(
+            users_table.c.id == workout_table.c.user_id,
+            workout_table.c.id == workout.id,
+        )
+        .values(
+            nb_workouts=users_table.c.nb_workouts + sign,
+            total_distance=users_table.c.total_distance
+            + sign * func.coalesce(workout_table.c.distance, 0),
+            total_duration=users_table.c.total_duration
+            + sign * workout_table.c.duration,
+            **get_user_sports_counters(users_table.c.id),
+        )
+    )
+
+
+def update_workout_stats(
+    workout: 'Workout', connection: Connection, sign: int
+) -> None:
+    """
+    Add (sign is 1) or subtract (sign is -1) workout values to daily
+    statistics and user counters
+    """
+    update_workout_daily_stats(workout, connection, sign)
+    update_user_workouts_counters(workout, connection, sign)
+
+
+def rebuild_users_workouts_counters(
+    connection: Connection, user_id: Optional[int] = None
+) -> None:
+    """
+    Recalculate workouts counters of all users or of a given user
+    """
+    workout_table = Workout.__table__
+    user_workouts = select(
+        func.count(workout_table.c.id).label('nb_workouts'),
+        func.coalesce(func.sum(workout_table.c.distance), 0).label(
+            'total_distance'
+        ),
+        func.coalesce(
+            func.sum(workout_table.c.duration), datetime.timedelta(0)
+        ).label('total_duration'),
+    ).where(workout_table.c.user_id == users_table.c.id)
+    connection.execute(
+        users_table.update()
+        .where(users_table.c.id == user_id if user_id else True)
+        .values(
+            **{
+                column: user_workouts.with_only_columns(
+                    [user_workouts.selected_columns[column]]
+                ).scalar_subquery()
+                for column in [
+                    'nb_workouts',
+                    'total_distance',
+                    'total_duration',
+                ]
+            },
+            **get_user_sports_counters(users_table.c.id),
+        )
+    )
+
+
+def has_stats_changes(workout: 'Workout') -> bool:
+    return any(
+        get_history(workout, stats_column).has_changes()
+        for stats_column in stats_columns
+    )
 
 
 class Sport(BaseModel):
@@ -99,6 +550,40 @@ class Sport(BaseModel):
 
 class Workout(BaseModel):
     __tablename__ = 'workouts'
+    __table_args__ = (
+        # used by workouts list keyset pagination
+        db.Index(
+            'ix_workouts_user_id_workout_date_id',
+            'user_id',
+            'workout_date',
+            'id',
+        ),
+        # used by records calculation
+        db.Index(
+            'ix_workouts_user_id_sport_id_ave_speed',
+            'user_id',
+            'sport_id',
+            'ave_speed',
+        ),
+        db.Index(
+            'ix_workouts_user_id_sport_id_distance',
+            'user_id',
+            'sport_id',
+            'distance',
+        ),
+        db.Index(
+            'ix_workouts_user_id_sport_id_max_speed',
+            'user_id',
+            'sport_id',
+            'max_speed',
+        ),
+        db.Index(
+            'ix_workouts_user_id_sport_id_moving',
+            'user_id',
+            'sport_id',
+            'moving',
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     uuid = db.Column(
         postgresql.UUID(as_uuid=True),
@@ -129,10 +614,15 @@ class Workout(BaseModel):
     ave_speed = db.Column(db.Numeric(6, 2), nullable=True)  # km/h
     bounds = db.Column(postgresql.ARRAY(db.Float), nullable=True)
     map = db.Column(db.String(255), nullable=True)
-    map_id = db.Column(db.String(50), nullable=True)
+    map_id = db.Column(db.String(50), index=True, nullable=True)
     weather_start = db.Column(JSON, nullable=True)
     weather_end = db.Column(JSON, nullable=True)
     notes = db.Column(db.String(500), nullable=True)
+    enrichment_status = db.Column(
+        Enum(*workout_enrichment_statuses, name='workout_enrichment_statuses'),
+        default='completed',
+        nullable=False,
+    )
     segments = db.relationship(
         'WorkoutSegment',
         lazy=True,
@@ -167,92 +657,49 @@ class Workout(BaseModel):
     def short_id(self) -> str:
         return encode_uuid(self.uuid)
 
-    def serialize(self, params: Optional[Dict] = None) -> Dict:
-        date_from = params.get('from') if params else None
-        date_to = params.get('to') if params else None
-        distance_from = params.get('distance_from') if params else None
-        distance_to = params.get('distance_to') if params else None
-        duration_from = params.get('duration_from') if params else None
-        duration_to = params.get('duration_to') if params else None
-        ave_speed_from = params.get('ave_speed_from') if params else None
-        ave_speed_to = params.get('ave_speed_to') if params else None
-        max_speed_from = params.get('max_speed_from') if params else None
-        max_speed_to = params.get('max_speed_to') if params else None
-        sport_id = params.get('sport_id') if params else None
-        previous_workout = (
-            Workout.query.filter(
-                Workout.id != self.id,
-                Workout.user_id == self.user_id,
-                Workout.sport_id == sport_id if sport_id else True,
-                Workout.workout_date <= self.workout_date,
-                Workout.workout_date
-                >= datetime.datetime.strptime(date_from, '%Y-%m-%d')
-                if date_from
-                else True,
-                Workout.workout_date
-                <= datetime.datetime.strptime(date_to, '%Y-%m-%d')
-                if date_to
-                else True,
-                Workout.distance >= int(distance_from)
-                if distance_from
-                else True,
-                Workout.distance <= int(distance_to) if distance_to else True,
-                Workout.duration >= convert_in_duration(duration_from)
-                if duration_from
-                else True,
-                Workout.duration <= convert_in_duration(duration_to)
-                if duration_to
-                else True,
-                Workout.ave_speed >= float(ave_speed_from)
-                if ave_speed_from
-                else True,
-                Workout.ave_speed <= float(ave_speed_to)
-                if ave_speed_to
-                else True,
-                Workout.max_speed >= float(max_speed_from)
-                if max_speed_from
-                else True,
-                Workout.max_speed <= float(max_speed_to)
-                if max_speed_to
-                else True,
+    @classmethod
+    def get_adjacent_workouts(
+        cls, filters: List, workouts_ids: List[int]
+    ) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+        """
+        Return short ids of previous and next workouts for given workouts,
+        among workouts matching filters.
+        Adjacent workouts are calculated in a single query with window
+        functions.
+        """
+        if not workouts_ids:
+            return {}
+        order_by = (cls.workout_date, cls.id)
+        filtered_workouts = (
+            db.session.query(
+                cls.id.label('id'),
+                func.lag(cls.uuid).over(order_by=order_by).label('previous'),
+                func.lead(cls.uuid).over(order_by=order_by).label('next'),
             )
-            .order_by(Workout.workout_date.desc())
-            .first()
+            .filter(*filters)
+            .subquery()
         )
-        next_workout = (
-            Workout.query.filter(
-                Workout.id != self.id,
-                Workout.user_id == self.user_id,
-                Workout.sport_id == sport_id if sport_id else True,
-                Workout.workout_date >= self.workout_date,
-                Workout.workout_date
-                >= datetime.datetime.strptime(date_from, '%Y-%m-%d')
-                if date_from
-                else True,
-                Workout.workout_date
-                <= datetime.datetime.strptime(date_to, '%Y-%m-%d')
-                if date_to
-                else True,
-                Workout.distance >= int(distance_from)
-                if distance_from
-                else True,
-                Workout.distance <= int(distance_to) if distance_to else True,
-                Workout.duration >= convert_in_duration(duration_from)
-                if duration_from
-                else True,
-                Workout.duration <= convert_in_duration(duration_to)
-                if duration_to
-                else True,
-                Workout.ave_speed >= float(ave_speed_from)
-                if ave_speed_from
-                else True,
-                Workout.ave_speed <= float(ave_speed_to)
-                if ave_speed_to
-                else True,
+        return {
+            workout_id: (
+                encode_uuid(previous_uuid) if previous_uuid else None,
+                encode_uuid(next_uuid) if next_uuid else None,
             )
-            .order_by(Workout.workout_date.asc())
-            .first()
-        )
+            for workout_id, previous_uuid, next_uuid in db.session.query(
+                filtered_workouts
+            ).filter(filtered_workouts.c.id.in_(workouts_ids))
+        }
+
+    def serialize(
+        self,
+        adjacent_workouts: Optional[
+            Tuple[Optional[str], Optional[str]]
+        ] = None,
+    ) -> Dict:
+        if adjacent_workouts is None:
+            adjacent_workouts = Workout.get_adjacent_workouts(
+                [Workout.user_id == self.user_id], [self.id]
+            ).get(self.id, (None, None))
+        previous_workout, next_workout = adjacent_workouts
         return {
             'id': self.short_id,  # WARNING: client use uuid as id
             'user': self.user.username,
@@ -275,73 +722,160 @@ class Workout(BaseModel):
             'bounds': [float(bound) for bound in self.bounds]
             if self.bounds
             else [],  # noqa
-            'previous_workout': previous_workout.short_id
-            if previous_workout
-            else None,  # noqa
-            'next_workout': next_workout.short_id if next_workout else None,
+            'previous_workout': previous_workout,
+            'next_workout': next_workout,
             'segments': [segment.serialize() for segment in self.segments],
             'records': [record.serialize() for record in self.records],
             'map': self.map_id if self.map else None,
             'weather_start': self.weather_start,
             'weather_end': self.weather_end,
             'notes': self.notes,
+            'enrichment_status': self.enrichment_status,
         }
 
     @classmethod
-    def get_user_workout_records(
-        cls, user_id: int, sport_id: int, as_integer: Optional[bool] = False
-    ) -> Dict:
-        record_types_columns = {
-            'AS': 'ave_speed',  # 'Average speed'
-            'FD': 'distance',  # 'Farthest Distance'
-            'LD': 'moving',  # 'Longest Duration'
-            'MS': 'max_speed',  # 'Max speed'
+    def get_users_workouts_records(
+        cls, users_sports: List[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], Dict]:
+        """
+        Return records workouts for given users and sports.
+        Records are calculated in a single query, ranking workouts for each
+        record type with window functions (on same value, the oldest workout
+        holds the record).
+        """
+        users_records: Dict[Tuple[int, int], Dict] = {
+            user_sport: {
+                record_type: dict(record_value=None, workout=None)
+                for record_type in record_types_columns
+            }
+            for user_sport in users_sports
         }
-        records = {}
-        for record_type, column in record_types_columns.items():
-            column_sorted = getattr(getattr(Workout, column), 'desc')()
-            record_workout = (
-                Workout.query.filter_by(user_id=user_id, sport_id=sport_id)
-                .order_by(column_sorted, Workout.workout_date)
-                .first()
-            )
-            records[record_type] = dict(
-                record_value=(
-                    getattr(record_workout, column) if record_workout else None
-                ),
-                workout=record_workout,
+        if not users_sports:
+            return users_records
+
+        for workout, *workout_ranks in cls.get_records_workouts_query(
+            users_sports
+        ):
+            records = users_records[(workout.user_id, workout.sport_id)]
+            for (record_type, column), rank in zip(
+                record_types_columns.items(), workout_ranks
+            ):
+                if rank == 1:
+                    records[record_type] = dict(
+                        record_value=getattr(workout, column),
+                        workout=workout,
+                    )
+        return users_records
+
+    @classmethod
+    def get_records_workouts_query(
+        cls, users_sports: List[Tuple[int, int]]
+    ) -> Query:
+        """
+        Return query selecting workouts holding at least one record for given
+        users and sports, with their rank for each record type
+        """
+        ranked_workouts = (
+            db.session.query(
+                cls,
+                *[
+                    func.row_number()
+                    .over(
+                        partition_by=(cls.user_id, cls.sport_id),
+                        order_by=(
+                            getattr(cls, column).desc(),
+                            cls.workout_date,
+                        ),
+                    )
+                    .label(f'{record_type.lower()}_rank')
+                    for record_type, column in record_types_columns.items()
+                ],
             )
-        return records
+            .filter(tuple_(cls.user_id, cls.sport_id).in_(users_sports))
+            .subquery()
+        )
+        ranked_workout = aliased(cls, ranked_workouts)
+        ranks = [
+            ranked_workouts.c[f'{record_type.lower()}_rank']
+            for record_type in record_types_columns
+        ]
+        return db.session.query(ranked_workout, *ranks).filter(
+            or_(*[rank == 1 for rank in ranks])
+        )
+
+    @classmethod
+    def get_user_workout_records(cls, user_id: int, sport_id: int) -> Dict:
+        return cls.get_users_workouts_records([(user_id, sport_id)])[
+            (user_id, sport_id)
+        ]
 
 
 @listens_for(Workout, 'after_insert')
 def on_workout_insert(
     mapper: Mapper, connection: Connection, workout: Workout
 ) -> None:
+    update_workout_stats(workout, connection, 1)
+    if defer_records_update(
+        object_session(workout), [(workout.user_id, workout.sport_id)]
+    ):
+        return
+
     @listens_for(db.Session, 'after_flush', once=True)
     def receive_after_flush(session: Session, context: Any) -> None:
-        update_records(
-            workout.user_id, workout.sport_id, connection, session
-        )  # noqa
+        # a new record can only come from the new workout
+        if not update_records_with_workout(workout, connection):
+            update_records([(workout.user_id, workout.sport_id)], connection)
+
+
+@listens_for(Workout, 'before_update')
+def on_workout_before_update(
+    mapper: Mapper, connection: Connection, workout: Workout
+) -> None:
+    # previous values are still stored in database
+    if has_stats_changes(workout):
+        update_workout_stats(workout, connection, -1)
 
 
 @listens_for(Workout, 'after_update')
 def on_workout_update(
     mapper: Mapper, connection: Connection, workout: Workout
 ) -> None:
-    if object_session(workout).is_modified(
-        workout, include_collections=True
-    ):  # noqa
+    if has_stats_changes(workout):
+        update_workout_stats(workout, connection, 1)
+    session = object_session(workout)
+    if session.is_modified(workout, include_collections=True):  # noqa
+        if defer_records_update(
+            session,
+            [
+                (workout.user_id, sport_id)
+                for sport_id in {
+                    workout.sport_id,
+                    *get_records_sports(workout.id, connection),
+                }
+            ],
+        ):
+            return
 
         @listens_for(db.Session, 'after_flush', once=True)
         def receive_after_flush(session: Session, context: Any) -> None:
-            sports_list = [workout.sport_id]
-            records = Record.query.filter_by(workout_id=workout.id).all()
-            for rec in records:
-                if rec.sport_id not in sports_list:
-                    sports_list.append(rec.sport_id)
-            for sport_id in sports_list:
-                update_records(workout.user_id, sport_id, connection, session)
+            # records held by updated workout are recalculated
+            records_sports = get_records_sports(workout.id, connection)
+            if (
+                workout.sport_id not in records_sports
+                and not update_records_with_workout(workout, connection)
+            ):
+                records_sports.add(workout.sport_id)
+            update_records(
+                [(workout.user_id, sport_id) for sport_id in records_sports],
+                connection,
+            )
+
+
+@listens_for(Workout, 'before_delete')
+def on_workout_before_delete(
+    mapper: Mapper, connection: Connection, workout: Workout
+) -> None:
+    update_workout_stats(workout, connection, -1)
 
 
 @listens_for(Workout, 'after_delete')
@@ -350,10 +884,17 @@ def on_workout_delete(
 ) -> None:
     @listens_for(db.Session, 'after_flush', once=True)
     def receive_after_flush(session: Session, context: Any) -> None:
+        update_user_uploads_size(
+            connection,
+            old_record.user_id,
+            -get_workout_files_size(old_record.gpx, old_record.map),
+        )
         if old_record.map:
             os.remove(get_absolute_file_path(old_record.map))
         if old_record.gpx:
-            os.remove(get_absolute_file_path(old_record.gpx))
+            absolute_gpx_filepath = get_absolute_file_path(old_record.gpx)
+            os.remove(absolute_gpx_filepath)
+            remove_chart_data_file(absolute_gpx_filepath)
 
 
 class WorkoutSegment(BaseModel):
@@ -477,19 +1018,118 @@ class Record(BaseModel):
 def on_record_delete(
     mapper: Mapper, connection: Connection, old_record: Record
 ) -> None:
+    if defer_records_update(
+        object_session(old_record),
+        [(old_record.user_id, old_record.sport_id)],
+    ):
+        return
+
     @listens_for(db.Session, 'after_flush', once=True)
     def receive_after_flush(session: Session, context: Any) -> None:
-        workout = old_record.workouts
-        new_records = Workout.get_user_workout_records(
-            workout.user_id, workout.sport_id
+        update_records([(old_record.user_id, old_record.sport_id)], connection)
+
+
+class WorkoutDailyStats(BaseModel):
+    """
+    Workouts statistics by user, sport and day (in user timezone), updated
+    on workouts changes
+    """
+
+    __tablename__ = 'workout_daily_stats'
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    sport_id = db.Column(
+        db.Integer, db.ForeignKey('sports.id'), primary_key=True
+    )
+    local_date = db.Column(db.Date, primary_key=True)
+    nb_workouts = db.Column(db.Integer, nullable=False)
+    total_distance = db.Column(db.Numeric(10, 3), nullable=False)  # km
+    total_duration = db.Column(db.Integer, nullable=False)  # moving, seconds
+    total_ascent = db.Column(db.Numeric(10, 2), nullable=False)  # meters
+    total_descent = db.Column(db.Numeric(10, 2), nullable=False)  # meters
+
+    values_columns = [
+        'nb_workouts',
+        'total_distance',
+        'total_duration',
+        'total_ascent',
+        'total_descent',
+    ]
+
+    def __repr__(self) -> str:
+        return (
+            f'<WorkoutDailyStats {self.user_id} {self.sport_id} '
+            f'{self.local_date}>'
         )
-        for record_type, record_data in new_records.items():
-            if (
-                record_data['record_value']
-                and record_type == old_record.record_type
-            ):
-                new_record = Record(
-                    workout=record_data['workout'], record_type=record_type
-                )
-                new_record.value = record_data['record_value']  # type: ignore
-                session.add(new_record)
+
+
+class ImportJob(BaseModel):
+    __tablename__ = 'import_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    uuid = db.Column(
+        postgresql.UUID(as_uuid=True),
+        default=uuid4,
+        unique=True,
+        nullable=False,
+    )
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        index=True,
+        nullable=False,
+    )
+    status = db.Column(
+        Enum(*import_job_statuses, name='import_job_statuses'),
+        default='queued',
+        nullable=False,
+    )
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=True)
+    workout_data = db.Column(JSON, nullable=False)
+    files_count = db.Column(db.Integer, default=0, nullable=False)
+    processed_files = db.Column(db.Integer, default=0, nullable=False)
+    results = db.Column(JSON, default=list, nullable=False)
+    message = db.Column(db.String(255), nullable=True)
+    creation_date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    modification_date = db.Column(
+        db.DateTime, onupdate=datetime.datetime.utcnow
+    )
+
+    def __str__(self) -> str:
+        return f'<ImportJob \'{self.filename}\' - {self.status}>'
+
+    def __init__(
+        self, user_id: int, filename: str, workout_data: Dict
+    ) -> None:
+        self.user_id = user_id
+        self.filename = filename
+        self.workout_data = workout_data
+        self.status = 'queued'
+        self.files_count = 0
+        self.processed_files = 0
+        self.results = []
+
+    @property
+    def short_id(self) -> str:
+        return encode_uuid(self.uuid)
+
+    def add_result(self, result: Dict) -> None:
+        # a new list is assigned, since JSON column changes are not tracked
+        self.results = self.results + [result]
+        self.processed_files += 1
+
+    def serialize(self) -> Dict:
+        return {
+            'id': self.short_id,
+            'status': self.status,
+            'filename': self.filename,
+            'files_count': self.files_count,
+            'processed_files': self.processed_files,
+            'results': self.results,
+            'message': self.message,
+            'creation_date': self.creation_date,
+            'modification_date': self.modification_date,
+        }
@@ -11,7 +11,7 @@ from fittrackee.responses import (
     handle_error_and_return_response,
 )
 from fittrackee.users.decorators import authenticate, authenticate_as_admin
-from fittrackee.users.models import User
+from fittrackee.users.utils import is_admin
 
 from .models import Sport
 
@@ -152,11 +152,13 @@ def get_sports(auth_user_id: int) -> Dict:
         - Invalid token. Please log in again.
 
     """
-    user = User.query.filter_by(id=int(auth_user_id)).first()
+    user_is_admin = is_admin(auth_user_id)
     sports = Sport.query.order_by(Sport.id).all()
     return {
         'status': 'success',
-        'data': {'sports': [sport.serialize(user.admin) for sport in sports]},
+        'data': {
+            'sports': [sport.serialize(user_is_admin) for sport in sports]
+        },
     }
 
 
@@ -245,12 +247,11 @@ def get_sport(auth_user_id: int, sport_id: int) -> Union[Dict, HttpResponse]:
     :statuscode 404: sport not found
 
     """
-    user = User.query.filter_by(id=int(auth_user_id)).first()
     sport = Sport.query.filter_by(id=sport_id).first()
     if sport:
         return {
             'status': 'success',
-            'data': {'sports': [sport.serialize(user.admin)]},
+            'data': {'sports': [sport.serialize(is_admin(auth_user_id))]},
         }
     return DataNotFoundErrorResponse('sports')
 
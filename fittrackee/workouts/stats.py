@@ -1,10 +1,13 @@
-from datetime import datetime, timedelta
-from typing import Dict, Union
+import threading
+from datetime import date, timedelta
+from time import monotonic
+from typing import Any, Dict, Optional, Tuple, Union
 
-from flask import Blueprint, request
-from sqlalchemy import func
+from flask import Blueprint, current_app, request
+from sqlalchemy import cast, func
 
 from fittrackee import db
+from fittrackee.database_pool import get_database_pool_stats
 from fittrackee.responses import (
     HttpResponse,
     InvalidPayloadErrorResponse,
@@ -15,12 +18,124 @@ from fittrackee.responses import (
 from fittrackee.users.decorators import authenticate, authenticate_as_admin
 from fittrackee.users.models import User
 
-from .models import Sport, Workout
-from .utils import get_datetime_from_request_args, get_upload_dir_size
-from .utils_format import convert_timedelta_to_integer
+from .models import Sport, Workout, WorkoutDailyStats
+from .utils import get_dates_from_request_args
+from .utils_map import get_static_map_tile_cache_stats
 
 stats_blueprint = Blueprint('stats', __name__)
 
+time_periods = ['week', 'weekm', 'month', 'year']
+
+# application statistics with expiration time, cached by each process
+_application_stats: Optional[Tuple[float, Dict]] = None
+_application_stats_lock = threading.Lock()
+
+
+def get_application_stats_data() -> Dict:
+    """
+    Return application statistics, cached by each process for
+    'APP_STATS_CACHE_TTL' seconds
+    """
+    global _application_stats
+    ttl = current_app.config['APP_STATS_CACHE_TTL']
+    with _application_stats_lock:
+        if (
+            ttl > 0
+            and _application_stats is not None
+            and _application_stats[0] > monotonic()
+        ):
+            return _application_stats[1]
+
+    nb_workouts = Workout.query.filter().count()
+    nb_users = User.query.filter().count()
+    nb_sports = (
+        db.session.query(func.count(Workout.sport_id))
+        .group_by(Workout.sport_id)
+        .count()
+    )
+    # uploads size is updated on files save and delete
+    uploads_dir_size = db.session.query(
+        func.coalesce(func.sum(User.uploads_size), 0)
+    ).scalar()
+    application_stats = {
+        'workouts': nb_workouts,
+        'sports': nb_sports,
+        'users': nb_users,
+        'uploads_dir_size': int(uploads_dir_size),
+        'static_map_tiles_cache': get_static_map_tile_cache_stats(),
+    }
+    if ttl > 0:
+        with _application_stats_lock:
+            _application_stats = (monotonic() + ttl, application_stats)
+    return application_stats
+
+
+def get_time_period(time: Optional[str]) -> Any:
+    """
+    Return SQL expression of daily statistics time period (period start
+    formatted as string)
+    """
+    local_date = cast(WorkoutDailyStats.local_date, db.DateTime)
+    if time == 'week':  # week start Sunday
+        # 'date_trunc' returns weeks starting Monday
+        week_start = func.date_trunc(
+            'week', local_date + timedelta(days=1), type_=db.DateTime
+        ) - timedelta(days=1)
+        return func.to_char(week_start, 'YYYY-MM-DD')
+    if time == 'weekm':  # week start Monday
+        return func.to_char(func.date_trunc('week', local_date), 'YYYY-MM-DD')
+    if time == 'month':
+        return func.to_char(local_date, 'YYYY-MM')
+    return func.to_char(local_date, 'YYYY')
+
+
+def get_workouts_stats(
+    user: User,
+    filter_type: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sport_id: Optional[Union[int, str]] = None,
+    time: Optional[str] = None,
+) -> Dict:
+    """
+    Return user workouts statistics by sport or by time, aggregated from
+    daily statistics (dates in user timezone)
+    """
+    group_by_columns = [WorkoutDailyStats.sport_id]
+    if filter_type == 'by_time':
+        group_by_columns.insert(0, get_time_period(time))
+    rows = (
+        db.session.query(
+            *group_by_columns,
+            func.sum(WorkoutDailyStats.nb_workouts),
+            func.sum(WorkoutDailyStats.total_distance),
+            func.sum(WorkoutDailyStats.total_duration),
+        )
+        .filter(
+            WorkoutDailyStats.user_id == user.id,
+            WorkoutDailyStats.local_date >= date_from if date_from else True,
+            WorkoutDailyStats.local_date <= date_to if date_to else True,
+            WorkoutDailyStats.sport_id == sport_id if sport_id else True,
+        )
+        .group_by(*group_by_columns)
+        .all()
+    )
+
+    statistics: Dict = {}
+    for row in rows:
+        sport_statistics = (
+            statistics.setdefault(row[0], {})
+            if filter_type == 'by_time'
+            else statistics
+        )
+        nb_workouts, total_distance, total_duration = row[-3:]
+        sport_statistics[row.sport_id] = {
+            'nb_workouts': int(nb_workouts),
+            'total_distance': float(total_distance),
+            'total_duration': int(total_duration),
+        }
+    return statistics
+
 
 def get_workouts(
     user_name: str, filter_type: str
@@ -34,7 +149,7 @@ def get_workouts(
             return UserNotFoundErrorResponse()
 
         params = request.args.copy()
-        date_from, date_to = get_datetime_from_request_args(params, user)
+        date_from, date_to = get_dates_from_request_args(params)
         sport_id = params.get('sport_id')
         time = params.get('time')
 
@@ -43,90 +158,15 @@ def get_workouts(
                 sport = Sport.query.filter_by(id=sport_id).first()
                 if not sport:
                     return NotFoundErrorResponse('Sport does not exist.')
-
-        workouts = (
-            Workout.query.filter(
-                Workout.user_id == user.id,
-                Workout.workout_date >= date_from if date_from else True,
-                Workout.workout_date < date_to + timedelta(seconds=1)
-                if date_to
-                else True,
-                Workout.sport_id == sport_id if sport_id else True,
-            )
-            .order_by(Workout.workout_date.asc())
-            .all()
-        )
-
-        workouts_list_by_sport = {}
-        workouts_list_by_time = {}  # type: ignore
-        for workout in workouts:
-            if filter_type == 'by_sport':
-                sport_id = workout.sport_id
-                if sport_id not in workouts_list_by_sport:
-                    workouts_list_by_sport[sport_id] = {
-                        'nb_workouts': 0,
-                        'total_distance': 0.0,
-                        'total_duration': 0,
-                    }
-                workouts_list_by_sport[sport_id]['nb_workouts'] += 1
-                workouts_list_by_sport[sport_id]['total_distance'] += float(
-                    workout.distance
-                )
-                workouts_list_by_sport[sport_id][
-                    'total_duration'
-                ] += convert_timedelta_to_integer(workout.moving)
-
-            # filter_type == 'by_time'
-            else:
-                if time == 'week':
-                    workout_date = workout.workout_date - timedelta(
-                        days=(
-                            workout.workout_date.isoweekday()
-                            if workout.workout_date.isoweekday() < 7
-                            else 0
-                        )
-                    )
-                    time_period = datetime.strftime(workout_date, "%Y-%m-%d")
-                elif time == 'weekm':  # week start Monday
-                    workout_date = workout.workout_date - timedelta(
-                        days=workout.workout_date.weekday()
-                    )
-                    time_period = datetime.strftime(workout_date, "%Y-%m-%d")
-                elif time == 'month':
-                    time_period = datetime.strftime(
-                        workout.workout_date, "%Y-%m"
-                    )
-                elif time == 'year' or not time:
-                    time_period = datetime.strftime(workout.workout_date, "%Y")
-                else:
-                    return InvalidPayloadErrorResponse(
-                        'Invalid time period.', 'fail'
-                    )
-                sport_id = workout.sport_id
-                if time_period not in workouts_list_by_time:
-                    workouts_list_by_time[time_period] = {}
-                if sport_id not in workouts_list_by_time[time_period]:
-                    workouts_list_by_time[time_period][sport_id] = {
-                        'nb_workouts': 0,
-                        'total_distance': 0.0,
-                        'total_duration': 0,
-                    }
-                workouts_list_by_time[time_period][sport_id][
-                    'nb_workouts'
-                ] += 1
-                workouts_list_by_time[time_period][sport_id][
-                    'total_distance'
-                ] += float(workout.distance)
-                workouts_list_by_time[time_period][sport_id][
-                    'total_duration'
-                ] += convert_timedelta_to_integer(workout.moving)
+        elif time and time not in time_periods:
+            return InvalidPayloadErrorResponse('Invalid time period.', 'fail')
 
         return {
             'status': 'success',
             'data': {
-                'statistics': workouts_list_by_sport
-                if filter_type == 'by_sport'
-                else workouts_list_by_time
+                'statistics': get_workouts_stats(
+                    user, filter_type, date_from, date_to, sport_id, time
+                )
             },
         }
     except Exception as e:
@@ -324,7 +364,9 @@ def get_workouts_by_sport(
 @authenticate_as_admin
 def get_application_stats(auth_user_id: int) -> Dict:
     """
-    Get all application statistics
+    Get all application statistics (cached for a few seconds, see
+    ``APP_STATS_CACHE_TTL``) and database connections pool metrics (not
+    cached, for the application process handling the request)
 
     **Example requests**:
 
@@ -342,7 +384,26 @@ def get_application_stats(auth_user_id: int) -> Dict:
 
       {
         "data": {
+          "database_pool": {
+            "checked_out": 1,
+            "checkout_time_avg": 0.042,
+            "checkout_time_max": 12.514,
+            "checkouts": 1250,
+            "max_overflow": 10,
+            "overflow": 0,
+            "saturation": 0.07,
+            "size": 5,
+            "timeouts": 0
+          },
           "sports": 3,
+          "static_map_tiles_cache": {
+            "evictions": 0,
+            "hit_ratio": 0.75,
+            "hits": 24,
+            "max_size": 104857600,
+            "misses": 8,
+            "size": 134217
+          },
           "uploads_dir_size": 1000,
           "users": 2,
           "workouts": 3,
@@ -362,19 +423,10 @@ def get_application_stats(auth_user_id: int) -> Dict:
     :statuscode 403: You do not have permissions.
     """
 
-    nb_workouts = Workout.query.filter().count()
-    nb_users = User.query.filter().count()
-    nb_sports = (
-        db.session.query(func.count(Workout.sport_id))
-        .group_by(Workout.sport_id)
-        .count()
-    )
     return {
         'status': 'success',
         'data': {
-            'workouts': nb_workouts,
-            'sports': nb_sports,
-            'users': nb_users,
-            'uploads_dir_size': get_upload_dir_size(),
+            **get_application_stats_data(),
+            'database_pool': get_database_pool_stats(db.engine),
         },
     }
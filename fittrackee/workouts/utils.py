@@ -1,30 +1,67 @@
+import base64
 import hashlib
 import os
+import shutil
 import tempfile
 import zipfile
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import repeat
+from multiprocessing import get_context
+from typing import IO, Dict, List, Optional, Tuple, Union, cast
 from uuid import UUID
 
 import gpxpy.gpx
 import pytz
-from flask import current_app
-from sqlalchemy import exc
-from staticmap import Line, StaticMap
+from flask import Flask, current_app
+from flask_sqlalchemy import BaseQuery
+from sqlalchemy import and_, exc, or_
+from staticmap import Line
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
-from fittrackee import db
+from fittrackee import appLog, db
 from fittrackee.users.models import User
+from fittrackee.users.utils import get_auth_user_attributes
 
 from .exceptions import WorkoutException
-from .models import Sport, Workout, WorkoutSegment
-from .utils_files import get_absolute_file_path
-from .utils_gpx import get_gpx_info
+from .models import (
+    ImportJob,
+    Sport,
+    Workout,
+    WorkoutSegment,
+    deferred_records_update,
+    get_workout_files_size,
+    update_user_uploads_size,
+)
+from .utils_chart_data import get_chart_data_file_path, remove_chart_data_file
+from .utils_files import TeeReader, get_absolute_file_path, get_files_size
+from .utils_format import convert_in_duration
+from .utils_gpx import (
+    generate_chart_data,
+    get_first_and_last_points,
+    get_gpx_info,
+    get_map_data,
+)
+from .utils_map import CachedStaticMap, get_static_map_tile_cache
+from .utils_weather import get_weather_service
+
+# configuration needed to process gpx files in import processes
+IMPORT_PROCESS_CONFIG = [
+    'GPX_STATS_BACKEND',
+    'STATIC_MAP_TILES_CACHE_SIZE',
+    'UPLOAD_FOLDER',
+    'WEATHER_API_KEY',
+    'WEATHER_PROVIDER',
+    'WEATHER_TIMEOUT',
+    'WORKOUTS_DEFERRED_ENRICHMENT',
+]
 
 
 def get_datetime_with_tz(
-    timezone: str, workout_date: datetime, gpx_data: Optional[Dict] = None
+    timezone: Optional[str],
+    workout_date: datetime,
+    gpx_data: Optional[Dict] = None,
 ) -> Tuple[Optional[datetime], datetime]:
     """
     Return naive datetime and datetime with user timezone
@@ -51,7 +88,7 @@ def get_datetime_with_tz(
 
 
 def get_datetime_from_request_args(
-    params: Dict, user: User
+    params: Dict, user_timezone: Optional[str]
 ) -> Tuple[Optional[datetime], Optional[datetime]]:
     date_from = None
     date_to = None
@@ -59,16 +96,154 @@ def get_datetime_from_request_args(
     date_from_str = params.get('from')
     if date_from_str:
         date_from = datetime.strptime(date_from_str, '%Y-%m-%d')
-        _, date_from = get_datetime_with_tz(user.timezone, date_from)
+        _, date_from = get_datetime_with_tz(user_timezone, date_from)
     date_to_str = params.get('to')
     if date_to_str:
         date_to = datetime.strptime(
             f'{date_to_str} 23:59:59', '%Y-%m-%d %H:%M:%S'
         )
-        _, date_to = get_datetime_with_tz(user.timezone, date_to)
+        _, date_to = get_datetime_with_tz(user_timezone, date_to)
     return date_from, date_to
 
 
+def get_dates_from_request_args(
+    params: Dict,
+) -> Tuple[Optional[date], Optional[date]]:
+    """
+    Return dates from request args, without time zone conversion
+    """
+    date_from_str = params.get('from')
+    date_to_str = params.get('to')
+    return (
+        datetime.strptime(date_from_str, '%Y-%m-%d').date()
+        if date_from_str
+        else None,
+        datetime.strptime(date_to_str, '%Y-%m-%d').date()
+        if date_to_str
+        else None,
+    )
+
+
+def get_workouts_filters(
+    params: Dict, user_id: int, user_timezone: Optional[str]
+) -> List:
+    """
+    Return filters on user workouts from request args
+    """
+    date_from, date_to = get_datetime_from_request_args(params, user_timezone)
+    distance_from = params.get('distance_from')
+    distance_to = params.get('distance_to')
+    duration_from = params.get('duration_from')
+    duration_to = params.get('duration_to')
+    ave_speed_from = params.get('ave_speed_from')
+    ave_speed_to = params.get('ave_speed_to')
+    max_speed_from = params.get('max_speed_from')
+    max_speed_to = params.get('max_speed_to')
+    sport_id = params.get('sport_id')
+    return [
+        Workout.user_id == user_id,
+        Workout.sport_id == sport_id if sport_id else True,
+        Workout.workout_date >= date_from if date_from else True,
+        Workout.workout_date < date_to + timedelta(seconds=1)
+        if date_to
+        else True,
+        Workout.distance >= int(distance_from) if distance_from else True,
+        Workout.distance <= int(distance_to) if distance_to else True,
+        Workout.moving >= convert_in_duration(duration_from)
+        if duration_from
+        else True,
+        Workout.moving <= convert_in_duration(duration_to)
+        if duration_to
+        else True,
+        Workout.ave_speed >= float(ave_speed_from) if ave_speed_from else True,
+        Workout.ave_speed <= float(ave_speed_to) if ave_speed_to else True,
+        Workout.max_speed >= float(max_speed_from) if max_speed_from else True,
+        Workout.max_speed <= float(max_speed_to) if max_speed_to else True,
+    ]
+
+
+def encode_cursor(workout: Workout, direction: str) -> str:
+    """
+    Return opaque cursor from workout date and id, and direction ('next' or
+    'prev')
+    """
+    return base64.urlsafe_b64encode(
+        f'{direction}|{workout.workout_date.isoformat()}|{workout.id}'.encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime, int]:
+    try:
+        direction, workout_date, workout_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        )
+        if direction not in ['next', 'prev']:
+            raise ValueError(f'invalid direction: {direction}')
+        return direction, datetime.fromisoformat(workout_date), int(workout_id)
+    except ValueError as e:
+        raise WorkoutException('invalid', 'Invalid cursor.', e)
+
+
+def get_workouts_page_from_cursor(
+    query: BaseQuery, cursor: str, per_page: int, order: Optional[str]
+) -> Tuple[List[Workout], Dict]:
+    """
+    Return workouts following or preceding cursor (keyset pagination on
+    workout date and id), and pagination with cursors of adjacent pages.
+    An empty cursor returns first page.
+    Like with page pagination, workouts with same date are returned in
+    creation order, whatever the sorting order.
+    """
+    direction = 'next'
+    if cursor:
+        direction, workout_date, workout_id = decode_cursor(cursor)
+    # previous page is fetched in reverse order
+    is_date_ascending = (order == 'asc') == (direction == 'next')
+    is_id_ascending = direction == 'next'
+    if cursor:
+        query = query.filter(
+            or_(
+                Workout.workout_date > workout_date
+                if is_date_ascending
+                else Workout.workout_date < workout_date,
+                and_(
+                    Workout.workout_date == workout_date,
+                    Workout.id > workout_id
+                    if is_id_ascending
+                    else Workout.id < workout_id,
+                ),
+            )
+        )
+    query = query.order_by(
+        Workout.workout_date.asc()
+        if is_date_ascending
+        else Workout.workout_date.desc(),
+        Workout.id.asc() if is_id_ascending else Workout.id.desc(),
+    )
+    workouts = query.limit(per_page + 1).all()
+    has_more = len(workouts) > per_page
+    workouts = workouts[:per_page]
+    if direction == 'prev':
+        workouts.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, bool(cursor)
+    return workouts, {
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'next_cursor': (
+            encode_cursor(workouts[-1], 'next')
+            if has_next and workouts
+            else None
+        ),
+        'prev_cursor': (
+            encode_cursor(workouts[0], 'prev')
+            if has_prev and workouts
+            else None
+        ),
+    }
+
+
 def update_workout_data(
     workout: Union[Workout, WorkoutSegment], gpx_data: Dict
 ) -> Union[Workout, WorkoutSegment]:
@@ -167,9 +342,15 @@ def update_workout(workout: Workout) -> Workout:
     """
     Update workout data from gpx file
     """
-    gpx_data, _, _ = get_gpx_info(
-        get_absolute_file_path(workout.gpx), False, False
+    absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
+    gpx_data, _, _ = get_gpx_info(absolute_gpx_filepath, False, False)
+    # chart data will be calculated again on next request
+    update_user_uploads_size(
+        db.session.connection(),
+        workout.user_id,
+        -get_files_size([get_chart_data_file_path(absolute_gpx_filepath)]),
     )
+    remove_chart_data_file(absolute_gpx_filepath)
     updated_workout = update_workout_data(workout, gpx_data)
     updated_workout.duration = gpx_data['duration']
     updated_workout.distance = gpx_data['distance']
@@ -195,7 +376,6 @@ def edit_workout(
     In a next version, map_data and weather_data will be updated
     (case of a modified gpx file, see issue #7)
     """
-    user = User.query.filter_by(id=auth_user_id).first()
     if workout_data.get('refresh'):
         workout = update_workout(workout)
     if workout_data.get('sport_id'):
@@ -210,7 +390,7 @@ def edit_workout(
                 workout_data['workout_date'], '%Y-%m-%d %H:%M'
             )
             _, workout.workout_date = get_datetime_with_tz(
-                user.timezone, workout_date
+                get_auth_user_attributes(auth_user_id).timezone, workout_date
             )
 
         if workout_data.get('duration'):
@@ -241,7 +421,7 @@ def get_file_path(dir_path: str, filename: str) -> str:
 
 def get_new_file_path(
     auth_user_id: int,
-    workout_date: str,
+    workout_date: Union[str, datetime],
     sport: str,
     old_filename: Optional[str] = None,
     extension: Optional[str] = None,
@@ -263,13 +443,17 @@ def get_new_file_path(
 
 def generate_map(map_filepath: str, map_data: List) -> None:
     """
-    Generate and save map image from map data
+    Generate and save map image from map data (tiles being stored in tile
+    cache if enabled)
     """
-    m = StaticMap(400, 225, 10)
+    tile_cache = get_static_map_tile_cache()
+    m = CachedStaticMap(400, 225, 10, tile_cache=tile_cache)
     line = Line(map_data, '#3388FF', 4)
     m.add_line(line)
     image = m.render()
     image.save(map_filepath)
+    if tile_cache:
+        appLog.debug(f'static map tiles cache: {tile_cache.get_stats()}')
 
 
 def get_map_hash(map_filepath: str) -> str:
@@ -285,83 +469,343 @@ def get_map_hash(map_filepath: str) -> str:
     return md5.hexdigest()
 
 
-def process_one_gpx_file(params: Dict, filename: str) -> Workout:
+def create_workout_map(
+    auth_user_id: int,
+    workout_date: datetime,
+    sport_label: str,
+    map_data: List,
+) -> Tuple[str, str]:
     """
-    Get all data from a gpx file to create an workout with map image
+    Generate map image in user directory and return map file path and id
+    """
+    map_filepath = get_new_file_path(
+        auth_user_id=auth_user_id,
+        workout_date=workout_date,
+        extension='.png',
+        sport=sport_label,
+    )
+    generate_map(get_absolute_file_path(map_filepath), map_data)
+    return map_filepath, get_map_hash(map_filepath)
+
+
+def get_gpx_info_from_zip_archive(
+    zip_file_path: str,
+    member: str,
+    output_path: str,
+    with_enrichment: bool = True,
+) -> Tuple:
+    """
+    Parse a gpx file from zip archive, member being decompressed once:
+    data are written in output file while parsing
+    """
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref, zip_ref.open(
+        member
+    ) as gpx_file, open(output_path, 'wb') as output_file:
+        tee_reader = TeeReader(gpx_file, output_file)
+        gpx_info = get_gpx_info(
+            cast(IO[bytes], tee_reader), with_enrichment, with_enrichment
+        )
+        tee_reader.read_all()
+    return gpx_info
+
+
+def get_workout_files_data(
+    file_path: str,
+    filename: str,
+    auth_user_id: int,
+    sport_label: str,
+    from_zip_archive: bool = False,
+) -> Dict:
+    """
+    Get data from a gpx file, move file to user directory and generate chart
+    data and map image (no database access, so it can be called in another
+    process).
+    If 'from_zip_archive' is True, 'file_path' is zip archive path and
+    'filename' the gpx file in archive: gpx file is written directly in user
+    directory.
+    If 'WORKOUTS_DEFERRED_ENRICHMENT' is True, map image and weather data
+    are added later by a dramatiq worker.
     """
+    with_enrichment = not current_app.config['WORKOUTS_DEFERRED_ENRICHMENT']
+    gpx_filepath = file_path
+    map_filepath = None
+    map_id = None
     try:
-        gpx_data, map_data, weather_data = get_gpx_info(params['file_path'])
-        auth_user_id = params['user'].id
+        if from_zip_archive:
+            user_dir = get_absolute_file_path(
+                os.path.join('workouts', str(auth_user_id))
+            )
+            os.makedirs(user_dir, exist_ok=True)
+            # temporary file in final directory, renamed once gpx file is
+            # parsed
+            gpx_fd, gpx_filepath = tempfile.mkstemp(
+                prefix='import_', suffix='.gpx', dir=user_dir
+            )
+            os.close(gpx_fd)
+            gpx_data, map_data, weather_data = get_gpx_info_from_zip_archive(
+                file_path, filename, gpx_filepath, with_enrichment
+            )
+        else:
+            gpx_data, map_data, weather_data = get_gpx_info(
+                file_path, with_enrichment, with_enrichment
+            )
         new_filepath = get_new_file_path(
             auth_user_id=auth_user_id,
             workout_date=gpx_data['start'],
             old_filename=filename,
-            sport=params['sport_label'],
+            sport=sport_label,
         )
         absolute_gpx_filepath = get_absolute_file_path(new_filepath)
-        os.rename(params['file_path'], absolute_gpx_filepath)
+        os.rename(gpx_filepath, absolute_gpx_filepath)
         gpx_data['filename'] = new_filepath
+        generate_chart_data(absolute_gpx_filepath)
 
-        map_filepath = get_new_file_path(
-            auth_user_id=auth_user_id,
-            workout_date=gpx_data['start'],
-            extension='.png',
-            sport=params['sport_label'],
-        )
-        absolute_map_filepath = get_absolute_file_path(map_filepath)
-        generate_map(absolute_map_filepath, map_data)
+        if with_enrichment:
+            map_filepath, map_id = create_workout_map(
+                auth_user_id, gpx_data['start'], sport_label, map_data
+            )
     except (gpxpy.gpx.GPXXMLSyntaxException, TypeError) as e:
         raise WorkoutException('error', 'Error during gpx file parsing.', e)
     except Exception as e:
         raise WorkoutException('error', 'Error during gpx processing.', e)
+    finally:
+        if from_zip_archive and os.path.exists(gpx_filepath):
+            os.remove(gpx_filepath)
+
+    return {
+        'gpx_data': gpx_data,
+        'map_filepath': map_filepath,
+        'map_id': map_id,
+        'weather_data': weather_data,
+    }
+
+
+def remove_workout_files(workout_files_data: Dict) -> None:
+    """
+    Remove files generated for a workout that has not been saved
+    """
+    absolute_gpx_filepath = get_absolute_file_path(
+        workout_files_data['gpx_data']['filename']
+    )
+    remove_chart_data_file(absolute_gpx_filepath)
+    file_paths = [absolute_gpx_filepath]
+    if workout_files_data['map_filepath']:
+        file_paths.append(
+            get_absolute_file_path(workout_files_data['map_filepath'])
+        )
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
 
+def add_workout_with_gpx(
+    user: User, workout_data: Dict, workout_files_data: Dict
+) -> Workout:
+    """
+    Add workout and segments to session (changes are not committed)
+    """
+    gpx_data = workout_files_data['gpx_data']
+    new_workout = create_workout(user, workout_data, gpx_data)
+    new_workout.map = workout_files_data['map_filepath']
+    new_workout.map_id = workout_files_data['map_id']
+    if workout_files_data['weather_data']:
+        new_workout.weather_start = workout_files_data['weather_data'][0]
+        new_workout.weather_end = workout_files_data['weather_data'][1]
+    new_workout.enrichment_status = (
+        'pending' if is_enrichment_needed(new_workout) else 'completed'
+    )
+    db.session.add(new_workout)
+    db.session.flush()
+    update_user_uploads_size(
+        db.session.connection(),
+        user.id,
+        get_workout_files_size(new_workout.gpx, new_workout.map),
+    )
+
+    for segment_data in gpx_data['segments']:
+        new_segment = create_segment(
+            new_workout.id, new_workout.uuid, segment_data
+        )
+        db.session.add(new_segment)
+    return new_workout
+
+
+def process_one_gpx_file(
+    params: Dict, filename: str, from_zip_archive: bool = False
+) -> Workout:
+    """
+    Get all data from a gpx file to create an workout with map image
+    """
+    workout_files_data = get_workout_files_data(
+        params['file_path'],
+        filename,
+        params['user'].id,
+        params['sport_label'],
+        from_zip_archive,
+    )
     try:
-        new_workout = create_workout(
-            params['user'], params['workout_data'], gpx_data
+        new_workout = add_workout_with_gpx(
+            params['user'], params['workout_data'], workout_files_data
         )
-        new_workout.map = map_filepath
-        new_workout.map_id = get_map_hash(map_filepath)
-        new_workout.weather_start = weather_data[0]
-        new_workout.weather_end = weather_data[1]
-        db.session.add(new_workout)
-        db.session.flush()
+        db.session.commit()
+        return new_workout
+    except (exc.IntegrityError, ValueError) as e:
+        raise WorkoutException('fail', 'Error during workout save.', e)
 
-        for segment_data in gpx_data['segments']:
-            new_segment = create_segment(
-                new_workout.id, new_workout.uuid, segment_data
+
+def init_import_process(config: Dict) -> None:
+    """
+    Push an application context in import process, with configuration
+    needed to process gpx files
+    """
+    app = Flask('fittrackee')
+    app.config.update(config)
+    app.app_context().push()
+
+
+def get_workout_files_data_in_process(
+    zip_file_path: str, filename: str, auth_user_id: int, sport_label: str
+) -> Tuple[Optional[Dict], Optional[Tuple[str, str]]]:
+    """
+    Return workout files data for a gpx file from zip archive or error
+    status and message (exceptions raised in import process are not
+    returned, since they can not always be pickled)
+    """
+    try:
+        return (
+            get_workout_files_data(
+                zip_file_path,
+                filename,
+                auth_user_id,
+                sport_label,
+                from_zip_archive=True,
+            ),
+            None,
+        )
+    except WorkoutException as e:
+        if e.e:
+            appLog.error(e.e)
+        return None, (e.status, e.message)
+
+
+def get_workouts_files_data_in_pool(
+    zip_file_path: str,
+    gpx_files: List[str],
+    auth_user_id: int,
+    sport_label: str,
+    processes: int,
+) -> List[Tuple[Optional[Dict], Optional[Tuple[str, str]]]]:
+    """
+    Return workout files data or error for each gpx file from zip archive,
+    files being processed in a pool of processes
+    """
+    config = {key: current_app.config[key] for key in IMPORT_PROCESS_CONFIG}
+    with ProcessPoolExecutor(
+        max_workers=min(processes, len(gpx_files)),
+        # 'spawn' avoids copying database connections and threads state
+        mp_context=get_context('spawn'),
+        initializer=init_import_process,
+        initargs=(config,),
+    ) as executor:
+        return list(
+            executor.map(
+                get_workout_files_data_in_process,
+                repeat(zip_file_path),
+                gpx_files,
+                repeat(auth_user_id),
+                repeat(sport_label),
+            )
+        )
+
+
+def process_gpx_files_in_pool(
+    common_params: Dict, gpx_files: List[str], processes: int
+) -> List[Workout]:
+    """
+    Process gpx files from zip archive in a pool of processes (gpx parsing
+    and map rendering) and create all workouts in a single transaction
+    """
+    results = get_workouts_files_data_in_pool(
+        common_params['file_path'],
+        gpx_files,
+        common_params['user'].id,
+        common_params['sport_label'],
+        processes,
+    )
+    workouts_files_data = [data for data, _ in results if data is not None]
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        for workout_files_data in workouts_files_data:
+            remove_workout_files(workout_files_data)
+        raise WorkoutException(*errors[0])
+
+    try:
+        new_workouts = [
+            add_workout_with_gpx(
+                common_params['user'],
+                common_params['workout_data'],
+                workout_files_data,
             )
-            db.session.add(new_segment)
+            for workout_files_data in workouts_files_data
+        ]
         db.session.commit()
-        return new_workout
     except (exc.IntegrityError, ValueError) as e:
+        db.session.rollback()
+        for workout_files_data in workouts_files_data:
+            remove_workout_files(workout_files_data)
         raise WorkoutException('fail', 'Error during workout save.', e)
+    return new_workouts
+
+
+def get_gpx_files_from_zip_archive(zip_file_path: str) -> List[str]:
+    """
+    Return names of files with allowed extension from zip archive, without
+    extracting archive (number of files can not exceed defined limit).
+    Files in folders are ignored.
+    """
+    gpx_files: List[str] = []
+    gpx_files_limit = current_app.config['gpx_limit_import']
+
+    with zipfile.ZipFile(zip_file_path, "r") as zip_ref:
+        for zip_info in zip_ref.infolist():
+            gpx_file = zip_info.filename
+            if zip_info.is_dir() or '/' in gpx_file:
+                continue
+            if (
+                '.' in gpx_file
+                and gpx_file.rsplit('.', 1)[1].lower()
+                in current_app.config['WORKOUT_ALLOWED_EXTENSIONS']
+            ):
+                if len(gpx_files) >= gpx_files_limit:
+                    break
+                gpx_files.append(gpx_file)
+
+    return gpx_files
 
 
-def process_zip_archive(common_params: Dict, extract_dir: str) -> List:
+def process_zip_archive(common_params: Dict) -> List:
     """
     Get files from a zip archive and create workouts, if number of files
     does not exceed defined limit.
+    Gpx files are read directly from archive, only valid files being
+    stored.
+    Files are processed in a pool of processes if
+    'WORKOUTS_IMPORT_PROCESSES' is greater than 1.
+    Records are updated once all workouts are created.
     """
-    with zipfile.ZipFile(common_params['file_path'], "r") as zip_ref:
-        zip_ref.extractall(extract_dir)
-
-    new_workouts = []
-    gpx_files_limit = current_app.config['gpx_limit_import']
-    gpx_files_ok = 0
+    gpx_files = get_gpx_files_from_zip_archive(common_params['file_path'])
+    processes = current_app.config['WORKOUTS_IMPORT_PROCESSES']
+    with deferred_records_update():
+        if processes > 1 and len(gpx_files) > 1:
+            return process_gpx_files_in_pool(
+                common_params, gpx_files, processes
+            )
 
-    for gpx_file in os.listdir(extract_dir):
-        if (
-            '.' in gpx_file
-            and gpx_file.rsplit('.', 1)[1].lower()
-            in current_app.config['WORKOUT_ALLOWED_EXTENSIONS']
-        ):
-            gpx_files_ok += 1
-            if gpx_files_ok > gpx_files_limit:
-                break
-            file_path = os.path.join(extract_dir, gpx_file)
-            params = common_params
-            params['file_path'] = file_path
-            new_workout = process_one_gpx_file(params, gpx_file)
+        new_workouts = []
+        for gpx_file in gpx_files:
+            new_workout = process_one_gpx_file(
+                common_params, gpx_file, from_zip_archive=True
+            )
             new_workouts.append(new_workout)
 
     return new_workouts
@@ -404,17 +848,191 @@ def process_files(
     if extension == ".gpx":
         return [process_one_gpx_file(common_params, filename)]
     else:
-        return process_zip_archive(common_params, folders['extract_dir'])
+        return process_zip_archive(common_params)
+
+
+def create_import_job(
+    auth_user_id: int, workout_data: Dict, workout_file: FileStorage
+) -> ImportJob:
+    """
+    Store gpx file or zip archive in a dedicated directory and create an
+    import job, workouts being created later by a dramatiq worker
+    """
+    if workout_file.filename is None:
+        raise WorkoutException('error', 'File has no filename.')
+    filename = secure_filename(workout_file.filename)
+    sport = Sport.query.filter_by(id=workout_data.get('sport_id')).first()
+    if not sport:
+        raise WorkoutException(
+            'error',
+            f"Sport id: {workout_data.get('sport_id')} does not exist",
+        )
+
+    import_job = ImportJob(
+        user_id=auth_user_id, filename=filename, workout_data=workout_data
+    )
+    db.session.add(import_job)
+    db.session.flush()
+    import_job.file_path = os.path.join(
+        'workouts', str(auth_user_id), 'imports', import_job.short_id, filename
+    )
+    try:
+        workout_file.save(
+            get_file_path(
+                os.path.dirname(get_absolute_file_path(import_job.file_path)),
+                filename,
+            )
+        )
+    except Exception as e:
+        raise WorkoutException('error', 'Error during workout file save.', e)
+    db.session.commit()
+    return import_job
+
+
+def process_import_job(import_job_id: int) -> List[int]:
+    """
+    Create workouts from import job file (gpx file or zip archive).
+    Each file is processed separately: workouts are created for valid files
+    and error is stored for invalid ones.
+    Records are updated once all files are processed.
+    Return ids of created workouts waiting for enrichment.
+    """
+    import_job = ImportJob.query.filter_by(id=import_job_id).first()
+    if not import_job or import_job.status != 'queued':
+        return []
+    import_job.status = 'in_progress'
+    db.session.commit()
 
+    absolute_file_path = get_absolute_file_path(import_job.file_path)
+    import_dir = os.path.dirname(absolute_file_path)
+    new_workouts: List[Workout] = []
+    try:
+        # user or sport may have been deleted since job creation
+        user = User.query.filter_by(id=import_job.user_id).first()
+        if not user:
+            raise WorkoutException('error', 'User does not exist.')
+        sport_id = import_job.workout_data.get('sport_id')
+        sport = Sport.query.filter_by(id=sport_id).first()
+        if not sport:
+            raise WorkoutException(
+                'error', f'Sport id: {sport_id} does not exist'
+            )
+        common_params = {
+            'user': user,
+            'workout_data': import_job.workout_data,
+            'file_path': absolute_file_path,
+            'sport_label': sport.label,
+        }
+        from_zip_archive = not import_job.filename.lower().endswith('.gpx')
+        gpx_files = (
+            get_gpx_files_from_zip_archive(absolute_file_path)
+            if from_zip_archive
+            else [import_job.filename]
+        )
+        import_job.files_count = len(gpx_files)
+        db.session.commit()
+
+        with deferred_records_update():
+            for filename in gpx_files:
+                try:
+                    new_workout = process_one_gpx_file(
+                        common_params, filename, from_zip_archive
+                    )
+                    new_workouts.append(new_workout)
+                    result = {
+                        'filename': filename,
+                        'status': 'created',
+                        'workout_id': new_workout.short_id,
+                    }
+                except WorkoutException as e:
+                    db.session.rollback()
+                    if e.e:
+                        appLog.error(e.e)
+                    result = {
+                        'filename': filename,
+                        'status': 'error',
+                        'message': e.message,
+                    }
+                import_job.add_result(result)
+                db.session.commit()
+    except WorkoutException as e:
+        db.session.rollback()
+        import_job.message = e.message
+    except Exception as e:
+        db.session.rollback()
+        appLog.error(e)
+        import_job.message = 'Error during workout file processing.'
+    finally:
+        shutil.rmtree(import_dir, ignore_errors=True)
 
-def get_upload_dir_size() -> int:
+    import_job.status = (
+        'completed'
+        if any(result['status'] == 'created' for result in import_job.results)
+        else 'failed'
+    )
+    if import_job.status == 'failed' and not import_job.message:
+        import_job.message = 'No workout created.'
+    import_job.file_path = None
+    db.session.commit()
+    return [
+        workout.id
+        for workout in new_workouts
+        if workout.enrichment_status == 'pending'
+    ]
+
+
+def is_enrichment_needed(workout: Workout) -> bool:
     """
-    Return upload directory size
+    Return True if map image or weather data (when enabled) are missing for
+    a workout with gpx file
     """
-    upload_path = get_absolute_file_path('')
-    total_size = 0
-    for dir_path, _, filenames in os.walk(upload_path):
-        for f in filenames:
-            fp = os.path.join(dir_path, f)
-            total_size += os.path.getsize(fp)
-    return total_size
+    if not workout.gpx:
+        return False
+    if not workout.map:
+        return True
+    return get_weather_service().is_enabled and (
+        workout.weather_start is None or workout.weather_end is None
+    )
+
+
+def process_workout_enrichment(workout_id: int) -> None:
+    """
+    Add missing map image and weather data to a workout waiting for
+    enrichment (weather data being fetched without latency budget).
+    Only missing data are added, so it can be called again after a failure.
+    """
+    workout = Workout.query.filter_by(id=workout_id).first()
+    if not workout or workout.enrichment_status != 'pending':
+        return
+    try:
+        absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
+        if not workout.map:
+            workout.map, workout.map_id = create_workout_map(
+                workout.user_id,
+                workout.workout_date,
+                workout.sports.label,
+                get_map_data(absolute_gpx_filepath),
+            )
+            update_user_uploads_size(
+                db.session.connection(),
+                workout.user_id,
+                get_workout_files_size(None, workout.map),
+            )
+        weather_service = get_weather_service()
+        if weather_service.is_enabled and (
+            workout.weather_start is None or workout.weather_end is None
+        ):
+            weather_data = weather_service.get_weather_data(
+                get_first_and_last_points(absolute_gpx_filepath),
+                with_latency_budget=False,
+            )
+            if len(weather_data) == 2:
+                workout.weather_start = (
+                    workout.weather_start or weather_data[0]
+                )
+                workout.weather_end = workout.weather_end or weather_data[1]
+        workout.enrichment_status = 'completed'
+    except Exception as e:
+        appLog.error(e)
+        workout.enrichment_status = 'failed'
+    db.session.commit()
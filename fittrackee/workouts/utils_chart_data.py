@@ -0,0 +1,382 @@
+import gzip
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from gpxpy.geo import distance as get_distance
+
+from fittrackee import appLog
+
+from .utils_gpx_stats import get_speed, get_time_difference
+
+CHART_DATA_VERSION = 1
+CHART_DATA_EXTENSION = '.chart_data.json.gz'
+# numbers of points available for downsampled chart data (downsampled
+# points indexes are calculated on first request and stored with chart data)
+DOWNSAMPLING_LEVELS = [100, 250, 500, 1000, 2500, 5000]
+CHART_DATA_KEYS = [
+    'distance',
+    'duration',
+    'elevation',
+    'latitude',
+    'longitude',
+    'speed',
+    'time',
+]
+CHART_DATA_FORMATS = ['records', 'columns', 'binary']
+EPOCH = datetime(1970, 1, 1)
+
+
+def get_chart_data_file_path(gpx_file: str) -> str:
+    """
+    Return path of chart data file, stored next to gpx file
+    """
+    return f'{os.path.splitext(gpx_file)[0]}{CHART_DATA_EXTENSION}'
+
+
+def remove_chart_data_file(gpx_file: str) -> None:
+    """
+    Remove chart data file if exists (chart data will be calculated again
+    on next request)
+    """
+    chart_data_file = get_chart_data_file_path(gpx_file)
+    if os.path.exists(chart_data_file):
+        os.remove(chart_data_file)
+
+
+def get_downsampling_level(points: int, points_nb: int) -> Optional[int]:
+    """
+    Return the smallest downsampling level greater than or equal to requested
+    number of points (None if all points are returned)
+    """
+    for level in DOWNSAMPLING_LEVELS:
+        if level >= points:
+            return level if level < points_nb else None
+    return None
+
+
+def get_lttb_indexes(
+    x: List[float], y_series: List[List[float]], threshold: int
+) -> List[int]:
+    """
+    Return indexes of points selected with Largest-Triangle-Three-Buckets
+    algorithm.
+    For each bucket, the selected point maximizes the sum of triangle areas
+    for all series (values being normalized with series range).
+    """
+    points_nb = len(x)
+    if threshold >= points_nb or threshold < 3:
+        return list(range(points_nb))
+
+    normalized_series = []
+    for y in y_series:
+        y_min = min(y)
+        y_range = max(y) - y_min
+        if y_range > 0:
+            normalized_series.append(
+                [(value - y_min) / y_range for value in y]
+            )
+
+    bucket_size = (points_nb - 2) / (threshold - 2)
+    indexes = [0]
+    previous_idx = 0
+    for bucket_idx in range(threshold - 2):
+        start = int(bucket_idx * bucket_size) + 1
+        end = int((bucket_idx + 1) * bucket_size) + 1
+        next_end = min(int((bucket_idx + 2) * bucket_size) + 1, points_nb)
+
+        # average point of next bucket
+        next_points_nb = next_end - end
+        average_x = sum(x[end:next_end]) / next_points_nb
+        average_ys = [
+            sum(y[end:next_end]) / next_points_nb for y in normalized_series
+        ]
+
+        # triangles are formed with point selected in previous bucket,
+        # which remains the same for all points of current bucket
+        previous_x = x[previous_idx]
+        previous_ys = [y[previous_idx] for y in normalized_series]
+        max_area = -1.0
+        selected_idx = start
+        for idx in range(start, end):
+            area = 0.0
+            for y, previous_y, average_y in zip(
+                normalized_series, previous_ys, average_ys
+            ):
+                area += abs(
+                    (previous_x - average_x) * (y[idx] - previous_y)
+                    - (previous_x - x[idx]) * (average_y - previous_y)
+                )
+            if area > max_area:
+                max_area = area
+                selected_idx = idx
+        indexes.append(selected_idx)
+        previous_idx = selected_idx
+
+    indexes.append(points_nb - 1)
+    return indexes
+
+
+class ChartDataColumns:
+    """
+    Chart data series stored in columns (one list per field), calculated in
+    a single traversal of track points.
+
+    'distance' contains distances from previous points: cumulative distances
+    and durations are calculated when returning chart data, since they
+    depend on selected segment.
+    """
+
+    def __init__(self) -> None:
+        # first and last (excluded) point indexes for each segment
+        self.segments: List[List[int]] = []
+        self.distance: List[float] = []
+        self.elevation: List[float] = []
+        self.latitude: List[float] = []
+        self.longitude: List[float] = []
+        self.speed: List[float] = []
+        self.time: List[Optional[datetime]] = []
+        # downsampled points indexes, by points range and level
+        self.downsampled: Dict[str, List[int]] = {}
+        self.has_new_downsampled_data = False
+        self._previous_point: Any = None
+        self._segment_points: List = []
+
+    def start_segment(self) -> None:
+        self.segments.append([len(self.latitude), len(self.latitude)])
+        self._segment_points = []
+
+    def add_point(self, point: Any) -> None:
+        """
+        Add a point (any object with 'latitude', 'longitude', 'elevation'
+        and 'time' attributes, like gpxpy track points)
+        """
+        previous_point = self._previous_point
+        if previous_point is None:
+            distance = 0.0
+        else:
+            has_elevations = point.elevation and previous_point.elevation
+            distance = get_distance(
+                point.latitude,
+                point.longitude,
+                point.elevation if has_elevations else None,
+                previous_point.latitude,
+                previous_point.longitude,
+                previous_point.elevation if has_elevations else None,
+            )
+        self.distance.append(distance)
+        self.elevation.append(
+            round(point.elevation, 1) if point.elevation is not None else 0
+        )
+        self.latitude.append(point.latitude)
+        self.longitude.append(point.longitude)
+        self.time.append(point.time)
+        self.segments[-1][1] += 1
+
+        # speed is calculated once next point is known
+        if self._segment_points:
+            self._add_speed(next_point=point)
+        self._segment_points = self._segment_points[-1:] + [point]
+        self._previous_point = point
+
+    def end_segment(self) -> None:
+        if self._segment_points:
+            self._add_speed(next_point=None)
+        self._segment_points = []
+
+    def _add_speed(self, next_point: Any) -> None:
+        point = self._segment_points[-1]
+        previous_point = (
+            self._segment_points[0] if len(self._segment_points) > 1 else None
+        )
+        speed = get_speed(point, previous_point, next_point)
+        self.speed.append(
+            round((speed / 1000) * 3600, 2) if speed is not None else 0
+        )
+
+    def get_distances(self, start: int, end: int) -> List[float]:
+        """
+        Return cumulative distances from first point of points range
+        """
+        distances = [0.0]
+        distance = 0.0
+        for point_idx in range(start + 1, end):
+            distance += self.distance[point_idx]
+            distances.append(distance)
+        return distances
+
+    def get_downsampled_indexes(
+        self, start: int, end: int, level: int, distances: List[float]
+    ) -> List[int]:
+        key = f'{start}-{end}-{level}'
+        if key not in self.downsampled:
+            self.downsampled[key] = [
+                start + idx
+                for idx in get_lttb_indexes(
+                    distances,
+                    [self.elevation[start:end], self.speed[start:end]],
+                    level,
+                )
+            ]
+            self.has_new_downsampled_data = True
+        return self.downsampled[key]
+
+    def get_columns(
+        self, segments: List[List[int]], points: Optional[int] = None
+    ) -> Dict[str, List]:
+        """
+        Return chart data for given segments (consecutive segments from
+        'segments' attribute), with one list per field.
+        If a number of points is provided, chart data are downsampled.
+        """
+        if not segments:
+            return {key: [] for key in CHART_DATA_KEYS}
+        start = segments[0][0]
+        end = segments[-1][1]
+        first_time = self.time[start] if segments[0][1] > start else None
+        distances = self.get_distances(start, end)
+
+        level = get_downsampling_level(points, end - start) if points else None
+        points_indexes = (
+            range(start, end)
+            if level is None
+            else self.get_downsampled_indexes(start, end, level, distances)
+        )
+        return {
+            'distance': [
+                round(distances[point_idx - start] / 1000, 2)
+                for point_idx in points_indexes
+            ],
+            'duration': [
+                get_time_difference(self.time[point_idx], first_time)
+                for point_idx in points_indexes
+            ],
+            'elevation': [
+                self.elevation[point_idx] for point_idx in points_indexes
+            ],
+            'latitude': [
+                self.latitude[point_idx] for point_idx in points_indexes
+            ],
+            'longitude': [
+                self.longitude[point_idx] for point_idx in points_indexes
+            ],
+            'speed': [self.speed[point_idx] for point_idx in points_indexes],
+            'time': [self.time[point_idx] for point_idx in points_indexes],
+        }
+
+    def get_chart_data(
+        self, segments: List[List[int]], points: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Return chart data for given segments, with one dict per point
+        """
+        columns = self.get_columns(segments, points)
+        return [
+            dict(zip(CHART_DATA_KEYS, values))
+            for values in zip(*columns.values())
+        ]
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': CHART_DATA_VERSION,
+            'segments': self.segments,
+            'distance': self.distance,
+            'elevation': self.elevation,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'speed': self.speed,
+            'time': [
+                None if time is None else time.isoformat()
+                for time in self.time
+            ],
+            'downsampled': self.downsampled,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ChartDataColumns':
+        chart_data_columns = cls()
+        chart_data_columns.segments = data['segments']
+        chart_data_columns.distance = data['distance']
+        chart_data_columns.elevation = data['elevation']
+        chart_data_columns.latitude = data['latitude']
+        chart_data_columns.longitude = data['longitude']
+        chart_data_columns.speed = data['speed']
+        chart_data_columns.time = [
+            None if time is None else datetime.fromisoformat(time)
+            for time in data['time']
+        ]
+        chart_data_columns.downsampled = data.get('downsampled', {})
+        return chart_data_columns
+
+
+def get_binary_chart_data(columns: Dict[str, List]) -> bytes:
+    """
+    Return chart data columns in a compact binary format:
+    - number of points (unsigned 32-bit integer),
+    - one array of 64-bit floats per field, in 'CHART_DATA_KEYS' order
+      ('time' as seconds since epoch, UTC).
+
+    Values are little-endian and missing values are NaN.
+    """
+    points_nb = len(columns['time'])
+    encoded_data = array('d')
+    for key in CHART_DATA_KEYS:
+        values = (
+            [
+                None if time is None else (time - EPOCH).total_seconds()
+                for time in columns['time']
+            ]
+            if key == 'time'
+            else columns[key]
+        )
+        encoded_data.extend(
+            math.nan if value is None else value for value in values
+        )
+    if sys.byteorder != 'little':
+        encoded_data.byteswap()
+    return struct.pack('<I', points_nb) + encoded_data.tobytes()
+
+
+def save_chart_data(
+    gpx_file: str, chart_data_columns: ChartDataColumns
+) -> None:
+    """
+    Store chart data in a compressed json file next to gpx file
+    """
+    chart_data_file = get_chart_data_file_path(gpx_file)
+    tmp_file = f'{chart_data_file}.tmp'
+    try:
+        with gzip.open(tmp_file, 'wb', compresslevel=5) as f:
+            f.write(
+                json.dumps(
+                    chart_data_columns.to_dict(), separators=(',', ':')
+                ).encode('utf-8')
+            )
+        # replace file atomically for concurrent requests
+        os.replace(tmp_file, chart_data_file)
+    except OSError as e:
+        appLog.error(f'Error when saving chart data: {e}')
+
+
+def load_chart_data(gpx_file: str) -> Optional[ChartDataColumns]:
+    """
+    Return chart data stored next to gpx file (None if file does not exist
+    or is outdated)
+    """
+    chart_data_file = get_chart_data_file_path(gpx_file)
+    if not os.path.exists(chart_data_file):
+        return None
+    try:
+        with gzip.open(chart_data_file, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        appLog.error(f'Error when loading chart data: {e}')
+        return None
+    if data.get('version') != CHART_DATA_VERSION:
+        return None
+    return ChartDataColumns.from_dict(data)
@@ -1,7 +1,58 @@
 import os
+from typing import IO, List
 
 from flask import current_app
 
 
 def get_absolute_file_path(relative_path: str) -> str:
     return os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+
+
+def get_files_size(file_paths: List[str]) -> int:
+    """
+    Return total size of existing files (absolute paths)
+    """
+    return sum(
+        os.path.getsize(file_path)
+        for file_path in file_paths
+        if os.path.isfile(file_path)
+    )
+
+
+def get_dir_size(dir_path: str) -> int:
+    """
+    Return total size of files in a directory and its subdirectories
+    """
+    total_size = 0
+    for current_dir_path, _, filenames in os.walk(dir_path):
+        for filename in filenames:
+            try:
+                total_size += os.path.getsize(
+                    os.path.join(current_dir_path, filename)
+                )
+            except FileNotFoundError:  # removed meanwhile
+                continue
+    return total_size
+
+
+class TeeReader:
+    """
+    Binary file object wrapper, writing data read from source file in
+    output file (for instance, to store a file while parsing it)
+    """
+
+    def __init__(self, source: IO[bytes], output: IO[bytes]) -> None:
+        self.source = source
+        self.output = output
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.output.write(data)
+        return data
+
+    def read_all(self) -> None:
+        """
+        Read remaining data (not read by parser)
+        """
+        while self.read(64 * 1024):
+            pass
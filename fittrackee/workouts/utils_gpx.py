@@ -1,18 +1,46 @@
 from datetime import timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
 
 import gpxpy.gpx
+from flask import current_app
+
+from fittrackee import appLog
 
 from .exceptions import WorkoutGPXException
-from .utils_weather import get_weather
+from .utils_chart_data import (
+    ChartDataColumns,
+    load_chart_data,
+    save_chart_data,
+)
+from .utils_gpx_stats import GpxStats, SegmentStats
+from .utils_gpx_stream import GpxReader
+from .utils_weather import get_weather_service
+
+try:
+    from . import utils_gpx_numpy
+except ImportError:  # numpy is an optional dependency
+    utils_gpx_numpy = None  # type: ignore
+
+
+def use_numpy_backend() -> bool:
+    """
+    Return True if gpx data must be calculated with numpy backend
+    """
+    if current_app.config['GPX_STATS_BACKEND'] != 'numpy':
+        return False
+    if utils_gpx_numpy is None:
+        appLog.warning('numpy is not installed, using python backend.')
+        return False
+    return True
 
 
-def open_gpx_file(gpx_file: str) -> Optional[gpxpy.gpx.GPX]:
-    gpx_file = open(gpx_file, 'r')  # type: ignore
-    gpx = gpxpy.parse(gpx_file)
-    if len(gpx.tracks) == 0:
-        return None
-    return gpx
+def get_segment_stats() -> SegmentStats:
+    """
+    Return segment stats for selected backend
+    """
+    if use_numpy_backend():
+        return utils_gpx_numpy.NumpySegmentStats()
+    return SegmentStats()
 
 
 def get_gpx_data(
@@ -57,85 +85,141 @@ def get_gpx_data(
 
 
 def get_gpx_info(
-    gpx_file: str,
+    gpx_file: Union[str, IO[bytes]],
     update_map_data: Optional[bool] = True,
     update_weather_data: Optional[bool] = True,
 ) -> Tuple:
     """
-    Parse and return gpx, map and weather data from gpx file
+    Parse and return gpx, map and weather data from gpx file.
+    Gpx file is streamed, points being processed one by one.
+    Weather data for first and last points are fetched concurrently once
+    file is parsed.
     """
-    gpx = open_gpx_file(gpx_file)
-    if gpx is None:
-        raise WorkoutGPXException('not found', 'No gpx file')
-
-    gpx_data = {'name': gpx.tracks[0].name, 'segments': []}
+    gpx_reader = GpxReader(gpx_file)
+    gpx_data: Dict[str, Any] = {'name': None, 'segments': []}
     max_speed = 0
     start = 0
     map_data = []
-    weather_data = []
-    segments_nb = len(gpx.tracks[0].segments)
+    weather_data: List[Optional[Dict]] = []
+    first_point = None
     prev_seg_last_point = None
+    segment_last_point = None
+    last_point = None
     no_stopped_time = timedelta(seconds=0)
     stopped_time_between_seg = no_stopped_time
+    gpx_stats = GpxStats()
+    segment_stats = get_segment_stats()
+
+    for track_idx, segment_idx, point in gpx_reader.iter_points():
+        # other tracks are only used for workout totals
+        if track_idx > 0:
+            if point is None:
+                gpx_stats.add_segment(segment_stats)
+                segment_stats = get_segment_stats()
+            else:
+                segment_stats.add_point(point)
+            continue
+
+        # end of segment
+        if point is None:
+            last_point = segment_last_point
+            if last_point:
+                prev_seg_last_point = last_point.time
+            segment_last_point = None
+            gpx_stats.add_segment(segment_stats)
+
+            segment_moving_data = segment_stats.get_moving_data()
+            segment_max_speed = (
+                segment_moving_data.max_speed
+                if segment_moving_data.max_speed
+                else 0
+            )
 
-    for segment_idx, segment in enumerate(gpx.tracks[0].segments):
-        segment_start = 0
-        segment_points_nb = len(segment.points)
-        for point_idx, point in enumerate(segment.points):
-            if point_idx == 0:
-                # first gpx point => get weather
-                if start == 0:
-                    start = point.time
-                    if update_weather_data:
-                        weather_data.append(get_weather(point))
-
-                # if a previous segment exists, calculate stopped time between
-                # the two segments
-                if prev_seg_last_point:
-                    stopped_time_between_seg = point.time - prev_seg_last_point
-
-            # last segment point
-            if point_idx == (segment_points_nb - 1):
-                prev_seg_last_point = point.time
-
-                # last gpx point => get weather
-                if segment_idx == (segments_nb - 1) and update_weather_data:
-                    weather_data.append(get_weather(point))
-
-            if update_map_data:
-                map_data.append([point.longitude, point.latitude])
-        segment_max_speed = (
-            segment.get_moving_data().max_speed
-            if segment.get_moving_data().max_speed
-            else 0
-        )
+            if segment_max_speed > max_speed:
+                max_speed = segment_max_speed
 
-        if segment_max_speed > max_speed:
-            max_speed = segment_max_speed
+            segment_data = get_gpx_data(
+                segment_stats, segment_max_speed, 0, no_stopped_time
+            )
+            segment_data['idx'] = segment_idx
+            gpx_data['segments'].append(segment_data)
+            segment_stats = get_segment_stats()
+            continue
+
+        if segment_stats.points_nb == 0:
+            # first gpx point
+            if start == 0:
+                start = point.time
+                first_point = point
+
+            # if a previous segment exists, calculate stopped time between
+            # the two segments
+            if prev_seg_last_point:
+                stopped_time_between_seg = point.time - prev_seg_last_point
+
+        if update_map_data:
+            map_data.append([point.longitude, point.latitude])
+        segment_stats.add_point(point)
+        segment_last_point = point
+
+    if not gpx_reader.tracks_names:
+        raise WorkoutGPXException('not found', 'No gpx file')
+    gpx_data['name'] = gpx_reader.tracks_names[0]
 
-        segment_data = get_gpx_data(
-            segment, segment_max_speed, segment_start, no_stopped_time
+    if update_weather_data:
+        weather_data = get_weather_service().get_weather_data(
+            [point for point in [first_point, last_point] if point is not None]
         )
-        segment_data['idx'] = segment_idx
-        gpx_data['segments'].append(segment_data)
 
     full_gpx_data = get_gpx_data(
-        gpx, max_speed, start, stopped_time_between_seg
+        gpx_stats, max_speed, start, stopped_time_between_seg
     )
     gpx_data = {**gpx_data, **full_gpx_data}
 
-    if update_map_data:
-        bounds = gpx.get_bounds()
-        gpx_data['bounds'] = [
-            bounds.min_latitude,
-            bounds.min_longitude,
-            bounds.max_latitude,
-            bounds.max_longitude,
-        ]
+    bounds = gpx_stats.get_bounds()
+    gpx_data['bounds'] = [
+        bounds.min_latitude,
+        bounds.min_longitude,
+        bounds.max_latitude,
+        bounds.max_longitude,
+    ]
 
     return gpx_data, map_data, weather_data
 
 
+def get_map_data(gpx_file: str) -> List[List[float]]:
+    """
+    Return coordinates of first track points, used to generate map image
+    """
+    gpx_reader = GpxReader(gpx_file)
+    map_data = []
+    for track_idx, _, point in gpx_reader.iter_points():
+        if track_idx > 0:
+            break
+        if point is not None:
+            map_data.append([point.longitude, point.latitude])
+    return map_data
+
+
+def get_first_and_last_points(gpx_file: str) -> List:
+    """
+    Return first and last points of first track (points used for weather
+    data)
+    """
+    gpx_reader = GpxReader(gpx_file)
+    first_point = None
+    last_point = None
+    for track_idx, _, point in gpx_reader.iter_points():
+        if track_idx > 0:
+            break
+        if point is None:
+            continue
+        if first_point is None:
+            first_point = point
+        last_point = point
+    return [point for point in [first_point, last_point] if point is not None]
+
+
 def get_gpx_segments(
     track_segments: List, segment_id: Optional[int] = None
 ) -> List:
@@ -157,82 +241,89 @@ def get_gpx_segments(
     return segments
 
 
-def get_chart_data(
-    gpx_file: str, segment_id: Optional[int] = None
-) -> Optional[List]:
+def get_chart_data_columns(gpx_file: str) -> Optional[ChartDataColumns]:
     """
-    Return data needed to generate chart with speed and elevation
+    Calculate chart data columns from first track of gpx file
     """
-    gpx = open_gpx_file(gpx_file)
-    if gpx is None:
+    gpx_reader = GpxReader(gpx_file)
+    numpy_backend = use_numpy_backend()
+    chart_data_columns = ChartDataColumns()
+    segments_points: List[List] = []
+    current_segment_idx = None
+
+    for track_idx, segment_idx, point in gpx_reader.iter_points():
+        if track_idx > 0:
+            break
+        if segment_idx != current_segment_idx:
+            current_segment_idx = segment_idx
+            if numpy_backend:
+                segments_points.append([])
+            else:
+                chart_data_columns.start_segment()
+        if numpy_backend:
+            if point is not None:
+                segments_points[-1].append(point)
+        elif point is None:
+            chart_data_columns.end_segment()
+        else:
+            chart_data_columns.add_point(point)
+
+    if not gpx_reader.tracks_names:
         return None
+    if numpy_backend:
+        return utils_gpx_numpy.get_chart_data_columns(segments_points)
+    return chart_data_columns
 
-    chart_data = []
-    first_point = None
-    previous_point = None
-    previous_distance = 0
 
-    track_segments = gpx.tracks[0].segments
-    segments = get_gpx_segments(track_segments, segment_id)
+def generate_chart_data(gpx_file: str) -> Optional[ChartDataColumns]:
+    """
+    Calculate chart data and store them next to gpx file
+    """
+    chart_data_columns = get_chart_data_columns(gpx_file)
+    if chart_data_columns is not None:
+        save_chart_data(gpx_file, chart_data_columns)
+    return chart_data_columns
 
-    for segment_idx, segment in enumerate(segments):
-        for point_idx, point in enumerate(segment.points):
-            if segment_idx == 0 and point_idx == 0:
-                first_point = point
-            distance = (
-                point.distance_3d(previous_point)
-                if (
-                    point.elevation
-                    and previous_point
-                    and previous_point.elevation
-                )
-                else point.distance_2d(previous_point)
-            )
-            distance = 0 if distance is None else distance
-            distance += previous_distance
-            speed = (
-                round((segment.get_speed(point_idx) / 1000) * 3600, 2)
-                if segment.get_speed(point_idx) is not None
-                else 0
-            )
-            chart_data.append(
-                {
-                    'distance': (
-                        round(distance / 1000, 2)
-                        if distance is not None
-                        else 0
-                    ),
-                    'duration': point.time_difference(first_point),
-                    'elevation': (
-                        round(point.elevation, 1)
-                        if point.elevation is not None
-                        else 0
-                    ),
-                    'latitude': point.latitude,
-                    'longitude': point.longitude,
-                    'speed': speed,
-                    'time': point.time,
-                }
-            )
-            previous_point = point
-            previous_distance = distance
 
+def get_chart_data(
+    gpx_file: str,
+    segment_id: Optional[int] = None,
+    points: Optional[int] = None,
+    in_columns: bool = False,
+) -> Optional[Union[List, Dict]]:
+    """
+    Return data needed to generate chart with speed and elevation,
+    downsampled if a number of points is provided.
+    Chart data are returned as a list of points or, if 'in_columns' is True,
+    as a dict with a list per field.
+    Chart data are calculated once and stored next to gpx file.
+    """
+    chart_data_columns = load_chart_data(gpx_file)
+    if chart_data_columns is None:
+        chart_data_columns = generate_chart_data(gpx_file)
+        if chart_data_columns is None:
+            return None
+
+    segments = get_gpx_segments(chart_data_columns.segments, segment_id)
+    chart_data: Union[List, Dict] = (
+        chart_data_columns.get_columns(segments, points)
+        if in_columns
+        else chart_data_columns.get_chart_data(segments, points)
+    )
+    if chart_data_columns.has_new_downsampled_data:
+        save_chart_data(gpx_file, chart_data_columns)
     return chart_data
 
 
 def extract_segment_from_gpx_file(
-    content: str, segment_id: int
+    gpx_file: str, segment_id: int
 ) -> Optional[str]:
     """
-    Returns segments in xml format from a gpx file content
+    Returns segment in xml format from a gpx file (only segment points are
+    loaded)
     """
-    gpx_content = gpxpy.parse(content)
-    if len(gpx_content.tracks) == 0:
-        return None
-
-    track_segment = get_gpx_segments(
-        gpx_content.tracks[0].segments, segment_id
-    )
+    if segment_id < 1:
+        raise WorkoutGPXException('error', 'Incorrect segment id', None)
 
     gpx = gpxpy.gpx.GPX()
     gpx_track = gpxpy.gpx.GPXTrack()
@@ -240,11 +331,27 @@ def extract_segment_from_gpx_file(
     gpx_segment = gpxpy.gpx.GPXTrackSegment()
     gpx_track.segments.append(gpx_segment)
 
-    for point_idx, point in enumerate(track_segment[0].points):
+    gpx_reader = GpxReader(gpx_file)
+    segment_found = False
+    for track_idx, segment_idx, point in gpx_reader.iter_points():
+        if track_idx > 0:
+            break
+        if segment_idx != segment_id - 1:
+            continue
+        if point is None:
+            segment_found = True
+            break
         gpx_segment.points.append(
             gpxpy.gpx.GPXTrackPoint(
                 point.latitude, point.longitude, elevation=point.elevation
             )
         )
 
+    if not gpx_reader.tracks_names:
+        return None
+    if not segment_found:
+        raise WorkoutGPXException(
+            'not found', f'No segment with id \'{segment_id}\'', None
+        )
+
     return gpx.to_xml()
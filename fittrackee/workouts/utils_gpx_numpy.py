@@ -0,0 +1,355 @@
+from datetime import datetime
+from typing import Any, List, Optional
+
+import numpy as np
+from gpxpy.geo import EARTH_RADIUS, ONE_DEGREE
+from gpxpy.gpx import DEFAULT_STOPPED_SPEED_THRESHOLD
+
+from .utils_chart_data import ChartDataColumns
+from .utils_gpx_stats import SegmentStats
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def get_timestamp(time: Optional[datetime]) -> float:
+    """
+    Return epoch seconds (naive datetimes from gpx files are in UTC)
+    """
+    if time is None:
+        return np.nan
+    if time.tzinfo is None:
+        return (time - EPOCH).total_seconds()
+    return time.timestamp()
+
+
+def get_seconds(time_deltas: np.ndarray) -> np.ndarray:
+    """
+    Return time differences truncated to whole seconds, as gpxpy does
+    with timedelta
+    """
+    return np.floor(np.round(time_deltas, 6))
+
+
+def get_sum(values: np.ndarray) -> float:
+    """
+    Return sum of values in order (same result as adding values one by one)
+    """
+    if values.size == 0:
+        return 0.0
+    return float(np.cumsum(values)[-1])
+
+
+def to_list(values: np.ndarray, dtype: type = float) -> List:
+    """
+    Return array values as list, NaN being replaced with None
+    """
+    is_nan = np.isnan(values)
+    values_list = np.where(is_nan, 0, values).astype(dtype).astype(object)
+    values_list[is_nan] = None
+    return values_list.tolist()
+
+
+def get_distances(
+    latitudes_1: np.ndarray,
+    longitudes_1: np.ndarray,
+    elevations_1: np.ndarray,
+    latitudes_2: np.ndarray,
+    longitudes_2: np.ndarray,
+    elevations_2: np.ndarray,
+) -> np.ndarray:
+    """
+    Return distances in meters between points (vectorized gpxpy 'distance').
+    2d distance is returned when an elevation is NaN.
+    """
+    delta_latitudes = latitudes_1 - latitudes_2
+    delta_longitudes = longitudes_1 - longitudes_2
+    coef = np.cos(latitudes_1 / 180.0 * np.pi)
+    x = delta_latitudes
+    y = delta_longitudes * coef
+    distances_2d = np.sqrt(x * x + y * y) * ONE_DEGREE
+    delta_elevations = elevations_1 - elevations_2
+    distances = np.where(
+        np.isnan(delta_elevations) | (delta_elevations == 0),
+        distances_2d,
+        np.sqrt(distances_2d ** 2 + delta_elevations ** 2),
+    )
+
+    # haversine distance is used for distant points
+    is_distant = (np.abs(delta_latitudes) > 0.2) | (
+        np.abs(delta_longitudes) > 0.2
+    )
+    if is_distant.any():
+        rad_delta_latitudes = delta_latitudes[is_distant] / 180.0 * np.pi
+        rad_delta_longitudes = delta_longitudes[is_distant] / 180.0 * np.pi
+        rad_latitudes_1 = latitudes_1[is_distant] / 180.0 * np.pi
+        rad_latitudes_2 = latitudes_2[is_distant] / 180.0 * np.pi
+        sin_latitudes = np.sin(rad_delta_latitudes / 2)
+        sin_longitudes = np.sin(rad_delta_longitudes / 2)
+        a = (
+            sin_latitudes * sin_latitudes
+            + sin_longitudes
+            * sin_longitudes
+            * np.cos(rad_latitudes_1)
+            * np.cos(rad_latitudes_2)
+        )
+        distances[is_distant] = EARTH_RADIUS * (
+            2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        )
+    return distances
+
+
+def get_max_speed(
+    speeds: np.ndarray, distances: np.ndarray
+) -> Optional[float]:
+    """
+    Return max speed, ignoring extremes (vectorized gpxpy
+    'calculate_max_speed')
+    """
+    size = speeds.size
+    if size < 20:
+        return None
+    average_distance = distances.sum() / size
+    standard_distance_deviation = np.sqrt(
+        ((distances - average_distance) ** 2).sum() / size
+    )
+    filtered_speeds = np.sort(
+        speeds[
+            np.abs(distances - average_distance)
+            <= standard_distance_deviation * 1.5
+        ]
+    )
+    if filtered_speeds.size == 0:
+        return None
+    # ignore the last 5% to avoid extremes
+    index = int(filtered_speeds.size * 0.95)
+    if index >= filtered_speeds.size:
+        index = -1
+    return float(filtered_speeds[index])
+
+
+class TrackArrays:
+    """
+    Points coordinates, elevations and times loaded in contiguous float64
+    arrays (missing elevations and times are NaN)
+    """
+
+    def __init__(self, points: List) -> None:
+        points_nb = len(points)
+        self.latitudes = np.fromiter(
+            (point.latitude for point in points), np.float64, points_nb
+        )
+        self.longitudes = np.fromiter(
+            (point.longitude for point in points), np.float64, points_nb
+        )
+        # None values are converted to NaN
+        self.elevations = np.array(
+            [point.elevation for point in points], dtype=np.float64
+        )
+        self.times = np.fromiter(
+            (get_timestamp(point.time) for point in points),
+            np.float64,
+            points_nb,
+        )
+
+
+class NumpySegmentStats(SegmentStats):
+    """
+    Segment stats computed with array operations once all points are added
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.points: List = []
+
+    def add_point(self, point: Any) -> None:
+        if self.points_nb < 2:
+            self.first_times.append(point.time)
+        self.last_times = [self.last_times[1], point.time]
+        self.points.append(point)
+        self.points_nb += 1
+
+    def close(self) -> None:
+        if self._is_closed:
+            return
+        if self.points_nb > 0:
+            self.arrays = TrackArrays(self.points)
+            self.points = []
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._compute_extremes()
+                self._compute_moving_data()
+                self._compute_uphill_downhill()
+        self._is_closed = True
+
+    def _compute_extremes(self) -> None:
+        elevations = self.arrays.elevations
+        if not np.isnan(elevations).all():
+            self.min_elevation = float(np.nanmin(elevations))
+            self.max_elevation = float(np.nanmax(elevations))
+        self.min_latitude = float(self.arrays.latitudes.min())
+        self.max_latitude = float(self.arrays.latitudes.max())
+        self.min_longitude = float(self.arrays.longitudes.min())
+        self.max_longitude = float(self.arrays.longitudes.max())
+
+    def _compute_moving_data(self) -> None:
+        if self.points_nb < 2:
+            return
+        latitudes = self.arrays.latitudes
+        longitudes = self.arrays.longitudes
+        elevations = self.arrays.elevations
+        times = self.arrays.times
+
+        is_valid = ~np.isnan(times[1:]) & ~np.isnan(times[:-1])
+        # as in gpxpy, 3d distance is used only if both elevations are not
+        # null
+        has_elevation = ~np.isnan(elevations) & (elevations != 0)
+        is_3d = has_elevation[1:] & has_elevation[:-1]
+        distances = get_distances(
+            latitudes[1:],
+            longitudes[1:],
+            np.where(is_3d, elevations[1:], np.nan),
+            latitudes[:-1],
+            longitudes[:-1],
+            np.where(is_3d, elevations[:-1], np.nan),
+        )[is_valid]
+        seconds = get_seconds(times[1:] - times[:-1])[is_valid]
+        speeds_kmh = np.where(
+            seconds > 0, (distances / 1000.0) / (seconds / 3600), 0
+        )
+        is_stopped = speeds_kmh <= DEFAULT_STOPPED_SPEED_THRESHOLD
+
+        self.stopped_time = get_sum(seconds[is_stopped])
+        self.stopped_distance = get_sum(distances[is_stopped])
+        self.moving_time = get_sum(seconds[~is_stopped])
+        self.moving_distance = get_sum(distances[~is_stopped])
+        is_moving = ~is_stopped & (distances != 0)
+        self._max_speed = get_max_speed(
+            distances[is_moving] / seconds[is_moving], distances[is_moving]
+        )
+
+    def _compute_uphill_downhill(self) -> None:
+        elevations = self.arrays.elevations
+        smoothed_elevations = elevations.copy()
+        if self.points_nb > 2:
+            # NaN if one of the elevations is missing
+            weighted_elevations = (
+                elevations[:-2] * 0.3
+                + elevations[1:-1] * 0.4
+                + elevations[2:] * 0.3
+            )
+            smoothed_elevations[1:-1] = np.where(
+                np.isnan(weighted_elevations),
+                elevations[1:-1],
+                weighted_elevations,
+            )
+        # as in gpxpy, a point without elevation is counted as 0
+        deltas = np.diff(np.nan_to_num(smoothed_elevations, nan=0.0))
+        self.uphill = get_sum(deltas[deltas > 0])
+        self.downhill = abs(get_sum(deltas[deltas < 0]))
+
+
+def get_speeds(
+    arrays: TrackArrays, segments_first_indexes: List[int]
+) -> np.ndarray:
+    """
+    Return speed in m/s for each point (vectorized gpxpy segment
+    'get_speed'), NaN when speed can not be calculated.
+    Speeds are calculated with previous and next points in the same segment.
+    """
+    latitudes = arrays.latitudes
+    longitudes = arrays.longitudes
+    elevations = arrays.elevations
+    times = arrays.times
+    points_nb = latitudes.size
+    speeds_with_previous = np.full(points_nb, np.nan)
+    speeds_with_next = np.full(points_nb, np.nan)
+    if points_nb > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            seconds = get_seconds(np.abs(times[1:] - times[:-1]))
+            seconds[seconds == 0] = np.nan
+            speeds_with_previous[1:] = (
+                get_distances(
+                    latitudes[1:],
+                    longitudes[1:],
+                    elevations[1:],
+                    latitudes[:-1],
+                    longitudes[:-1],
+                    elevations[:-1],
+                )
+                / seconds
+            )
+            speeds_with_next[:-1] = (
+                get_distances(
+                    latitudes[:-1],
+                    longitudes[:-1],
+                    elevations[:-1],
+                    latitudes[1:],
+                    longitudes[1:],
+                    elevations[1:],
+                )
+                / seconds
+            )
+    first_indexes = np.array(segments_first_indexes, dtype=int)
+    speeds_with_previous[first_indexes] = np.nan
+    speeds_with_next[first_indexes[first_indexes > 0] - 1] = np.nan
+
+    has_previous_speed = speeds_with_previous > 0
+    has_next_speed = speeds_with_next > 0
+    return np.where(
+        has_previous_speed & has_next_speed,
+        (speeds_with_previous + speeds_with_next) / 2.0,
+        np.where(has_previous_speed, speeds_with_previous, speeds_with_next),
+    )
+
+
+def get_chart_data_columns(segments_points: List[List]) -> ChartDataColumns:
+    """
+    Return chart data columns for segments points, computing distances and
+    speeds with array operations
+    """
+    chart_data_columns = ChartDataColumns()
+    points: List = []
+    segments_first_indexes: List[int] = []
+    for segment_points in segments_points:
+        if segment_points:
+            segments_first_indexes.append(len(points))
+        chart_data_columns.segments.append(
+            [len(points), len(points) + len(segment_points)]
+        )
+        points.extend(segment_points)
+    if not points:
+        return chart_data_columns
+
+    arrays = TrackArrays(points)
+    latitudes = arrays.latitudes
+    longitudes = arrays.longitudes
+    elevations = arrays.elevations
+
+    with np.errstate(invalid='ignore'):
+        # distances between consecutive points, including points from
+        # different segments
+        has_elevation = ~np.isnan(elevations) & (elevations != 0)
+        is_3d = has_elevation[1:] & has_elevation[:-1]
+        distances = np.zeros(len(points))
+        distances[1:] = get_distances(
+            latitudes[1:],
+            longitudes[1:],
+            np.where(is_3d, elevations[1:], np.nan),
+            latitudes[:-1],
+            longitudes[:-1],
+            np.where(is_3d, elevations[:-1], np.nan),
+        )
+        speeds = get_speeds(arrays, segments_first_indexes)
+
+    chart_data_columns.distance = distances.tolist()
+    chart_data_columns.elevation = [
+        0 if elevation is None else round(elevation, 1)
+        for elevation in to_list(elevations)
+    ]
+    chart_data_columns.latitude = latitudes.tolist()
+    chart_data_columns.longitude = longitudes.tolist()
+    chart_data_columns.speed = [
+        0 if speed is None else round(speed, 2)
+        for speed in to_list((speeds / 1000) * 3600)
+    ]
+    chart_data_columns.time = [point.time for point in points]
+    return chart_data_columns
@@ -0,0 +1,362 @@
+import math
+from array import array
+from datetime import datetime
+from typing import Any, List, Optional
+
+from gpxpy.geo import distance as get_distance
+from gpxpy.gpx import (
+    DEFAULT_STOPPED_SPEED_THRESHOLD,
+    GPXBounds,
+    MinimumMaximum,
+    MovingData,
+    UphillDownhill,
+)
+
+
+def get_max_speed(speeds: array, distances: array) -> Optional[float]:
+    """
+    Return max speed from speeds and distances between points, ignoring
+    extremes (same algorithm as gpxpy 'calculate_max_speed')
+    """
+    size = float(len(speeds))
+    if size < 20:
+        return None
+
+    average_distance = sum(distances) / size
+    standard_distance_deviation = math.sqrt(
+        sum((distance - average_distance) ** 2 for distance in distances)
+        / size
+    )
+    filtered_speeds = [
+        speed
+        for speed, distance in zip(speeds, distances)
+        if abs(distance - average_distance)
+        <= standard_distance_deviation * 1.5
+    ]
+    if not filtered_speeds:
+        return None
+    filtered_speeds.sort()
+
+    # ignore the last 5% to avoid extremes
+    index = int(len(filtered_speeds) * 0.95)
+    if index >= len(filtered_speeds):
+        index = -1
+    return filtered_speeds[index]
+
+
+def get_time_difference(
+    time: Optional[datetime], other_time: Optional[datetime]
+) -> Optional[int]:
+    """
+    Return time difference in seconds (same as gpxpy 'time_difference')
+    """
+    if not time or not other_time:
+        return None
+    time_delta = time - other_time if time > other_time else other_time - time
+    return time_delta.days * 86400 + time_delta.seconds
+
+
+def get_speed_between(point: Any, other_point: Any) -> Optional[float]:
+    """
+    Return speed in m/s between two points (same as gpxpy 'speed_between')
+    """
+    if not other_point:
+        return None
+    seconds = get_time_difference(point.time, other_point.time)
+    length = get_distance(
+        point.latitude,
+        point.longitude,
+        point.elevation,
+        other_point.latitude,
+        other_point.longitude,
+        other_point.elevation,
+    )
+    if not seconds:
+        return None
+    return length / float(seconds)
+
+
+def get_speed(
+    point: Any, previous_point: Any, next_point: Any
+) -> Optional[float]:
+    """
+    Return speed in m/s at a segment point, calculated with previous and
+    next points (same as gpxpy segment 'get_speed')
+    """
+    speed_1 = get_speed_between(point, previous_point)
+    speed_2 = get_speed_between(point, next_point)
+    if speed_1:
+        speed_1 = abs(speed_1)
+    if speed_2:
+        speed_2 = abs(speed_2)
+    if speed_1 and speed_2:
+        return (speed_1 + speed_2) / 2.0
+    if speed_1:
+        return speed_1
+    return speed_2
+
+
+class SegmentStats:
+    """
+    Accumulates segment data in a single traversal of segment points.
+
+    Exposes the same methods as gpxpy segments ('get_duration',
+    'get_elevation_extremes', 'get_uphill_downhill', 'get_moving_data'),
+    returning identical values.
+    """
+
+    def __init__(self) -> None:
+        self.points_nb = 0
+        self.first_times: List[Optional[datetime]] = []
+        self.last_times: List[Optional[datetime]] = [None, None]
+        self.min_elevation: Optional[float] = None
+        self.max_elevation: Optional[float] = None
+        self.min_latitude: Optional[float] = None
+        self.max_latitude: Optional[float] = None
+        self.min_longitude: Optional[float] = None
+        self.max_longitude: Optional[float] = None
+        self.moving_time = 0.0
+        self.stopped_time = 0.0
+        self.moving_distance = 0.0
+        self.stopped_distance = 0.0
+        self.speeds = array('d')
+        self.distances = array('d')
+        self.uphill = 0.0
+        self.downhill = 0.0
+        self._previous_point: Any = None
+        self._previous_elevations: List[Optional[float]] = [None, None]
+        self._previous_smoothed_elevation: Optional[float] = None
+        self._max_speed: Optional[float] = None
+        self._is_closed = False
+
+    def add_point(self, point: Any) -> None:
+        """
+        Add a point (any object with 'latitude', 'longitude', 'elevation'
+        and 'time' attributes, like gpxpy track points)
+        """
+        if self.points_nb < 2:
+            self.first_times.append(point.time)
+        self.last_times = [self.last_times[1], point.time]
+        self._update_extremes(point)
+        if self.points_nb > 0:
+            self._update_moving_data(point)
+        self._update_uphill_downhill(point.elevation, has_next=True)
+        self._previous_point = point
+        self.points_nb += 1
+
+    def close(self) -> None:
+        """
+        Finalize calculations once all points are added
+        """
+        if self._is_closed:
+            return
+        if self.points_nb > 0:
+            # last elevation is not smoothed, since there is no next point
+            self._update_uphill_downhill(None, has_next=False)
+        if self.speeds:
+            self._max_speed = get_max_speed(self.speeds, self.distances)
+        self._is_closed = True
+
+    def _update_extremes(self, point: Any) -> None:
+        if point.elevation is not None:
+            if self.min_elevation is None or point.elevation < (
+                self.min_elevation
+            ):
+                self.min_elevation = point.elevation
+            if self.max_elevation is None or point.elevation > (
+                self.max_elevation
+            ):
+                self.max_elevation = point.elevation
+        if self.min_latitude is None or point.latitude < self.min_latitude:
+            self.min_latitude = point.latitude
+        if self.max_latitude is None or point.latitude > self.max_latitude:
+            self.max_latitude = point.latitude
+        if self.min_longitude is None or point.longitude < self.min_longitude:
+            self.min_longitude = point.longitude
+        if self.max_longitude is None or point.longitude > self.max_longitude:
+            self.max_longitude = point.longitude
+
+    def _update_moving_data(self, point: Any) -> None:
+        previous_point = self._previous_point
+        if not point.time or not previous_point.time:
+            return
+
+        time_delta = point.time - previous_point.time
+        distance = get_distance(
+            point.latitude,
+            point.longitude,
+            point.elevation
+            if point.elevation and previous_point.elevation
+            else None,
+            previous_point.latitude,
+            previous_point.longitude,
+            previous_point.elevation
+            if point.elevation and previous_point.elevation
+            else None,
+        )
+        seconds = time_delta.days * 86400 + time_delta.seconds
+        speed_kmh = (
+            (distance / 1000.0) / (seconds / 3600) if seconds > 0 else 0
+        )
+        if speed_kmh <= DEFAULT_STOPPED_SPEED_THRESHOLD:
+            self.stopped_time += seconds
+            self.stopped_distance += distance
+        else:
+            self.moving_time += seconds
+            self.moving_distance += distance
+            if distance:
+                self.speeds.append(distance / seconds)
+                self.distances.append(distance)
+
+    def _update_uphill_downhill(
+        self, elevation: Optional[float], has_next: bool
+    ) -> None:
+        """
+        Smooth previous point elevation with its neighbours (when available)
+        and update uphill and downhill.
+        Note: as in gpxpy, a point without elevation is counted as 0.
+        """
+        if self.points_nb > 0:
+            previous_elevation, current_elevation = self._previous_elevations
+            if current_elevation is None:
+                smoothed_elevation = 0.0
+            elif (
+                has_next
+                and self.points_nb > 1
+                and previous_elevation is not None
+                and elevation is not None
+            ):
+                smoothed_elevation = (
+                    previous_elevation * 0.3
+                    + current_elevation * 0.4
+                    + elevation * 0.3
+                )
+            else:
+                smoothed_elevation = current_elevation
+
+            if self._previous_smoothed_elevation is not None:
+                delta = smoothed_elevation - self._previous_smoothed_elevation
+                if delta > 0:
+                    self.uphill += delta
+                else:
+                    self.downhill -= delta
+            self._previous_smoothed_elevation = smoothed_elevation
+        self._previous_elevations = [self._previous_elevations[1], elevation]
+
+    def get_duration(self) -> Optional[float]:
+        if self.points_nb < 2:
+            return 0
+        first_time = self.first_times[0] or self.first_times[1]
+        last_time = self.last_times[1] or self.last_times[0]
+        if not last_time or not first_time or last_time < first_time:
+            return None
+        time_delta = last_time - first_time
+        return time_delta.days * 86400 + time_delta.seconds
+
+    def get_elevation_extremes(self) -> MinimumMaximum:
+        return MinimumMaximum(self.min_elevation, self.max_elevation)
+
+    def get_uphill_downhill(self) -> UphillDownhill:
+        self.close()
+        return UphillDownhill(self.uphill, self.downhill)
+
+    def get_moving_data(self) -> MovingData:
+        self.close()
+        return MovingData(
+            self.moving_time,
+            self.stopped_time,
+            self.moving_distance,
+            self.stopped_distance,
+            self._max_speed,
+        )
+
+    def get_bounds(self) -> GPXBounds:
+        return GPXBounds(
+            self.min_latitude,
+            self.max_latitude,
+            self.min_longitude,
+            self.max_longitude,
+        )
+
+
+class GpxStats:
+    """
+    Aggregates segments stats for a whole gpx file, with the same methods
+    and values as gpxpy GPX object.
+    """
+
+    def __init__(self) -> None:
+        self.segments: List[SegmentStats] = []
+
+    def add_segment(self, segment_stats: SegmentStats) -> None:
+        segment_stats.close()
+        self.segments.append(segment_stats)
+
+    def get_duration(self) -> Optional[float]:
+        duration = 0.0
+        for segment in self.segments:
+            segment_duration = segment.get_duration()
+            if segment_duration is None:
+                return None
+            duration += segment_duration
+        return duration
+
+    def get_elevation_extremes(self) -> MinimumMaximum:
+        elevations = [
+            elevation
+            for segment in self.segments
+            for elevation in segment.get_elevation_extremes()
+            if elevation is not None
+        ]
+        if not elevations:
+            return MinimumMaximum(None, None)
+        return MinimumMaximum(min(elevations), max(elevations))
+
+    def get_uphill_downhill(self) -> UphillDownhill:
+        uphill = 0.0
+        downhill = 0.0
+        for segment in self.segments:
+            segment_uphill, segment_downhill = segment.get_uphill_downhill()
+            uphill += segment_uphill
+            downhill += segment_downhill
+        return UphillDownhill(uphill, downhill)
+
+    def get_moving_data(self) -> MovingData:
+        moving_time = 0.0
+        stopped_time = 0.0
+        moving_distance = 0.0
+        stopped_distance = 0.0
+        max_speed = 0.0
+        for segment in self.segments:
+            segment_moving_data = segment.get_moving_data()
+            moving_time += segment_moving_data.moving_time
+            stopped_time += segment_moving_data.stopped_time
+            moving_distance += segment_moving_data.moving_distance
+            stopped_distance += segment_moving_data.stopped_distance
+            if (
+                segment_moving_data.max_speed is not None
+                and segment_moving_data.max_speed > max_speed
+            ):
+                max_speed = segment_moving_data.max_speed
+        return MovingData(
+            moving_time,
+            stopped_time,
+            moving_distance,
+            stopped_distance,
+            max_speed,
+        )
+
+    def get_bounds(self) -> GPXBounds:
+        bounds = [
+            segment.get_bounds()
+            for segment in self.segments
+            if segment.points_nb > 0
+        ]
+        if not bounds:
+            return GPXBounds(None, None, None, None)
+        return GPXBounds(
+            min(bound.min_latitude for bound in bounds),
+            max(bound.max_latitude for bound in bounds),
+            min(bound.min_longitude for bound in bounds),
+            max(bound.max_longitude for bound in bounds),
+        )
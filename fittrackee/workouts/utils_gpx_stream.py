@@ -0,0 +1,130 @@
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+
+from gpxpy.gpx import GPXException, GPXXMLSyntaxException
+from gpxpy.gpxfield import FLOAT_TYPE, TIME_TYPE
+
+GpxPoint = namedtuple(
+    'GpxPoint', ['latitude', 'longitude', 'elevation', 'time']
+)
+
+GPX_TAGS = ['ele', 'name', 'time', 'trk', 'trkpt', 'trkseg']
+
+
+def get_tags(root_tag: str) -> Dict[str, str]:
+    """
+    Return gpx tags with root element namespace
+    """
+    namespace = (
+        root_tag[: root_tag.index('}') + 1] if root_tag.startswith('{') else ''
+    )
+    return {tag: f'{namespace}{tag}' for tag in GPX_TAGS}
+
+
+def get_child_text(element: ET.Element, tag: str) -> Optional[str]:
+    child = element.find(tag)
+    return None if child is None else child.text
+
+
+def parse_time(time: Optional[str]) -> Optional[datetime]:
+    """
+    Return naive datetime, like gpxpy (timezone and fractional seconds
+    are ignored).
+    Most gpx files use UTC times ('YYYY-MM-DDTHH:MM:SSZ'), parsed faster
+    with 'fromisoformat'.
+    """
+    if time and len(time) == 20 and time[10] == 'T' and time[19] == 'Z':
+        try:
+            return datetime.fromisoformat(time[:19])
+        except ValueError:
+            pass
+    return TIME_TYPE.from_string(time)
+
+
+def get_point(element: ET.Element, tags: Dict[str, str]) -> GpxPoint:
+    """
+    Return point from a 'trkpt' element, with same values as gpxpy
+    """
+    latitude = element.get('lat')
+    longitude = element.get('lon')
+    if latitude is None or longitude is None:
+        raise GPXException('latitude and longitude are mandatory in trkpt')
+    elevation = get_child_text(element, tags['ele'])
+    try:
+        return GpxPoint(
+            FLOAT_TYPE.from_string(latitude),
+            FLOAT_TYPE.from_string(longitude),
+            FLOAT_TYPE.from_string(elevation),
+            parse_time(get_child_text(element, tags['time'])),
+        )
+    except ValueError as e:
+        raise GPXException(f'Invalid value in trkpt: {e}')
+
+
+class GpxReader:
+    """
+    Streams track points from a gpx file (file path or binary file object),
+    without building the whole document tree: elements are discarded once
+    processed, so memory usage does not depend on file size.
+    """
+
+    def __init__(self, gpx_file: Union[str, IO[bytes]]) -> None:
+        self.gpx_file = gpx_file
+        self.tracks_names: List[Optional[str]] = []
+
+    def iter_points(self) -> Iterator[Tuple[int, int, Optional[GpxPoint]]]:
+        """
+        Yield track index, segment index and point for each track point.
+        Segment end is notified with a None point (so empty segments are
+        also returned).
+        """
+        self.tracks_names = []
+        track_idx = -1
+        segment_idx = -1
+        tags: Dict[str, str] = {}
+        # ancestors of current element
+        elements: List[ET.Element] = []
+        with (
+            open(self.gpx_file, 'rb')
+            if isinstance(self.gpx_file, str)
+            else nullcontext(self.gpx_file)
+        ) as gpx_file:
+            try:
+                for event, element in ET.iterparse(
+                    gpx_file, events=('start', 'end')
+                ):
+                    if event == 'start':
+                        if not elements:
+                            tags = get_tags(element.tag)
+                        elif element.tag == tags['trk']:
+                            track_idx += 1
+                            segment_idx = -1
+                            self.tracks_names.append(None)
+                        elif element.tag == tags['trkseg']:
+                            segment_idx += 1
+                        elements.append(element)
+                        continue
+
+                    elements.pop()
+                    if not elements:
+                        break
+                    parent = elements[-1]
+                    if element.tag == tags['trkpt']:
+                        yield track_idx, segment_idx, get_point(element, tags)
+                    elif element.tag == tags['trkseg']:
+                        yield track_idx, segment_idx, None
+                    elif (
+                        element.tag == tags['name']
+                        and parent.tag == tags['trk']
+                    ):
+                        self.tracks_names[track_idx] = element.text
+
+                    # processed elements are removed from root, tracks and
+                    # segments to keep memory usage bounded
+                    if len(elements) < 4:
+                        del parent[:]
+            except ET.ParseError as e:
+                raise GPXXMLSyntaxException(f'Error parsing XML: {e}', e)
@@ -0,0 +1,389 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from staticmap import StaticMap
+
+from fittrackee import appLog
+
+from .utils_files import get_absolute_file_path
+
+CACHE_DIR = 'cache'
+STATIC_MAP_TILES_CACHE_DIR = os.path.join(CACHE_DIR, 'static_map_tiles')
+MAP_TILES_CACHE_DIR = os.path.join(CACHE_DIR, 'map_tiles')
+# max age of tiles returned by tile proxy, in seconds
+MAP_TILES_MAX_AGE = 7 * 24 * 3600
+TILE_REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'
+}
+TILE_REQUEST_TIMEOUT = 10
+# staticmap downloads tiles with 4 threads
+TILES_FETCHING_THREADS = 4
+# when cache size exceeds maximum size, tiles are removed until cache size
+# is under this ratio of maximum size (to avoid evicting on each new tile)
+EVICTION_TARGET_RATIO = 0.9
+
+_tile_caches: Dict[Tuple[str, int], 'TileCache'] = {}
+_tile_caches_lock = threading.Lock()
+_tile_proxies: Dict[Tuple[str, str, int, int], 'TileProxy'] = {}
+_tile_proxies_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class TileCache:
+    """
+    On-disk tiles cache, which can be shared by several processes.
+
+    Tiles are stored in files named after key hash. Tile file modification
+    time is updated on each access, so when cache size exceeds maximum size,
+    least recently used tiles are removed first.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # cache size is calculated on first write and then updated with
+        # written tiles (tiles written by other processes are taken into
+        # account on eviction)
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get_tile_path(self, key: str) -> str:
+        key_hash = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key_hash[:2], key_hash)
+
+    def get(self, key: str) -> Optional[bytes]:
+        tile_path = self.get_tile_path(key)
+        try:
+            with open(tile_path, 'rb') as f:
+                content = f.read()
+            os.utime(tile_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def set(self, key: str, content: bytes) -> None:
+        tile_path = self.get_tile_path(key)
+        try:
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(tile_path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            # replace file atomically for concurrent processes
+            os.replace(tmp_path, tile_path)
+        except OSError as e:
+            appLog.error(f'Error when saving tile in cache: {e}')
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self.get_size()
+            else:
+                self._size += len(content)
+            if self._size > self.max_size:
+                self.evict()
+
+    def get_tiles(self) -> Dict[str, os.stat_result]:
+        """
+        Return stats for each tile file stored in cache directory
+        """
+        tiles = {}
+        for dir_path, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                tile_path = os.path.join(dir_path, filename)
+                try:
+                    tiles[tile_path] = os.stat(tile_path)
+                except FileNotFoundError:  # removed by another process
+                    continue
+        return tiles
+
+    def get_size(self) -> int:
+        return sum(stat.st_size for stat in self.get_tiles().values())
+
+    def evict(self) -> None:
+        """
+        Remove least recently used tiles until cache size is under target
+        size
+        """
+        tiles = self.get_tiles()
+        size = sum(stat.st_size for stat in tiles.values())
+        target_size = self.max_size * EVICTION_TARGET_RATIO
+        for tile_path, stat in sorted(
+            tiles.items(), key=lambda tile: tile[1].st_mtime
+        ):
+            if size <= target_size:
+                break
+            try:
+                os.remove(tile_path)
+                self.evictions += 1
+            except FileNotFoundError:  # removed by another process
+                pass
+            size -= stat.st_size
+        self._size = size
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (
+                    round(self.hits / requests_count, 3)
+                    if requests_count
+                    else None
+                ),
+                'max_size': self.max_size,
+            }
+
+
+def get_tile_cache(cache_dir: str, max_size: int) -> TileCache:
+    """
+    Return tile cache for given directory, shared by threads of current
+    process
+    """
+    with _tile_caches_lock:
+        key = (cache_dir, max_size)
+        if key not in _tile_caches:
+            _tile_caches[key] = TileCache(cache_dir, max_size)
+        return _tile_caches[key]
+
+
+def get_static_map_tile_cache() -> Optional[TileCache]:
+    """
+    Return tile cache used for static maps (None if cache is disabled)
+    """
+    max_size = current_app.config['STATIC_MAP_TILES_CACHE_SIZE'] * 1024 ** 2
+    if max_size <= 0:
+        return None
+    return get_tile_cache(
+        get_absolute_file_path(STATIC_MAP_TILES_CACHE_DIR), max_size
+    )
+
+
+def get_session() -> requests.Session:
+    """
+    Return HTTP session shared by threads of current process, to reuse
+    connections to tile server
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=TILES_FETCHING_THREADS,
+                pool_maxsize=TILES_FETCHING_THREADS,
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+class CachedStaticMap(StaticMap):
+    """
+    Static map downloading missing tiles with a shared HTTP session and
+    storing them in tile cache (tiles are fetched concurrently by
+    staticmap)
+    """
+
+    def __init__(
+        self, *args: Any, tile_cache: Optional[TileCache] = None, **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.tile_cache = tile_cache
+
+    def get(self, url: str, **kwargs: Any) -> Tuple[int, bytes]:
+        if self.tile_cache:
+            content = self.tile_cache.get(url)
+            if content is not None:
+                return 200, content
+        response = get_session().get(url, **kwargs)
+        if response.status_code == 200 and self.tile_cache:
+            self.tile_cache.set(url, response.content)
+        return response.status_code, response.content
+
+
+def get_static_map_tile_cache_stats() -> Optional[Dict]:
+    """
+    Return static map tile cache metrics (requests counters are those of
+    current process) and cache size on disk
+    """
+    tile_cache = get_static_map_tile_cache()
+    if tile_cache is None:
+        return None
+    return {**tile_cache.get_stats(), 'size': tile_cache.get_size()}
+
+
+Tile = namedtuple('Tile', ['status_code', 'content', 'content_type', 'etag'])
+
+
+class MemoryTileCache:
+    """
+    In-memory LRU tiles cache, bounded by tiles size
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.tiles: 'OrderedDict[str, Tile]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tile]:
+        with self._lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+            return tile
+
+    def set(self, key: str, tile: Tile) -> None:
+        with self._lock:
+            if key in self.tiles:
+                self.size -= len(self.tiles.pop(key).content)
+            self.tiles[key] = tile
+            self.size += len(tile.content)
+            while self.size > self.max_size:
+                _, removed_tile = self.tiles.popitem(last=False)
+                self.size -= len(removed_tile.content)
+
+
+def get_tile(status_code: int, content: bytes, content_type: str) -> Tile:
+    """
+    Return tile with an ETag calculated from content for valid tiles
+    """
+    return Tile(
+        status_code,
+        content,
+        content_type,
+        hashlib.md5(content).hexdigest() if status_code == 200 else None,
+    )
+
+
+class TileProxy:
+    """
+    Returns tiles from tile server, valid tiles being stored in an in-memory
+    cache and an on-disk cache (shared by processes).
+
+    Concurrent requests for a tile missing from cache are coalesced: only
+    the first one fetches tile from tile server, the others waiting for the
+    result.
+    """
+
+    def __init__(
+        self,
+        url_template: str,
+        disk_cache: Optional[TileCache] = None,
+        memory_cache: Optional[MemoryTileCache] = None,
+    ) -> None:
+        self.url_template = url_template
+        self.disk_cache = disk_cache
+        self.memory_cache = memory_cache
+        self._pending_tiles: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_cached_tile(self, key: str) -> Optional[Tile]:
+        if self.memory_cache:
+            tile = self.memory_cache.get(key)
+            if tile is not None:
+                return tile
+        if self.disk_cache:
+            content = self.disk_cache.get(key)
+            if content is not None:
+                # tiles are requested with '.png' extension
+                tile = get_tile(200, content, 'image/png')
+                if self.memory_cache:
+                    self.memory_cache.set(key, tile)
+                return tile
+        return None
+
+    def fetch_tile(self, key: str, url: str) -> Tile:
+        response = get_session().get(
+            url, headers=TILE_REQUEST_HEADERS, timeout=TILE_REQUEST_TIMEOUT
+        )
+        tile = get_tile(
+            response.status_code,
+            response.content,
+            response.headers.get('content-type', 'image/png'),
+        )
+        if tile.status_code == 200:
+            if self.disk_cache:
+                self.disk_cache.set(key, tile.content)
+            if self.memory_cache:
+                self.memory_cache.set(key, tile)
+        return tile
+
+    def get_tile(self, s: str, z: str, x: str, y: str) -> Tile:
+        key = f'{s}/{z}/{x}/{y}'
+        if self.memory_cache:
+            tile = self.memory_cache.get(key)
+            if tile is not None:
+                return tile
+
+        with self._lock:
+            pending_tile = self._pending_tiles.get(key)
+            if pending_tile is None:
+                pending_tile = Future()
+                self._pending_tiles[key] = pending_tile
+                is_fetching = True
+            else:
+                is_fetching = False
+        if not is_fetching:
+            return pending_tile.result()
+
+        try:
+            tile = self.get_cached_tile(key)
+            if tile is None:
+                tile = self.fetch_tile(
+                    key, self.url_template.format(s=s, z=z, x=x, y=y)
+                )
+            pending_tile.set_result(tile)
+            return tile
+        except Exception as e:
+            pending_tile.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending_tiles[key]
+
+
+def get_tile_proxy() -> TileProxy:
+    """
+    Return tile proxy for current configuration, shared by threads of
+    current process
+    """
+    url_template = current_app.config['TILE_SERVER']['URL']
+    cache_dir = get_absolute_file_path(MAP_TILES_CACHE_DIR)
+    disk_cache_size = current_app.config['MAP_TILES_CACHE_SIZE'] * 1024 ** 2
+    memory_cache_size = (
+        current_app.config['MAP_TILES_MEMORY_CACHE_SIZE'] * 1024 ** 2
+    )
+    with _tile_proxies_lock:
+        key = (url_template, cache_dir, disk_cache_size, memory_cache_size)
+        if key not in _tile_proxies:
+            _tile_proxies[key] = TileProxy(
+                url_template,
+                (
+                    get_tile_cache(cache_dir, disk_cache_size)
+                    if disk_cache_size > 0
+                    else None
+                ),
+                (
+                    MemoryTileCache(memory_cache_size)
+                    if memory_cache_size > 0
+                    else None
+                ),
+            )
+        return _tile_proxies[key]
@@ -1,26 +1,70 @@
-import os
-from typing import Dict, Optional
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from time import monotonic, sleep
+from typing import Any, Dict, List, Optional, Tuple
 
 import forecastio
 import pytz
-from gpxpy.gpx import GPXRoutePoint
+import requests
+from flask import current_app
 
 from fittrackee import appLog
 
-API_KEY = os.getenv('WEATHER_API_KEY')
+DARK_SKY_URL = (
+    'https://api.darksky.net/forecast/{key}/{latitude},{longitude},{time}'
+    '?units=si'
+)
+WEATHER_REQUEST_TIMEOUT = 10
+# weather data are cached by coordinates rounded to 2 decimals (about 1km)
+# and hour
+WEATHER_CACHE_SIZE = 1000
+WEATHER_CACHE_TTL = 24 * 3600
+WEATHER_THREADS = 4
 
+WeatherKey = Tuple[float, float, datetime]
 
-def get_weather(point: GPXRoutePoint) -> Optional[Dict]:
-    if not API_KEY or API_KEY == '':
-        return None
-    try:
-        point_time = pytz.utc.localize(point.time)
-        forecast = forecastio.load_forecast(
-            API_KEY,
-            point.latitude,
-            point.longitude,
-            time=point_time,
-            units='si',
+_executor = ThreadPoolExecutor(
+    max_workers=WEATHER_THREADS, thread_name_prefix='weather'
+)
+_weather_services: Dict[Tuple, 'WeatherService'] = {}
+_weather_services_lock = threading.Lock()
+
+
+class WeatherProvider(ABC):
+    """
+    Returns weather data for coordinates and time (UTC)
+    """
+
+    @abstractmethod
+    def get_weather(
+        self, latitude: float, longitude: float, time: datetime
+    ) -> Optional[Dict]:
+        pass
+
+
+class DarkSkyWeatherProvider(WeatherProvider):
+    def __init__(self, api_key: str) -> None:
+        self.api_key = api_key
+        self.session = requests.Session()
+
+    def get_weather(
+        self, latitude: float, longitude: float, time: datetime
+    ) -> Optional[Dict]:
+        response = self.session.get(
+            DARK_SKY_URL.format(
+                key=self.api_key,
+                latitude=latitude,
+                longitude=longitude,
+                time=pytz.utc.localize(time).isoformat(),
+            ),
+            timeout=WEATHER_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        forecast = forecastio.models.Forecast(
+            response.json(), response, response.headers
         )
         weather = forecast.currently()
         return {
@@ -30,6 +74,164 @@ def get_weather(point: GPXRoutePoint) -> Optional[Dict]:
             'humidity': weather.humidity,
             'wind': weather.windSpeed,
         }
-    except Exception as e:
-        appLog.error(e)
-        return None
+
+
+class StubWeatherProvider(WeatherProvider):
+    """
+    Local provider returning the same weather for all points, after an
+    optional delay (for tests)
+    """
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.calls_count = 0
+
+    def get_weather(
+        self, latitude: float, longitude: float, time: datetime
+    ) -> Optional[Dict]:
+        self.calls_count += 1
+        if self.delay:
+            sleep(self.delay)
+        return {
+            'summary': 'Clear',
+            'icon': 'clear-day',
+            'temperature': 12.5,
+            'humidity': 0.6,
+            'wind': 3.2,
+        }
+
+
+class WeatherCache:
+    """
+    In-memory weather cache with LRU eviction, entries expiring after TTL
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: 'OrderedDict[WeatherKey, Tuple[float, Dict]]' = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: WeatherKey) -> Optional[Dict]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expiration, weather = entry
+            if expiration < monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return weather
+
+    def set(self, key: WeatherKey, weather: Dict) -> None:
+        with self._lock:
+            self.entries[key] = (monotonic() + self.ttl, weather)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+def get_weather_key(point: Any) -> WeatherKey:
+    """
+    Return rounded coordinates and hour of a point (time in UTC)
+    """
+    return (
+        round(point.latitude, 2),
+        round(point.longitude, 2),
+        point.time.replace(minute=0, second=0, microsecond=0, tzinfo=None),
+    )
+
+
+class WeatherService:
+    """
+    Returns weather data for gpx points, with cached results.
+
+    Weather data for several points are fetched concurrently, within a
+    latency budget ('timeout', in seconds): data not returned in time are
+    None (lookups are not cancelled and results are cached once received).
+    """
+
+    def __init__(
+        self,
+        provider: Optional[WeatherProvider],
+        cache: WeatherCache,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.provider = provider
+        self.cache = cache
+        self.timeout = timeout
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.provider is not None
+
+    def get_weather(self, point: Any) -> Optional[Dict]:
+        if self.provider is None or point.time is None:
+            return None
+        key = get_weather_key(point)
+        weather = self.cache.get(key)
+        if weather is not None:
+            return weather
+        try:
+            weather = self.provider.get_weather(*key)
+        except Exception as e:
+            appLog.error(f'Error when fetching weather data: {e}')
+            return None
+        if weather is not None:
+            self.cache.set(key, weather)
+        return weather
+
+    def get_weather_data(
+        self, points: List, with_latency_budget: bool = True
+    ) -> List[Optional[Dict]]:
+        """
+        Return weather data for each point
+        """
+        if self.provider is None:
+            return [None for _ in points]
+        futures = [
+            _executor.submit(self.get_weather, point) for point in points
+        ]
+        done, _ = wait(
+            futures, timeout=self.timeout if with_latency_budget else None
+        )
+        if len(done) < len(futures):
+            appLog.warning('Weather data not fetched within latency budget.')
+        return [
+            future.result() if future in done else None for future in futures
+        ]
+
+
+_weather_cache = WeatherCache(WEATHER_CACHE_SIZE, WEATHER_CACHE_TTL)
+
+
+def get_weather_provider(
+    provider_name: str, api_key: Optional[str]
+) -> Optional[WeatherProvider]:
+    if provider_name == 'stub':
+        return StubWeatherProvider()
+    if provider_name == 'darksky' and api_key:
+        return DarkSkyWeatherProvider(api_key)
+    return None
+
+
+def get_weather_service() -> WeatherService:
+    """
+    Return weather service for current configuration, shared by threads of
+    current process
+    """
+    provider_name = current_app.config['WEATHER_PROVIDER']
+    api_key = current_app.config['WEATHER_API_KEY']
+    timeout = current_app.config['WEATHER_TIMEOUT']
+    with _weather_services_lock:
+        key = (provider_name, api_key, timeout)
+        if key not in _weather_services:
+            _weather_services[key] = WeatherService(
+                get_weather_provider(provider_name, api_key),
+                _weather_cache,
+                timeout,
+            )
+        return _weather_services[key]
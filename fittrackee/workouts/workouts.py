@@ -1,12 +1,11 @@
 import json
 import os
 import shutil
-from datetime import timedelta
 from typing import Any, Dict, List, Optional, Tuple, Union
 
-import requests
 from flask import Blueprint, Response, current_app, request, send_file
 from sqlalchemy import exc
+from sqlalchemy.orm import selectinload
 from werkzeug.exceptions import RequestEntityTooLarge
 
 from fittrackee import appLog, db
@@ -18,29 +17,37 @@ from fittrackee.responses import (
     InvalidPayloadErrorResponse,
     NotFoundErrorResponse,
     PayloadTooLargeErrorResponse,
+    UnauthorizedErrorResponse,
     handle_error_and_return_response,
 )
+from fittrackee.tasks import enrich_workout, import_workouts
 from fittrackee.users.decorators import authenticate
-from fittrackee.users.models import User
-from fittrackee.users.utils import can_view_workout
+from fittrackee.users.utils import (
+    can_view_workout,
+    get_auth_user,
+    get_auth_user_attributes,
+)
 from fittrackee.utils import verify_extension_and_size
 
-from .models import Workout
+from .models import ImportJob, Workout
 from .utils import (
     WorkoutException,
+    create_import_job,
     create_workout,
     edit_workout,
     get_absolute_file_path,
-    get_datetime_from_request_args,
+    get_workouts_filters,
+    get_workouts_page_from_cursor,
     process_files,
 )
-from .utils_format import convert_in_duration
+from .utils_chart_data import CHART_DATA_FORMATS, get_binary_chart_data
 from .utils_gpx import (
     WorkoutGPXException,
     extract_segment_from_gpx_file,
     get_chart_data,
 )
 from .utils_id import decode_short_id
+from .utils_map import MAP_TILES_MAX_AGE, get_tile_proxy
 
 workouts_blueprint = Blueprint('workouts', __name__)
 
@@ -88,6 +95,7 @@ def get_workouts(auth_user_id: int) -> Union[Dict, HttpResponse]:
                 "descent": null,
                 "distance": 10.0,
                 "duration": "0:17:04",
+                "enrichment_status": "completed",
                 "id": "kjxavSTUrJvoAh2wvCeGEF",
                 "map": null,
                 "max_alt": null,
@@ -168,6 +176,9 @@ def get_workouts(auth_user_id: int) -> Union[Dict, HttpResponse]:
     :param integer auth_user_id: authenticate user id (from JSON Web Token)
 
     :query integer page: page if using pagination (default: 1)
+    :query string cursor: cursor returned in ``pagination`` if using
+                          cursor-based pagination (an empty cursor returns
+                          the first page, ``page`` is then ignored)
     :query integer per_page: number of workouts per page
                              (default: 5, max: 100)
     :query integer sport_id: sport id
@@ -186,6 +197,7 @@ def get_workouts(auth_user_id: int) -> Union[Dict, HttpResponse]:
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 200: success
+    :statuscode 400: Invalid cursor.
     :statuscode 401:
         - Provide a valid auth token.
         - Signature expired. Please log in again.
@@ -194,68 +206,54 @@ def get_workouts(auth_user_id: int) -> Union[Dict, HttpResponse]:
 
     """
     try:
-        user = User.query.filter_by(id=auth_user_id).first()
+        auth_user = get_auth_user_attributes(auth_user_id)
         params = request.args.copy()
         page = int(params.get('page', 1))
-        date_from, date_to = get_datetime_from_request_args(params, user)
-        distance_from = params.get('distance_from')
-        distance_to = params.get('distance_to')
-        duration_from = params.get('duration_from')
-        duration_to = params.get('duration_to')
-        ave_speed_from = params.get('ave_speed_from')
-        ave_speed_to = params.get('ave_speed_to')
-        max_speed_from = params.get('max_speed_from')
-        max_speed_to = params.get('max_speed_to')
         order = params.get('order')
-        sport_id = params.get('sport_id')
         per_page = int(params.get('per_page', DEFAULT_WORKOUTS_PER_PAGE))
         if per_page > MAX_WORKOUTS_PER_PAGE:
             per_page = MAX_WORKOUTS_PER_PAGE
-        workouts = (
-            Workout.query.filter(
-                Workout.user_id == auth_user_id,
-                Workout.sport_id == sport_id if sport_id else True,
-                Workout.workout_date >= date_from if date_from else True,
-                Workout.workout_date < date_to + timedelta(seconds=1)
-                if date_to
-                else True,
-                Workout.distance >= int(distance_from)
-                if distance_from
-                else True,
-                Workout.distance <= int(distance_to) if distance_to else True,
-                Workout.moving >= convert_in_duration(duration_from)
-                if duration_from
-                else True,
-                Workout.moving <= convert_in_duration(duration_to)
-                if duration_to
-                else True,
-                Workout.ave_speed >= float(ave_speed_from)
-                if ave_speed_from
-                else True,
-                Workout.ave_speed <= float(ave_speed_to)
-                if ave_speed_to
-                else True,
-                Workout.max_speed >= float(max_speed_from)
-                if max_speed_from
-                else True,
-                Workout.max_speed <= float(max_speed_to)
-                if max_speed_to
-                else True,
+        cursor = params.get('cursor')
+        filters = get_workouts_filters(
+            params, auth_user_id, auth_user.timezone
+        )
+        query = Workout.query.filter(*filters).options(
+            selectinload(Workout.segments), selectinload(Workout.records)
+        )
+        pagination = None
+        if cursor is None:
+            workouts = (
+                query.order_by(
+                    Workout.workout_date.asc()
+                    if order == 'asc'
+                    else Workout.workout_date.desc(),
+                    # workouts with same date are returned in creation order
+                    Workout.id.asc(),
+                )
+                .paginate(page, per_page, False)
+                .items
             )
-            .order_by(
-                Workout.workout_date.asc()
-                if order == 'asc'
-                else Workout.workout_date.desc()
+        else:
+            workouts, pagination = get_workouts_page_from_cursor(
+                query, cursor, per_page, order
             )
-            .paginate(page, per_page, False)
-            .items
+        adjacent_workouts = Workout.get_adjacent_workouts(
+            filters, [workout.id for workout in workouts]
         )
-        return {
+        response_object: Dict = {
             'status': 'success',
             'data': {
-                'workouts': [workout.serialize(params) for workout in workouts]
+                'workouts': [
+                    workout.serialize(adjacent_workouts[workout.id])
+                    for workout in workouts
+                ]
             },
         }
+        if pagination:
+            response_object['pagination'] = pagination
+        return response_object
+    except WorkoutException as e:
+        return InvalidPayloadErrorResponse(e.message)
     except Exception as e:
         return handle_error_and_return_response(e)
 
@@ -296,6 +294,7 @@ def get_workout(
                 "descent": null,
                 "distance": 12,
                 "duration": "0:45:00",
+                "enrichment_status": "completed",
                 "id": "kjxavSTUrJvoAh2wvCeGEF",
                 "map": null,
                 "max_alt": null,
@@ -372,6 +371,20 @@ def get_workout_data(
     segment_id: Optional[int] = None,
 ) -> Union[Dict, HttpResponse]:
     """Get data from an workout gpx file"""
+    points = None
+    chart_data_format = 'records'
+    if data_type == 'chart_data':
+        if 'points' in request.args:
+            try:
+                points = int(request.args['points'])
+                if points < 1:
+                    raise ValueError
+            except ValueError:
+                return InvalidPayloadErrorResponse('Invalid number of points.')
+        chart_data_format = request.args.get('format', 'records')
+        if chart_data_format not in CHART_DATA_FORMATS:
+            return InvalidPayloadErrorResponse('Invalid chart data format.')
+
     workout_uuid = decode_short_id(workout_short_id)
     workout = Workout.query.filter_by(uuid=workout_uuid).first()
     if not workout:
@@ -390,18 +403,29 @@ def get_workout_data(
 
     try:
         absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
-        chart_data_content: Optional[List] = []
+        chart_data_content: Optional[Union[List, Dict]] = []
         if data_type == 'chart_data':
             chart_data_content = get_chart_data(
-                absolute_gpx_filepath, segment_id
+                absolute_gpx_filepath,
+                segment_id,
+                points,
+                in_columns=chart_data_format != 'records',
             )
+            if chart_data_format == 'binary' and isinstance(
+                chart_data_content, dict
+            ):
+                return HttpResponse(
+                    get_binary_chart_data(chart_data_content),
+                    content_type='application/octet-stream',
+                )
         else:  # data_type == 'gpx'
-            with open(absolute_gpx_filepath, encoding='utf-8') as f:
-                gpx_content = f.read()
-                if segment_id is not None:
-                    gpx_segment_content = extract_segment_from_gpx_file(
-                        gpx_content, segment_id
-                    )
+            if segment_id is None:
+                with open(absolute_gpx_filepath, encoding='utf-8') as f:
+                    gpx_content = f.read()
+            else:
+                gpx_segment_content = extract_segment_from_gpx_file(
+                    absolute_gpx_filepath, segment_id
+                )
     except WorkoutGPXException as e:
         appLog.error(e.message)
         if e.status == 'not found':
@@ -493,6 +517,20 @@ def get_workout_chart_data(
       GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart HTTP/1.1
       Content-Type: application/json
 
+    - with downsampled data
+
+    .. sourcecode:: http
+
+      GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart?points=500 HTTP/1.1
+      Content-Type: application/json
+
+    - with chart data in columns
+
+    .. sourcecode:: http
+
+      GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart?format=columns HTTP/1.1
+      Content-Type: application/json
+
     **Example response**:
 
     .. sourcecode:: http
@@ -527,12 +565,58 @@ def get_workout_chart_data(
         "status": "success"
       }
 
+    - with chart data in columns
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Content-Type: application/json
+
+      {
+        "data": {
+          "chart_data": {
+            "distance": [0, 7.5],
+            "duration": [0, 7380],
+            "elevation": [279.4, 280],
+            "latitude": [51.5078118, 51.5079733],
+            "longitude": [-0.1232004, -0.1234538],
+            "speed": [8.63, 6.39],
+            "time": [
+              "Fri, 14 Jul 2017 13:44:03 GMT",
+              "Fri, 14 Jul 2017 15:47:03 GMT"
+            ]
+          }
+        },
+        "message": "",
+        "status": "success"
+      }
+
     :param integer auth_user_id: authenticate user id (from JSON Web Token)
     :param string workout_short_id: workout short id
 
+    :query integer points: maximal number of points to return: chart data
+                           are downsampled (Largest-Triangle-Three-Buckets)
+                           to the nearest available level (100, 250, 500,
+                           1000, 2500 or 5000 points), all points are
+                           returned if not provided
+    :query string format: chart data format:
+
+                          - ``records`` (default): a list of points
+                          - ``columns``: a list of values per field
+                          - ``binary``: compact binary format
+                            (``application/octet-stream``): number of points
+                            (unsigned 32-bit integer), followed by one array
+                            of 64-bit floats per field, in this order:
+                            distance, duration, elevation, latitude,
+                            longitude, speed and time (seconds since epoch).
+                            Values are little-endian, missing values are NaN.
+
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 200: success
+    :statuscode 400:
+        - Invalid number of points.
+        - Invalid chart data format.
     :statuscode 401:
         - Provide a valid auth token.
         - Signature expired. Please log in again.
@@ -617,6 +701,20 @@ def get_segment_chart_data(
       GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart/segment/0 HTTP/1.1
       Content-Type: application/json
 
+    - with downsampled data
+
+    .. sourcecode:: http
+
+      GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart/segment/0?points=500
+      Content-Type: application/json
+
+    - with chart data in columns
+
+    .. sourcecode:: http
+
+      GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart/segment/0?format=columns
+      Content-Type: application/json
+
     **Example response**:
 
     .. sourcecode:: http
@@ -651,14 +749,60 @@ def get_segment_chart_data(
         "status": "success"
       }
 
+    - with chart data in columns
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Content-Type: application/json
+
+      {
+        "data": {
+          "chart_data": {
+            "distance": [0, 7.5],
+            "duration": [0, 7380],
+            "elevation": [279.4, 280],
+            "latitude": [51.5078118, 51.5079733],
+            "longitude": [-0.1232004, -0.1234538],
+            "speed": [8.63, 6.39],
+            "time": [
+              "Fri, 14 Jul 2017 13:44:03 GMT",
+              "Fri, 14 Jul 2017 15:47:03 GMT"
+            ]
+          }
+        },
+        "message": "",
+        "status": "success"
+      }
+
     :param integer auth_user_id: authenticate user id (from JSON Web Token)
     :param string workout_short_id: workout short id
     :param integer segment_id: segment id
 
+    :query integer points: maximal number of points to return: chart data
+                           are downsampled (Largest-Triangle-Three-Buckets)
+                           to the nearest available level (100, 250, 500,
+                           1000, 2500 or 5000 points), all points are
+                           returned if not provided
+    :query string format: chart data format:
+
+                          - ``records`` (default): a list of points
+                          - ``columns``: a list of values per field
+                          - ``binary``: compact binary format
+                            (``application/octet-stream``): number of points
+                            (unsigned 32-bit integer), followed by one array
+                            of 64-bit floats per field, in this order:
+                            distance, duration, elevation, latitude,
+                            longitude, speed and time (seconds since epoch).
+                            Values are little-endian, missing values are NaN.
+
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 200: success
-    :statuscode 400: no gpx file for this workout
+    :statuscode 400:
+        - no gpx file for this workout
+        - Invalid number of points.
+        - Invalid chart data format.
     :statuscode 401:
         - Provide a valid auth token.
         - Signature expired. Please log in again.
@@ -715,10 +859,14 @@ def get_map(map_id: int) -> Any:
 @workouts_blueprint.route(
     '/workouts/map_tile/<s>/<z>/<x>/<y>.png', methods=['GET']
 )
-def get_map_tile(s: str, z: str, x: str, y: str) -> Tuple[Response, int]:
+def get_map_tile(s: str, z: str, x: str, y: str) -> Response:
     """
     Get map tile from tile server.
 
+    Valid tiles are cached and returned with ``ETag`` and ``Cache-Control``
+    headers (``304`` is returned on conditional requests if tile has not
+    changed).
+
     **Example request**:
 
     .. sourcecode:: http
@@ -730,26 +878,32 @@ def get_map_tile(s: str, z: str, x: str, y: str) -> Tuple[Response, int]:
     .. sourcecode:: http
 
       HTTP/1.1 200 OK
+      Cache-Control: public, max-age=604800
       Content-Type: image/png
+      ETag: "b5e7ab0c3a0fba5e7d1f2e4a1b4a5f24"
 
     :param string s: subdomain
     :param string z: zoom
     :param string x: index of the tile along the map's x axis
     :param string y: index of the tile along the map's y axis
 
-    Status codes are status codes returned by tile server
+    :reqheader If-None-Match: ETag of tile in client cache
+
+    :statuscode 304: tile not modified
+
+    Other status codes are status codes returned by tile server
 
     """
-    url = current_app.config['TILE_SERVER']['URL'].format(s=s, z=z, x=x, y=y)
-    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'}
-    response = requests.get(url, headers=headers)
-    return (
-        Response(
-            response.content,
-            content_type=response.headers['content-type'],
-        ),
-        response.status_code,
+    tile = get_tile_proxy().get_tile(s, z, x, y)
+    response = Response(
+        tile.content, status=tile.status_code, content_type=tile.content_type
     )
+    if tile.etag:
+        response.set_etag(tile.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = MAP_TILES_MAX_AGE
+        response.make_conditional(request.environ)
+    return response
 
 
 @workouts_blueprint.route('/workouts', methods=['POST'])
@@ -765,6 +919,13 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
       POST /api/workouts/ HTTP/1.1
       Content-Type: multipart/form-data
 
+    - with asynchronous import
+
+    .. sourcecode:: http
+
+      POST /api/workouts/?async=true HTTP/1.1
+      Content-Type: multipart/form-data
+
     **Example response**:
 
     .. sourcecode:: http
@@ -783,6 +944,7 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
                 "descent": null,
                 "distance": 10.0,
                 "duration": "0:17:04",
+                "enrichment_status": "completed",
                 "id": "kjxavSTUrJvoAh2wvCeGEF",
                 "map": null,
                 "max_alt": null,
@@ -846,14 +1008,44 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
           "status": "success"
         }
 
+    - with asynchronous import
+
+    .. sourcecode:: http
+
+      HTTP/1.1 202 ACCEPTED
+      Content-Type: application/json
+
+      {
+        "data": {
+          "import": {
+            "creation_date": "Sun, 14 Jul 2019 13:51:01 GMT",
+            "files_count": 0,
+            "filename": "workouts.zip",
+            "id": "Ptu7tUsHFB6JMKWmoMWiGC",
+            "message": null,
+            "modification_date": null,
+            "processed_files": 0,
+            "results": [],
+            "status": "queued"
+          }
+        },
+        "status": "accepted"
+      }
+
     :param integer auth_user_id: authenticate user id (from JSON Web Token)
 
     :form file: gpx file (allowed extensions: .gpx, .zip)
     :form data: sport id and notes (example: ``{"sport_id": 1, "notes": ""}``)
 
+    :query boolean async: if ``true``, file is processed by a dramatiq worker
+                          and an import job is returned (see
+                          :http:get:`/api/workouts/imports/(string:import_id)`
+                          to get import status)
+
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 201: workout created
+    :statuscode 202: import job created (``async`` query parameter)
     :statuscode 400:
         - Invalid payload.
         - No file part.
@@ -884,11 +1076,26 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
         return InvalidPayloadErrorResponse()
 
     workout_file = request.files['file']
+    if request.args.get('async', '').lower() == 'true':
+        try:
+            import_job = create_import_job(
+                auth_user_id, workout_data, workout_file
+            )
+        except WorkoutException as e:
+            db.session.rollback()
+            if e.e:
+                appLog.error(e.e)
+            return InternalServerErrorResponse(e.message)
+        import_workouts.send(import_job.id)
+        return {
+            'status': 'accepted',
+            'data': {'import': import_job.serialize()},
+        }, 202
+
     upload_dir = os.path.join(
         current_app.config['UPLOAD_FOLDER'], 'workouts', str(auth_user_id)
     )
     folders = {
-        'extract_dir': os.path.join(upload_dir, 'extract'),
         'tmp_dir': os.path.join(upload_dir, 'tmp'),
     }
 
@@ -896,6 +1103,10 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
         new_workouts = process_files(
             auth_user_id, workout_data, workout_file, folders
         )
+        # missing map images and weather data are added by a dramatiq worker
+        for new_workout in new_workouts:
+            if new_workout.enrichment_status == 'pending':
+                enrich_workout.send(new_workout.id)
         if len(new_workouts) > 0:
             response_object = {
                 'status': 'created',
@@ -915,11 +1126,89 @@ def post_workout(auth_user_id: int) -> Union[Tuple[Dict, int], HttpResponse]:
             return InternalServerErrorResponse(e.message)
         return InvalidPayloadErrorResponse(e.message)
 
-    shutil.rmtree(folders['extract_dir'], ignore_errors=True)
     shutil.rmtree(folders['tmp_dir'], ignore_errors=True)
     return response_object, 201
 
 
+@workouts_blueprint.route(
+    '/workouts/imports/<string:import_short_id>', methods=['GET']
+)
+@authenticate
+def get_import_job(
+    auth_user_id: int, import_short_id: str
+) -> Union[Dict, HttpResponse]:
+    """
+    Get status and results of an asynchronous workouts import
+
+    **Example request**:
+
+    .. sourcecode:: http
+
+      GET /api/workouts/imports/Ptu7tUsHFB6JMKWmoMWiGC HTTP/1.1
+      Content-Type: application/json
+
+    **Example response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Content-Type: application/json
+
+      {
+        "data": {
+          "import": {
+            "creation_date": "Sun, 14 Jul 2019 13:51:01 GMT",
+            "files_count": 2,
+            "filename": "workouts.zip",
+            "id": "Ptu7tUsHFB6JMKWmoMWiGC",
+            "message": null,
+            "modification_date": "Sun, 14 Jul 2019 13:51:03 GMT",
+            "processed_files": 2,
+            "results": [
+              {
+                "filename": "workout_1.gpx",
+                "status": "created",
+                "workout_id": "kjxavSTUrJvoAh2wvCeGEF"
+              },
+              {
+                "filename": "workout_2.gpx",
+                "message": "Error during gpx file parsing.",
+                "status": "error"
+              }
+            ],
+            "status": "completed"
+          }
+        },
+        "status": "success"
+      }
+
+    :param integer auth_user_id: authenticate user id (from JSON Web Token)
+    :param string import_short_id: import job short id
+
+    :reqheader Authorization: OAuth 2.0 Bearer Token
+
+    :statuscode 200: success
+    :statuscode 401:
+        - Provide a valid auth token.
+        - Signature expired. Please log in again.
+        - Invalid token. Please log in again.
+    :statuscode 404: import not found
+
+    """
+    import_job = ImportJob.query.filter_by(
+        uuid=decode_short_id(import_short_id), user_id=auth_user_id
+    ).first()
+    if not import_job:
+        return DataNotFoundErrorResponse(
+            data_type='import',
+            message=f'Import not found (id: {import_short_id})',
+        )
+    return {
+        'status': 'success',
+        'data': {'import': import_job.serialize()},
+    }
+
+
 @workouts_blueprint.route('/workouts/no_gpx', methods=['POST'])
 @authenticate
 def post_workout_no_gpx(
@@ -953,6 +1242,7 @@ def post_workout_no_gpx(
                 "descent": null,
                 "distance": 10.0,
                 "duration": "0:17:04",
+                "enrichment_status": "completed",
                 "map": null,
                 "max_alt": null,
                 "max_speed": 10.0,
@@ -1047,7 +1337,10 @@ def post_workout_no_gpx(
         return InvalidPayloadErrorResponse()
 
     try:
-        user = User.query.filter_by(id=auth_user_id).first()
+        user = get_auth_user(auth_user_id)
+        if not user:
+            # user deleted in another process, before cache expiration
+            return UnauthorizedErrorResponse('Provide a valid auth token.')
         new_workout = create_workout(user, workout_data)
         db.session.add(new_workout)
         db.session.commit()
@@ -1104,6 +1397,7 @@ def update_workout(
                 "descent": null,
                 "distance": 10.0,
                 "duration": "0:17:04",
+                "enrichment_status": "completed",
                 "map": null,
                 "max_alt": null,
                 "max_speed": 10.0,